@@ -0,0 +1,297 @@
+"""
+Admission control for the LLM-backed endpoints.
+
+RateLimiter keeps a token bucket per (user id, endpoint): RATE_LIMIT_BURST
+requests at once, refilled at RATE_LIMIT_PER_MINUTE. RATE_LIMIT_OVERRIDES sets
+other limits per endpoint ("generate-path=10:5,suggest-jobs=20:5", per minute
+and burst). A request over the limit is refused with RateLimitedError, which
+carries how long until the bucket has a token again. Buckets live in-process
+(RATE_LIMIT_BACKEND=memory) or in Redis (RATE_LIMIT_BACKEND=redis, REDIS_URL),
+so all instances share them; the redis package is only imported then. While
+Redis is unreachable the in-process buckets take over, so limits still hold
+per instance.
+
+PriorityGate is the LLM client's concurrency limit: LLM_MAX_CONCURRENCY calls
+run, and the rest wait, interactive callers before background work (the
+prewarm scheduler, background revalidation) and first come first served
+within each. At most LLM_MAX_QUEUE may wait; a caller that finds the queue
+full is refused at once with QueueFullError, unless a background call is
+waiting, which is refused in its place. Both errors are OverloadedError,
+which the API answers with 429 or 503 and a Retry-After header.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+import itertools
+import contextlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from telemetry import span, record_rate_limited
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_OVERRIDES = os.getenv("RATE_LIMIT_OVERRIDES", "")
+# "memory" (per instance) or "redis" (shared; needs the redis package).
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# In-process buckets kept at most; the least recently used (by then refilled) go first.
+_MAX_BUCKETS = 50000
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class OverloadedError(RuntimeError):
+    """Raised instead of starting work the service has no capacity for now."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimitedError(OverloadedError):
+    status_code = 429
+
+
+class QueueFullError(OverloadedError):
+    status_code = 503
+
+# --- Rate Limiting ---
+
+def _parse_overrides(text: str) -> dict:
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        endpoint, _, limit = item.partition("=")
+        per_minute, _, burst = limit.partition(":")
+        limits[endpoint.strip()] = (float(per_minute), float(burst or per_minute))
+    return limits
+
+
+class MemoryRateLimitBackend:
+    """Token buckets in this process. The default, and the stand-in for Redis in tests and benchmarks."""
+    def __init__(self, max_buckets: int = _MAX_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets = OrderedDict()   # key -> [tokens, clock time of the last update]
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Takes cost tokens if there are enough. Returns 0, or the seconds until there would be."""
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Refill and take in one atomic step, on Redis's clock so instances agree.
+_TOKEN_BUCKET_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend:
+    """Token buckets in Redis, shared by every instance."""
+    def __init__(self, url: str):
+        import redis.asyncio as redis_asyncio
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        return float(await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, cost]))
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class RateLimiter:
+    def __init__(self, backend=None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.enabled = enabled
+        self._backend = backend
+        self._fallback = MemoryRateLimitBackend()
+        self._limits = _parse_overrides(RATE_LIMIT_OVERRIDES)
+        self._counters = {"allowed": 0, "limited": 0, "backend_errors": 0}
+
+    def _get_backend(self):
+        if self._backend is None:
+            self._backend = self._fallback
+            if RATE_LIMIT_BACKEND == "redis":
+                try:
+                    self._backend = RedisRateLimitBackend(REDIS_URL)
+                except ImportError as e:
+                    logger.error("RATE_LIMIT_BACKEND=redis needs the redis package (%s); using in-process buckets.", e)
+        return self._backend
+
+    def limit(self, endpoint: str) -> tuple[float, float]:
+        """(requests per minute, burst) for an endpoint."""
+        return self._limits.get(endpoint, (RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST))
+
+    async def check(self, user_id: str, endpoint: str, cost: float = 1.0):
+        """Takes a token from the user's bucket for endpoint, or raises RateLimitedError."""
+        if not self.enabled:
+            return
+        per_minute, burst = self.limit(endpoint)
+        key = f"{endpoint}:{user_id}"
+        backend = self._get_backend()
+        try:
+            wait = await backend.take(key, per_minute / 60, burst, cost)
+        except Exception as e:
+            self._counters["backend_errors"] += 1
+            logger.warning("Rate limit backend failed, using in-process buckets: %s", e)
+            wait = await self._fallback.take(key, per_minute / 60, burst, cost)
+        if wait > 0:
+            self._counters["limited"] += 1
+            record_rate_limited(endpoint)
+            raise RateLimitedError("Too many requests. Please slow down.", wait)
+        self._counters["allowed"] += 1
+
+    async def close(self):
+        if self._backend is not None and self._backend is not self._fallback:
+            await self._backend.close()
+        self._backend = None
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "enabled": self.enabled,
+            "backend": RATE_LIMIT_BACKEND,
+            "local_buckets": len(self._fallback),
+        }
+
+
+rate_limiter = RateLimiter()
+
+# --- LLM Queue ---
+
+@contextlib.contextmanager
+def background_priority():
+    """Marks LLM calls made in this block (and tasks started from it) as background work."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class PriorityGate:
+    def __init__(self, slots: int, max_waiting: int):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self._running = 0
+        self._waiting = []          # [priority, arrival number, future]; the smallest goes next
+        self._arrivals = itertools.count()
+        self._hold_seconds = None   # moving average of how long a call keeps its slot
+        self._counters = {"admitted": 0, "queued": 0, "rejected_full": 0, "displaced": 0, "peak_waiting": 0}
+
+    def locked(self) -> bool:
+        """Whether a caller arriving now would have to wait."""
+        return self._running >= self.slots or bool(self._waiting)
+
+    def _retry_after(self) -> float:
+        hold = self._hold_seconds or 1.0
+        return hold * (len(self._waiting) + 1) / self.slots
+
+    def _reject_for(self, priority: int):
+        """Frees a place in a full queue for priority, or raises QueueFullError."""
+        newest_background = max((entry for entry in self._waiting if entry[0] > priority), default=None)
+        if newest_background is None:
+            self._counters["rejected_full"] += 1
+            raise QueueFullError("The service is busy right now. Please try again shortly.", self._retry_after())
+        self._waiting.remove(newest_background)
+        self._counters["displaced"] += 1
+        newest_background[2].set_exception(
+            QueueFullError("Background work was displaced by interactive requests.", self._retry_after())
+        )
+
+    async def acquire(self):
+        priority = _priority.get()
+        if not self.locked():
+            self._running += 1
+            self._counters["admitted"] += 1
+            return
+        if len(self._waiting) >= self.max_waiting:
+            self._reject_for(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._arrivals), future]
+        self._waiting.append(entry)
+        self._counters["queued"] += 1
+        self._counters["peak_waiting"] = max(self._counters["peak_waiting"], len(self._waiting))
+        try:
+            with span("queue"):
+                await future
+        except BaseException:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+            elif future.done() and not future.cancelled() and future.exception() is None:
+                # Cancelled just after being handed a slot: pass it on.
+                self.release()
+            raise
+        self._counters["admitted"] += 1
+
+    def release(self):
+        """Hands the slot to the next waiter, or frees it."""
+        while self._waiting:
+            entry = min(self._waiting)
+            self._waiting.remove(entry)
+            if not entry[2].done():
+                entry[2].set_result(None)
+                return
+        self._running -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - started
+            self._hold_seconds = held if self._hold_seconds is None else 0.9 * self._hold_seconds + 0.1 * held
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "slots": self.slots,
+            "running": self._running,
+            "waiting": len(self._waiting),
+            "waiting_background": sum(1 for entry in self._waiting if entry[0] == BACKGROUND),
+            "max_waiting": self.max_waiting,
+        }
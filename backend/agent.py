@@ -1,85 +1,227 @@
+import logging
 import os
 import json
 import uuid
+import asyncio
+import threading
 from dotenv import load_dotenv
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
-from database import get_cached_job_skills, cache_job_skills
+import skills_cache
+from singleflight import SingleFlight
+from title_index import normalize_title
+from skills import compute_skill_gap, normalize_skill
+from job_matrix import job_matrix
+from skill_extractor import extract_skills
+from resume_compactor import compact_resume
+from json_stream import ArrayItemParser
+from llm_client import LLMClient
+from admission import OverloadedError, background_priority
+from career_path_cache import career_path_cache
+from schemas import CareerPathResponse
+from telemetry import span
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# "gemini", or "fake" for the deterministic offline stand-in in fake_llm.py.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found. Please set it in the .env file.")
+_model = None
+_model_lock = threading.Lock()
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('models/gemini-flash-latest')
+def check_model_config():
+    """Raises on a missing API key, without the cost of building the model."""
+    if LLM_BACKEND != "fake" and not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not found. Please set it in the .env file.")
+
+def get_model():
+    """
+    Builds the configured model on first use. The Gemini SDK is imported here
+    rather than at module level: it is the slowest import in the app, and the
+    startup warm-up runs this in a thread (hence the lock).
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                check_model_config()
+                if LLM_BACKEND == "fake":
+                    from fake_llm import FakeModel
+                    _model = FakeModel()
+                else:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    _model = genai.GenerativeModel('models/gemini-flash-latest')
+    return _model
+
+# --- Resilient Client ---
+# Deadlines, retries, hedging and the circuit breaker for every model call (see llm_client).
+llm = LLMClient(get_model)
+
+# --- Job Suggestions ---
+# "local" (skill x job matrix, LLM fallback), "hybrid" (matrix shortlist + LLM) or "llm".
+JOB_SUGGESTION_MODE = os.getenv("JOB_SUGGESTION_MODE", "local")
+JOB_SHORTLIST_SIZE = int(os.getenv("JOB_SHORTLIST_SIZE", "20"))
+
+# --- Skill Extraction ---
+# The local extractor's result is used when it finds at least this many skills.
+LOCAL_SKILLS_MIN_COUNT = int(os.getenv("LOCAL_SKILLS_MIN_COUNT", "3"))
+
+# --- Request Coalescing ---
+# Identical requests that arrive while one is in flight share its Gemini call.
+_skills_flight = SingleFlight("get_skills_for_job")
+_analyze_flight = SingleFlight("analyze_skills_for_job")
+_career_path_flight = SingleFlight("generate_career_path")
+
+# How /api/analyze requests were served: from cached requirements or by Gemini.
+_analysis_sources = {"local": 0, "llm": 0}
 
 # ---  Generation Configs ---
-JSON_CONFIG = GenerationConfig(
-    temperature=0.2,
-    response_mime_type="application/json"
-)
-
-SKILL_CONFIG = GenerationConfig(
-    temperature=0.0
-)
-
-CREATIVE_JSON_CONFIG = GenerationConfig(
-    temperature=0.5,
-    response_mime_type="application/json"
-)
-
-def analyze_skills_for_job(skills: list[str], job_title: str) -> dict:
-    """Analyzes skills for a job."""
-    prompt = f"""
-    You are a skills analyst. Compare the following skills with the typical requirements for a '{job_title}'.
+# Plain dicts, which the SDK accepts as GenerationConfig, so importing it can wait for get_model().
+JSON_CONFIG = {
+    "temperature": 0.2,
+    "response_mime_type": "application/json"
+}
+
+SKILL_CONFIG = {
+    "temperature": 0.0
+}
+
+CREATIVE_JSON_CONFIG = {
+    "temperature": 0.5,
+    "response_mime_type": "application/json"
+}
+
+def _normalize_skills(skills: list[str]) -> tuple:
+    return tuple(sorted({normalize_skill(s) for s in skills} - {""}))
 
-    Skills: {', '.join(skills)}
+def analysis_source_stats() -> dict:
+    return dict(_analysis_sources)
 
-    Return a JSON object with two keys: "matching_skills" and "missing_skills".
+def llm_stats() -> dict:
+    return llm.stats()
+
+def llm_load() -> float:
+    return llm.load()
+
+def singleflight_stats() -> dict:
+    """Per-function counts of upstream calls made and callers that were coalesced onto them."""
+    return {flight.name: flight.stats() for flight in (_skills_flight, _analyze_flight, _career_path_flight)}
+
+async def analyze_skills_for_job(skills: list[str], job_title: str) -> dict:
+    """
+    Analyzes skills for a job. When the job's requirements are already cached the
+    gap is computed locally; otherwise Gemini is asked, and identical concurrent
+    requests share one call. The result's "source" says which path served it.
     """
+    requirements = await skills_cache.get_job_skills(job_title, revalidate=_fetch_job_skills, allow_stale=llm.circuit_open())
+    if requirements and requirements is not skills_cache.FAILED:
+        _analysis_sources["local"] += 1
+        return {**compute_skill_gap(skills, requirements), "source": "local"}
+
     try:
-        response = model.generate_content(prompt, generation_config=JSON_CONFIG)
-        parsed_json = json.loads(response.text)
-        print(f"Parsed JSON (analyze_skills_for_job): {parsed_json}")
-        return parsed_json
+        return await _analyze_with_llm(skills, job_title)
+    except OverloadedError:
+        # The caller answers with 429/503 and Retry-After rather than an empty result.
+        raise
     except Exception as e:
-        print(f"Agent Error (analyze_skills_for_job): {e}")
-        return {"matching_skills": [], "missing_skills": []}
+        logger.error("Agent Error (analyze_skills_for_job): %s", e)
+        return {"matching_skills": [], "missing_skills": [], "source": "llm"}
+
+async def _analyze_with_llm(skills: list[str], job_title: str) -> dict:
+    """Asks Gemini for the skill gap; identical concurrent requests share one call. Raises on failure."""
+    async def run():
+        prompt = f"""
+        You are a skills analyst. Compare the following skills with the typical requirements for a '{job_title}'.
+
+        Skills: {', '.join(skills)}
+
+        Return a JSON object with two keys: "matching_skills" and "missing_skills".
+        """
+        response_text = await llm.generate(prompt, JSON_CONFIG)
+        parsed_json = json.loads(response_text)
+        logger.debug("Parsed JSON (analyze_skills_for_job): %s", parsed_json)
+        return parsed_json
 
-def get_job_suggestions(resume_text: str) -> dict:
-    """Gets job suggestions based on a resume."""
+    _analysis_sources["llm"] += 1
+    key = (normalize_title(job_title), _normalize_skills(skills))
+    return {**await _analyze_flight.do(key, run), "source": "llm"}
+
+async def analyze_skills_for_jobs(skills: list[str], job_titles: list[str]) -> dict:
+    """
+    Batch analyze_skills_for_job: cached requirements for every title come from
+    one lookup, and the misses go to Gemini concurrently. Returns
+    {job_title: analysis or the exception that title failed with}.
+    """
+    requirements = await skills_cache.get_many_job_skills(job_titles, revalidate=_fetch_job_skills, allow_stale=llm.circuit_open())
+
+    async def analyze(job_title):
+        if requirements.get(job_title) and requirements[job_title] is not skills_cache.FAILED:
+            _analysis_sources["local"] += 1
+            return {**compute_skill_gap(skills, requirements[job_title]), "source": "local"}
+        try:
+            return await _analyze_with_llm(skills, job_title)
+        except Exception as e:
+            logger.error("Agent Error (analyze_skills_for_jobs, %s): %s", job_title, e)
+            raise
+
+    titles = list(dict.fromkeys(job_titles))
+    results = await asyncio.gather(*(analyze(title) for title in titles), return_exceptions=True)
+    return dict(zip(titles, results))
+
+async def get_job_suggestions(resume_text: str, shortlist: list[dict] | None = None) -> dict:
+    """
+    Gets job suggestions based on a resume.
+    An optional shortlist of locally pre-ranked jobs is offered to the model as candidates.
+    """
+    shortlist_text = ""
+    if shortlist:
+        candidates = "\n".join(f"- {job['job_title']} (skill overlap {job['match_score']}%)" for job in shortlist)
+        shortlist_text = f"""
+    These jobs from our catalogue overlap most with the candidate's skills. Prefer them where they fit:
+    {candidates}
+    """
     prompt = f"""
     You are a career advisor. Based on the following resume text, suggest 5 job titles that would be a good fit.
 
     Resume Text:
     ---
-    {resume_text[:4000]}
+    {compact_resume(resume_text)}
     ---
-
+    {shortlist_text}
     Return a JSON object with a single key "suggestions", which is a list of objects. Each object should have two keys: "job_title" (string) and "match_score" (an integer between 0 and 100).
     """
     try:
-        response = model.generate_content(prompt, generation_config=CREATIVE_JSON_CONFIG)
-        suggestions_data = json.loads(response.text) 
+        response_text = await llm.generate(prompt, CREATIVE_JSON_CONFIG)
+        suggestions_data = json.loads(response_text) 
         for suggestion in suggestions_data.get("suggestions", []):
             suggestion["suggestion_id"] = str(uuid.uuid4())
         return suggestions_data
+    except OverloadedError:
+        raise
     except Exception as e:
-        print(f"Agent Error (get_job_suggestions): {e}")
+        logger.error("Agent Error (get_job_suggestions): %s", e)
         return {"suggestions": []}
 
-def get_skills_for_job(job_title: str) -> dict:
+async def suggest_jobs_for_skills(skills: list[str]) -> dict:
     """
-    Gets skills for a job, using a cache to avoid redundant API calls.
+    Suggests jobs for a plain skills list according to JOB_SUGGESTION_MODE:
+    "local" ranks cached jobs with the skill x job matrix and only falls back to
+    Gemini when fewer than 5 jobs overlap; "hybrid" passes the local ranking to
+    Gemini as a shortlist; "llm" always asks Gemini directly.
     """
-    
-    cached_skills = get_cached_job_skills(job_title)
-    if cached_skills:
-        return cached_skills
-
-    print(f"Calling Gemini API for job: {job_title}")
+    if JOB_SUGGESTION_MODE == "llm":
+        return await get_job_suggestions(", ".join(skills))
+
+    ranked = job_matrix.rank(skills, top_k=JOB_SHORTLIST_SIZE)
+    if JOB_SUGGESTION_MODE == "local" and len(ranked) >= 5:
+        suggestions = [{**job, "suggestion_id": str(uuid.uuid4())} for job in ranked[:5]]
+        return {"suggestions": suggestions}
+    return await get_job_suggestions(", ".join(skills), shortlist=ranked or None)
+
+async def _fetch_job_skills(job_title: str) -> dict:
+    """Asks Gemini for a job's skills and writes the result through both cache tiers."""
+    logger.debug("Calling Gemini API for job: %s", job_title)
     prompt = f"""
     You are a job market analyst. What are the technical, soft,
     and tool skills for a '{job_title}'?
@@ -89,50 +231,171 @@ def get_skills_for_job(job_title: str) -> dict:
     as its value.
     """
 
-    try:
-        response = model.generate_content(prompt, generation_config=JSON_CONFIG)
-        
-        skills_data = json.loads(response.text)
-
-        if skills_data: 
-            cache_job_skills(job_title, skills_data)
+    response_text = await llm.generate(prompt, JSON_CONFIG)
+    skills_data = json.loads(response_text)
 
-        return skills_data
+    if skills_data:
+        await skills_cache.store_job_skills(job_title, skills_data)
 
-    except Exception as e:
-        print(f"Agent Error (get_skills_for_job): {e}")
-        return {"technical_skills": [], "soft_skills": [], "tool_skills": []}
+    return skills_data
 
-def generate_career_path(current_skills: list[str], target_job: str) -> dict:
-    """Generates a career path."""
-    prompt = f"""
-    You are a career strategist. My current skills are: {', '.join(current_skills)}. My target job is '{target_job}'.
-
-    Generate a career path with milestones, skills to learn next, and recommended actions.
+def _shared_fetch_job_skills(job_title: str, background: bool = False):
+    """
+    _fetch_job_skills, sharing an identical call already in flight. Callers
+    handle its errors themselves, so any of them can join any other's flight.
+    Background fetches fly separately: an interactive caller that joined one
+    would wait at background priority and could be displaced with a 503.
+    """
+    key = normalize_title(job_title)
+    return _skills_flight.do(("background", key) if background else key, lambda: _fetch_job_skills(job_title))
 
-    Return a JSON object with three keys: "milestones", "next_skills", and "recommended_actions".
-    Each key must contain a list of strings. For example:
-    {{
-      "milestones": ["Achieve proficiency in Python", "Build a portfolio of 3 data science projects"],
-      "next_skills": ["SQL", "Tableau", "Scikit-learn"],
-      "recommended_actions": ["Take an online course in machine learning", "Network with data scientists on LinkedIn"]
-    }}
+async def get_skills_for_job(job_title: str) -> dict:
     """
+    Gets skills for a job, using a cache to avoid redundant API calls.
+    Concurrent misses for the same title share one Gemini call and one cache write.
+    While the LLM circuit breaker is open, expired cache entries are served as-is.
+    """
+    cached_skills = await skills_cache.get_job_skills(job_title, revalidate=_fetch_job_skills, allow_stale=llm.circuit_open())
+    if cached_skills is skills_cache.FAILED:
+        return {"technical_skills": [], "soft_skills": [], "tool_skills": []}
+    if cached_skills:
+        return cached_skills
+
     try:
-        response = model.generate_content(prompt, generation_config=CREATIVE_JSON_CONFIG)
-        return json.loads(response.text) # Direct parsing
+        return await _shared_fetch_job_skills(job_title)
+
+    except OverloadedError:
+        raise
     except Exception as e:
-        print(f"Agent Error (generate_career_path): {e}")
-        return {"milestones": [], "next_skills": [], "recommended_actions": []}
+        logger.error("Agent Error (get_skills_for_job): %s", e)
+        skills_cache.mark_failed(job_title)
+        return {"technical_skills": [], "soft_skills": [], "tool_skills": []}
 
-def extract_skills_from_text(text: str) -> list[str]:
+async def get_skills_for_jobs(job_titles: list[str]) -> dict:
+    """
+    Batch get_skills_for_job: cache hits for every title come from one lookup,
+    and the misses go to Gemini concurrently. Returns {job_title: skills data
+    or the exception that title failed with}.
+    """
+    cached = await skills_cache.get_many_job_skills(job_titles, revalidate=_fetch_job_skills, allow_stale=llm.circuit_open())
+
+    async def fetch(job_title):
+        if cached.get(job_title) is skills_cache.FAILED:
+            raise RuntimeError("Skills for this job could not be fetched recently. Try again shortly.")
+        if cached.get(job_title):
+            return cached[job_title]
+        try:
+            return await _shared_fetch_job_skills(job_title)
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error("Agent Error (get_skills_for_jobs, %s): %s", job_title, e)
+            skills_cache.mark_failed(job_title)
+            raise
+
+    titles = list(dict.fromkeys(job_titles))
+    results = await asyncio.gather(*(fetch(title) for title in titles), return_exceptions=True)
+    return dict(zip(titles, results))
+
+async def prewarm_job_skills(job_title: str, refresh: bool) -> bool:
+    """
+    Fetches a title's skills for the prewarm scheduler, sharing any identical call
+    already in flight. Unless refreshing, a title that turns out to be cached
+    is left alone. Returns whether Gemini was called.
+    """
+    if not refresh:
+        cached = await skills_cache.get_job_skills(job_title, record=False)
+        if cached and cached is not skills_cache.FAILED:
+            return False
+    with background_priority():
+        skills_data = await _shared_fetch_job_skills(job_title, background=True)
+    if not skills_data:
+        raise ValueError("Gemini returned no skills.")
+    return True
+
+def _career_path_prompt(current_skills: list[str], target_job: str) -> str:
+    return f"""
+        You are a career strategist. My current skills are: {', '.join(current_skills)}. My target job is '{target_job}'.
+
+        Generate a career path with milestones, skills to learn next, and recommended actions.
+
+        Return a JSON object with three keys: "milestones", "next_skills", and "recommended_actions".
+        Each key must contain a list of strings. For example:
+        {{
+          "milestones": ["Achieve proficiency in Python", "Build a portfolio of 3 data science projects"],
+          "next_skills": ["SQL", "Tableau", "Scikit-learn"],
+          "recommended_actions": ["Take an online course in machine learning", "Network with data scientists on LinkedIn"]
+        }}
+        """
+
+def _cached_career_path(current_skills: list[str], target_job: str) -> tuple[tuple, dict | None]:
+    key = (normalize_title(target_job), _normalize_skills(current_skills))
+    with span("cache"):
+        return key, career_path_cache.get(key)
+
+async def generate_career_path(current_skills: list[str], target_job: str) -> dict:
+    """
+    Generates a career path. Results are cached by job and skill set (near
+    duplicates included, see career_path_cache); identical concurrent misses
+    share one Gemini call.
+    """
+    key, cached = _cached_career_path(current_skills, target_job)
+    if cached is not None:
+        return cached
+
+    async def run():
+        try:
+            response_text = await llm.generate(_career_path_prompt(current_skills, target_job), CREATIVE_JSON_CONFIG)
+            # Only a well-formed path is cached; anything else would be served to near duplicates too.
+            result = CareerPathResponse.model_validate(json.loads(response_text)).model_dump()
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error("Agent Error (generate_career_path): %s", e)
+            return {"milestones": [], "next_skills": [], "recommended_actions": []}
+        career_path_cache.set(key, result)
+        return result
+
+    return await _career_path_flight.do(key, run)
+
+async def stream_career_path(current_skills: list[str], target_job: str):
+    """
+    Streams a career path as Gemini writes it. Yields ("item", key, value) for
+    each list entry as soon as it is complete, then ("complete", None, result)
+    with the whole parsed object. A cached result is replayed the same way.
+    Errors propagate to the caller.
+    """
+    key, cached = _cached_career_path(current_skills, target_job)
+    if cached is not None:
+        for field, values in cached.items():
+            for value in values if isinstance(values, list) else []:
+                yield "item", field, value
+        yield "complete", None, cached
+        return
+
+    parser = ArrayItemParser()
+    async for chunk in llm.stream(_career_path_prompt(current_skills, target_job), CREATIVE_JSON_CONFIG):
+        for field, value in parser.feed(chunk):
+            yield "item", field, value
+    # Cached only once the whole document has arrived, parsed and validated:
+    # a stream cut short or malformed raises here instead.
+    result = CareerPathResponse.model_validate(json.loads(parser.text())).model_dump()
+    career_path_cache.set(key, result)
+    yield "complete", None, result
+
+async def extract_skills_from_text(text: str) -> list[str]:
     """
     Extracts skills from any block of text.
     This function replaces the duplicated skill extractors.
+    The local extractor runs first; Gemini is only asked when it finds too few skills.
     """
     if not text or text.isspace():
         return []
-        
+
+    local_skills = extract_skills(text)
+    if len(local_skills) >= LOCAL_SKILLS_MIN_COUNT:
+        return local_skills
+
     prompt = f"""
     You are an expert skill extractor. From the following text, extract a clean list of all technical and soft skills.
 
@@ -146,52 +409,61 @@ def extract_skills_from_text(text: str) -> list[str]:
     Example Response: Python, React, SQL, Teamwork, Communication, Git, Docker
     """
     try:
-        response = model.generate_content(prompt, generation_config=SKILL_CONFIG)
-        return [s.strip() for s in response.text.strip().split(',') if s.strip()]
+        response_text = await llm.generate(prompt, SKILL_CONFIG)
+        return [s.strip() for s in response_text.strip().split(',') if s.strip()]
+    except OverloadedError:
+        raise
     except Exception as e:
-        print(f"Agent Error (extract_skills_from_text): {e}")
+        logger.error("Agent Error (extract_skills_from_text): %s", e)
         return []
 
-def parse_resume_structure(resume_text: str) -> dict:
+async def parse_resume_structure(resume_text: str) -> dict:
     """Step 1: Parses raw resume text into a structured JSON."""
     prompt = f"""
     You are an expert resume parser. Analyze the following resume text and structure it into a JSON object with keys like "education", "experience", and "skills".
 
     Resume Text:
     ---
-    {resume_text[:4000]}
+    {compact_resume(resume_text)}
     ---
 
     Return only the JSON object.
     """
-    print("Agent: Calling Gemini for Step 1 - Resume Structuring...")
+    logger.debug("Agent: Calling Gemini for Step 1 - Resume Structuring...")
     try:
-        response = model.generate_content(prompt, generation_config=JSON_CONFIG)
-        return json.loads(response.text) 
+        response_text = await llm.generate(prompt, JSON_CONFIG)
+        return json.loads(response_text) 
+    except OverloadedError:
+        raise
     except Exception as e:
-        print(f"Agent Error (Step 1): {e}")
+        logger.error("Agent Error (Step 1): %s", e)
         return {}
 
-def extract_skills_from_structured_data(resume_json: dict) -> list[str]:
+async def extract_skills_from_structured_data(resume_json: dict) -> list[str]:
     """
     Step 2: Extracts skills from the structured JSON resume data.
     This now calls the single, consolidated skill extractor function.
     """
-    print("Agent: Calling Gemini for Step 2 - Skill Extraction...")
+    logger.debug("Agent: Calling Gemini for Step 2 - Skill Extraction...")
     skills_section = resume_json.get("skills", "")
     experience_section = resume_json.get("experience", "")
     
     combined_text = f"Skills Section: {str(skills_section)}\nExperience Section: {str(experience_section)}"
     
-    return extract_skills_from_text(combined_text)
-
-# [Add this function to backend/agent.py]
+    return await extract_skills_from_text(combined_text)
 
 async def get_suggestions_and_skills_from_resume(resume_text: str) -> dict:
     """
     Consolidated function:
-    Gets job suggestions AND extracts skills from a resume in a single LLM call.
+    Gets job suggestions AND extracts skills from a resume.
+    Skills come from the local extractor when it finds enough of them, leaving
+    Gemini only the suggestions; otherwise both come from a single LLM call.
     """
+    parsed_skills = extract_skills(resume_text)
+    if len(parsed_skills) >= LOCAL_SKILLS_MIN_COUNT:
+        suggestions_data = await get_job_suggestions(resume_text)
+        return {"parsed_skills": parsed_skills, "suggestions": suggestions_data.get("suggestions", [])}
+
     prompt = f"""
     You are an expert career advisor and resume parser. Based on the following resume text, perform two tasks:
     1.  Extract a clean list of all technical and soft skills.
@@ -199,7 +471,7 @@ async def get_suggestions_and_skills_from_resume(resume_text: str) -> dict:
 
     Resume Text:
     ---
-    {resume_text[:4000]}
+    {compact_resume(resume_text)}
     ---
 
     Return a JSON object with two keys:
@@ -208,9 +480,9 @@ async def get_suggestions_and_skills_from_resume(resume_text: str) -> dict:
     """
     try:
         # We use CREATIVE_JSON_CONFIG for this combined task
-        response = await model.generate_content_async(prompt, generation_config=CREATIVE_JSON_CONFIG)
+        response_text = await llm.generate(prompt, CREATIVE_JSON_CONFIG)
         
-        data = json.loads(response.text)
+        data = json.loads(response_text)
         
         # Ensure suggestions get a unique ID for feedback
         for suggestion in data.get("suggestions", []):
@@ -218,7 +490,9 @@ async def get_suggestions_and_skills_from_resume(resume_text: str) -> dict:
             
         return data
 
+    except OverloadedError:
+        raise
     except Exception as e:
-        print(f"Agent Error (get_suggestions_and_skills_from_resume): {e}")
+        logger.error("Agent Error (get_suggestions_and_skills_from_resume): %s", e)
         # Return a safe, empty schema
         return {"parsed_skills": [], "suggestions": []}
\ No newline at end of file
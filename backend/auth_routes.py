@@ -1,15 +1,20 @@
-from fastapi import APIRouter, HTTPException
+import logging
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 import firebase_admin
 from firebase_admin import auth
 from firebase_admin.auth import EmailAlreadyExistsError, InvalidIdTokenError, UserNotFoundError
+from auth_utils import init_firebase
+
+logger = logging.getLogger(__name__)
 
 # --- Pydantic Models for Request Bodies ---
 class UserCredentials(BaseModel):
     email: str
     password: str
 
-router = APIRouter()
+# Every route here calls the Admin SDK, so the app must be initialized first.
+router = APIRouter(dependencies=[Depends(init_firebase)])
 
 # --- Email/Password Endpoint ---
 @router.post("/signup")
@@ -32,7 +37,7 @@ async def signup(credentials: UserCredentials):
     except EmailAlreadyExistsError:
         raise HTTPException(status_code=400, detail="Email already in use.")
     except Exception as e:
-        print(f"Error during admin signup: {e}")
+        logger.error("Error during admin signup: %s", e)
         raise HTTPException(status_code=500, detail="Could not create user.")
 
 
@@ -61,5 +66,5 @@ async def google_login(token: GoogleToken):
     except InvalidIdTokenError:
         raise HTTPException(status_code=401, detail="Invalid Google ID token.")
     except Exception as e:
-        print(f"Error during Google login: {e}")
+        logger.error("Error during Google login: %s", e)
         raise HTTPException(status_code=500, detail="Could not process Google login.")
\ No newline at end of file
@@ -1,16 +1,222 @@
+"""
+Firebase ID token verification for the protected routes.
+
+Tokens are verified locally against Google's public signing certificates
+(RS256) instead of calling auth.verify_id_token on every request. The
+certificates are fetched with httpx and refreshed in the background before
+their Cache-Control max-age runs out. Verified claims are cached, keyed by a
+SHA-256 of the token, until the token's own exp, so a session's repeated
+requests skip signature checks entirely.
+
+The Firebase Admin app is initialized lazily by init_firebase(): the startup
+warm-up calls it in a thread, and anything that needs the app calls it first.
+"""
+import logging
+import os
+import re
+import time
+import asyncio
+import json
+import hashlib
+import threading
+import httpx
+import jwt
 import firebase_admin
-from firebase_admin import credentials, auth
+from firebase_admin import auth
+from cryptography import x509
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from cache import TTLCache, MISSING
+from singleflight import SingleFlight
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_CERT_URL = os.getenv(
+    "FIREBASE_CERT_URL",
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+# Defaults to the project of the initialized Firebase Admin app.
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "")
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CLOCK_SKEW_SECONDS = int(os.getenv("AUTH_CLOCK_SKEW_SECONDS", "5"))
+# Certificates are refetched this long before they expire.
+AUTH_KEY_REFRESH_MARGIN_SECONDS = float(os.getenv("AUTH_KEY_REFRESH_MARGIN_SECONDS", "300"))
 
 bearer_scheme = HTTPBearer()
 
+# Firebase ID tokens live for an hour; the per-entry TTL is the token's remaining lifetime.
+_token_cache = TTLCache(maxsize=AUTH_TOKEN_CACHE_MAX_ENTRIES, ttl=3600)
+_verify_flight = SingleFlight("verify_token")
+_keys_flight = SingleFlight("signing_keys")
+_keys = {}                      # kid -> RSA public key
+_keys_expire_at = 0.0           # monotonic
+_keys_fetched_at = float("-inf")
+_refresh_task = None
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+_firebase_lock = threading.Lock()
+_firebase_initialized = False
+
+# --- Firebase Admin SDK Initialization ---
+
+def init_firebase():
+    """
+    Initializes the Firebase Admin app from FIREBASE_SERVICE_ACCOUNT_JSON or
+    serviceAccountKey.json. Callers that arrive while it runs wait for it;
+    once it has succeeded, later calls return immediately.
+    """
+    global _firebase_initialized
+    if _firebase_initialized:
+        return
+    with _firebase_lock:
+        if _firebase_initialized or firebase_admin._apps:
+            _firebase_initialized = True
+            return
+
+        from firebase_admin import credentials
+        service_account_json_str = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
+        cred = None
+
+        if service_account_json_str and service_account_json_str.strip():
+            logger.info("Initializing Firebase Admin SDK from environment variable.")
+            try:
+                service_account_info = json.loads(service_account_json_str)
+                cred = credentials.Certificate(service_account_info)
+            except json.JSONDecodeError as e:
+                logger.error("FATAL ERROR: Invalid JSON in FIREBASE_SERVICE_ACCOUNT_JSON env var: %s", e)
+                raise e
+        else:
+            logger.info("Initializing Firebase Admin SDK from local file 'serviceAccountKey.json'.")
+            try:
+                cred = credentials.Certificate("serviceAccountKey.json")
+            except FileNotFoundError:
+                logger.warning("WARNING: serviceAccountKey.json not found. Backend auth features (token verification) will fail.")
+            except Exception as e:
+                logger.error("ERROR: Failed to load serviceAccountKey.json: %s", e)
+
+        if cred:
+            try:
+                firebase_admin.initialize_app(cred)
+                # Set only now, so nobody skips the lock while the app is half set up.
+                _firebase_initialized = True
+                logger.info("Firebase Admin SDK initialized successfully.")
+            except Exception as e:
+                logger.error("ERROR: Firebase Admin SDK initialization failed: %s", e)
+        else:
+            logger.error("ERROR: Could not load Firebase credentials. Backend auth features will fail.")
+
+# --- Signing Keys ---
+
+async def refresh_signing_keys():
+    """Fetches Google's current signing certificates and replaces the key set."""
+    global _keys, _keys_expire_at, _keys_fetched_at
+    async with httpx.AsyncClient(timeout=10) as client:
+        response = await client.get(FIREBASE_CERT_URL)
+        response.raise_for_status()
+    _keys = {
+        kid: x509.load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+        for kid, pem in response.json().items()
+    }
+    match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+    _keys_fetched_at = time.monotonic()
+    _keys_expire_at = _keys_fetched_at + (int(match.group(1)) if match else 3600)
+
+async def _refresh_keys_periodically():
+    while True:
+        if _keys:
+            await asyncio.sleep(max(60.0, _keys_expire_at - time.monotonic() - AUTH_KEY_REFRESH_MARGIN_SECONDS))
+        try:
+            await _keys_flight.do("keys", refresh_signing_keys)
+        except Exception as e:
+            logger.error("Error refreshing Firebase signing keys: %s", e)
+            await asyncio.sleep(60)
+
+def start_key_refresh():
+    """Starts the background task that fetches the signing keys and keeps them fresh."""
+    global _refresh_task
+    # Nothing to verify against without a project, and emulator tokens are unsigned.
+    if not _project_id() or os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+        return
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_keys_periodically())
+
+def stop_key_refresh():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+
+async def _get_signing_key(kid: str):
+    now = time.monotonic()
+    # Refetch when the keys expired, or for an unknown kid after a rotation (at most once a minute).
+    if now >= _keys_expire_at or (kid not in _keys and now - _keys_fetched_at >= 60):
+        await _keys_flight.do("keys", refresh_signing_keys)
+        start_key_refresh()
+    return _keys.get(kid)
+
+# --- Verification ---
+
+def _project_id() -> str:
+    if FIREBASE_PROJECT_ID:
+        return FIREBASE_PROJECT_ID
+    init_firebase()
+    if firebase_admin._apps:
+        return firebase_admin.get_app().project_id or ""
+    return ""
+
+def _decode(token: str, key, project_id: str) -> dict:
+    claims = jwt.decode(
+        token, key,
+        algorithms=["RS256"],
+        audience=project_id,
+        issuer=f"https://securetoken.google.com/{project_id}",
+        leeway=AUTH_CLOCK_SKEW_SECONDS,
+        options={"require": ["exp", "iat", "aud", "iss", "sub"]},
+    )
+    subject = claims["sub"]
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise jwt.InvalidTokenError('Token has an invalid "sub" (subject) claim.')
+    if claims.get("auth_time", 0) > time.time() + AUTH_CLOCK_SKEW_SECONDS:
+        raise jwt.InvalidTokenError('Token has an "auth_time" in the future.')
+    claims["uid"] = subject
+    return claims
+
+async def verify_token(token: str) -> dict:
+    """Verifies a Firebase ID token, serving repeats from the token cache."""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = _token_cache.get(key)
+    if claims is not MISSING:
+        return claims
+
+    async def verify():
+        if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+            # Emulator tokens are unsigned; only the Admin SDK knows how to check them.
+            init_firebase()
+            return await asyncio.to_thread(auth.verify_id_token, token)
+        project_id = _project_id()
+        if not project_id:
+            raise RuntimeError("Firebase project id is not configured.")
+        signing_key = await _get_signing_key(jwt.get_unverified_header(token).get("kid", ""))
+        if signing_key is None:
+            raise jwt.InvalidTokenError("Token was signed with an unknown key.")
+        # Signature checks are CPU-bound; keep them off the event loop.
+        return await asyncio.to_thread(_decode, token, signing_key, project_id)
+
+    claims = await _verify_flight.do(key, verify)
+    _token_cache.set(key, claims, ttl=claims["exp"] - time.time())
+    return claims
+
+def token_cache_stats() -> dict:
+    return {**_token_cache.stats(), "verifications": _verify_flight.stats(), "signing_keys": len(_keys)}
+
 async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
     """
     A dependency that verifies the Firebase ID token from the Authorization header
     and returns the user data.
     """
-    if not firebase_admin._apps:
+    if not FIREBASE_PROJECT_ID:
+        init_firebase()
+    if not firebase_admin._apps and not FIREBASE_PROJECT_ID:
          raise HTTPException(
              status_code=500,
              detail="Firebase Admin SDK not initialized correctly."
@@ -18,11 +224,11 @@ async def get_current_user(creds: HTTPAuthorizationCredentials = Depends(bearer_
 
     token = creds.credentials
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
+        with span("auth"):
+            return await verify_token(token)
     except Exception as e:
         raise HTTPException(
             status_code=401,
             detail=f"Invalid authentication token: {e}",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,155 @@
+"""
+Load-tests the API in-process: requests go straight into the ASGI app through
+httpx's ASGITransport, with the fake LLM, in-memory Firestore and locally
+signed tokens from harness.py, so no network or API key is involved.
+
+Every scenario runs at each concurrency level as a closed loop: that many
+simulated clients send their next request as soon as the previous one
+returns, until --requests have completed. Each client has its own user and
+token. Requests/s, error count and p50/p95/p99 latency are printed and
+written as JSON (see benchmarks/compare.py for diffing two runs).
+
+Usage (from backend/):
+    python benchmarks/bench_api.py [--concurrency 1,8,32,128] [--requests 400]
+        [--scenarios skills_hit,analyze_local] [--llm-latency-ms 800] [--output PATH]
+"""
+import os
+import time
+import uuid
+import asyncio
+import argparse
+
+import harness  # before anything from the app
+
+import httpx
+import agent
+from main import app
+from resume_parser import PDF_CONTENT_TYPE, DOCX_CONTENT_TYPE
+
+HIT_TITLES = (
+    "Software Engineer", "Data Scientist", "Data Analyst", "DevOps Engineer", "Product Manager",
+    "Frontend Developer", "Backend Developer", "Machine Learning Engineer", "QA Engineer", "Cloud Architect",
+)
+SKILL_SETS = (
+    ["Python", "SQL", "Docker"], ["JavaScript", "React", "CSS"], ["Java", "Spring", "Kubernetes"],
+    ["Excel", "Tableau", "Communication"], ["Go", "AWS", "Terraform"], ["C++", "Linux", "Git"],
+)
+
+
+def _documents() -> list[tuple[str, bytes, str]]:
+    files = []
+    for name in sorted(os.listdir(harness.DOCUMENTS_DIR)):
+        content_type = PDF_CONTENT_TYPE if name.endswith(".pdf") else DOCX_CONTENT_TYPE
+        with open(os.path.join(harness.DOCUMENTS_DIR, name), "rb") as f:
+            files.append((name, f.read(), content_type))
+    return files
+
+
+# Each scenario maps a request number to the keyword arguments of client.request().
+def _scenarios(documents: list) -> dict:
+    return {
+        "root": lambda i: {"method": "GET", "url": "/"},
+        "skills_hit": lambda i: {"method": "POST", "url": "/api/get-skills-for-job", "json": {"job_title": HIT_TITLES[i % len(HIT_TITLES)]}},
+        "skills_miss": lambda i: {"method": "POST", "url": "/api/get-skills-for-job", "json": {"job_title": f"role {uuid.uuid4().hex}"}},
+        "skills_batch": lambda i: {"method": "POST", "url": "/api/get-skills-for-job/batch", "json": {"job_titles": list(HIT_TITLES[:5])}},
+        "analyze_local": lambda i: {"method": "POST", "url": "/api/analyze", "json": {"skills": SKILL_SETS[i % len(SKILL_SETS)], "job_title": HIT_TITLES[i % len(HIT_TITLES)]}},
+        "generate_path": lambda i: {"method": "POST", "url": "/api/generate-path", "json": {"current_skills": SKILL_SETS[i % len(SKILL_SETS)], "target_job": HIT_TITLES[i % len(HIT_TITLES)]}},
+        "suggest_skills": lambda i: {"method": "POST", "url": "/api/suggest-jobs", "data": {"skills": ", ".join(SKILL_SETS[i % len(SKILL_SETS)])}},
+        "suggest_resume": lambda i: {"method": "POST", "url": "/api/suggest-jobs", "files": {"resume_file": documents[i % len(documents)]}},
+        "my_paths": lambda i: {"method": "GET", "url": "/api/my-paths"},
+        "feedback": lambda i: {"method": "POST", "url": "/api/feedback", "json": {"suggestion_id": str(uuid.uuid4()), "job_title": HIT_TITLES[i % len(HIT_TITLES)], "rating": "up"}},
+    }
+
+
+async def _warm_up(client: httpx.AsyncClient, headers: list[dict]):
+    """Fills the skills cache for HIT_TITLES and gives every user a few saved paths."""
+    for title in HIT_TITLES:
+        await client.post("/api/get-skills-for-job", json={"job_title": title}, headers=headers[0])
+    path = {"milestones": ["Learn SQL"], "next_skills": ["SQL"], "recommended_actions": ["Take a course"]}
+    for user_headers in headers:
+        for title in HIT_TITLES[:3]:
+            await client.post("/api/save-path", json={"target_job": title, "path_data": path}, headers=user_headers)
+
+
+async def _run_level(client: httpx.AsyncClient, make_request, concurrency: int, total: int, headers: list[dict]) -> dict:
+    latencies, errors, statuses = [], 0, {}
+    next_request = 0
+
+    async def worker(user_headers):
+        nonlocal next_request, errors
+        while next_request < total:
+            i = next_request
+            next_request += 1
+            kwargs = make_request(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(headers=user_headers, **kwargs)
+                status = response.status_code
+            except Exception:
+                status = "exception"
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == "exception" or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(headers[n % len(headers)]) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    summary = harness.summarize(latencies, elapsed)
+    return {
+        "requests": summary["count"],
+        "errors": errors,
+        "statuses": statuses,
+        "rps": summary["per_second"],
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+    }
+
+
+async def run(args) -> list[dict]:
+    model = agent.get_model()
+    model.latency_ms = args.llm_latency_ms
+    model.latency_sigma = args.llm_latency_sigma
+    model.error_rate = args.llm_error_rate
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    headers = [{"Authorization": f"Bearer {harness.make_token(f'bench-user-{n}')}"} for n in range(max(levels))]
+    scenarios = _scenarios(_documents())
+    names = args.scenarios.split(",") if args.scenarios else list(scenarios)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await _warm_up(client, headers)
+            harness.report(f"{'scenario':<16}{'conc':>6}{'reqs':>7}{'err':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            for name in names:
+                for concurrency in levels:
+                    result = {"name": name, "concurrency": concurrency,
+                              **await _run_level(client, scenarios[name], concurrency, args.requests, headers)}
+                    results.append(result)
+                    harness.report(f"{name:<16}{concurrency:>6}{result['requests']:>7}{result['errors']:>6}{result['rps']:>10}"
+                          f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario and level")
+    parser.add_argument("--scenarios", default="", help="comma-separated subset of scenarios (default: all)")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="median fake LLM latency")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=os.path.join(harness.RESULTS_DIR, "api.json"))
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    args = parser.parse_args()
+
+    with harness.quiet(not args.verbose):
+        results = asyncio.run(run(args))
+    harness.write_results(args.output, "api", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
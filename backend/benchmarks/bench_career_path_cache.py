@@ -0,0 +1,108 @@
+"""
+Replays a synthetic /generate-path workload against career_path_cache.py at
+several similarity thresholds, to weigh LLM calls saved against how far a
+reused result's skill set was from the one asked about.
+
+Each request picks a target job from a Zipf distribution over --jobs, starts
+from one of --profiles typical skill sets for that job, and perturbs it: the
+skills are shuffled and re-cased, and with --perturb-rate probability one
+skill is added, dropped or swapped. Every threshold replays the same requests
+through agent.generate_career_path with the fake LLM and an empty cache.
+
+Usage (from backend/):
+    python benchmarks/bench_career_path_cache.py [--requests 2000] [--thresholds 1.01,0.9,0.8,0.7,0.6]
+        [--jobs 30] [--profiles 4] [--perturb-rate 0.5] [--output PATH]
+"""
+import os
+import random
+import asyncio
+import argparse
+
+import harness  # before anything from the app
+
+import agent
+import career_path_cache
+from skills import SKILL_ALIASES
+
+_SKILL_POOL = sorted(set(SKILL_ALIASES.values()))
+
+
+def _perturb(skills: list[str], rng: random.Random, rate: float) -> list[str]:
+    skills = list(skills)
+    if rng.random() < rate:
+        change = rng.choice(("add", "drop", "swap"))
+        if change in ("drop", "swap") and len(skills) > 1:
+            skills.pop(rng.randrange(len(skills)))
+        if change in ("add", "swap"):
+            skills.append(rng.choice(_SKILL_POOL))
+    rng.shuffle(skills)
+    return [skill.lower() if rng.random() < 0.5 else skill.title() for skill in skills]
+
+
+def _workload(args) -> list[tuple[list[str], str]]:
+    rng = random.Random(args.seed)
+    jobs = [f"Benchmark Role {i}" for i in range(args.jobs)]
+    profiles = {job: [rng.sample(_SKILL_POOL, rng.randint(args.min_skills, args.max_skills)) for _ in range(args.profiles)] for job in jobs}
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(jobs))]
+    requests = []
+    for job in rng.choices(jobs, weights=weights, k=args.requests):
+        requests.append((_perturb(rng.choice(profiles[job]), rng, args.perturb_rate), job))
+    return requests
+
+
+async def _run(requests: list, threshold: float) -> dict:
+    cache = career_path_cache.CareerPathCache(len(requests), 3600, threshold)
+    agent.career_path_cache = cache
+    calls_before = agent.llm.stats()["calls"]
+    for skills, job in requests:
+        await agent.generate_career_path(skills, job)
+    stats = cache.stats()
+    return {
+        "name": f"threshold[{threshold}]",
+        "requests": len(requests),
+        "llm_calls": agent.llm.stats()["calls"] - calls_before,
+        "exact_hits": stats["exact_hits"],
+        "similar_hits": stats["similar_hits"],
+        "hit_rate": round(stats["hit_rate"], 4),
+        "similarity": stats["similarity"],
+    }
+
+
+async def run(args) -> list[dict]:
+    model = agent.get_model()
+    model.latency_ms = 0
+    model.latency_sigma = 0
+    requests = _workload(args)
+    results = []
+    harness.report(f"{'threshold':<20}{'requests':>9}{'llm calls':>11}{'exact':>8}{'similar':>9}{'hit rate':>10}")
+    for threshold in (float(value) for value in args.thresholds.split(",")):
+        result = await _run(requests, threshold)
+        results.append(result)
+        harness.report(f"{result['name']:<20}{result['requests']:>9}{result['llm_calls']:>11}{result['exact_hits']:>8}"
+                       f"{result['similar_hits']:>9}{result['hit_rate']:>10.1%}")
+    harness.report("best similarity on exact misses: " + ", ".join(f"{name}: {count}" for name, count in results[0]["similarity"].items()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--thresholds", default="1.01,0.9,0.8,0.7,0.6", help="comma-separated; above 1 means exact matches only")
+    parser.add_argument("--jobs", type=int, default=30)
+    parser.add_argument("--profiles", type=int, default=4, help="typical skill sets per job")
+    parser.add_argument("--min-skills", type=int, default=4)
+    parser.add_argument("--max-skills", type=int, default=10)
+    parser.add_argument("--perturb-rate", type=float, default=0.5, help="share of requests with one skill added, dropped or swapped")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of job popularity")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join(harness.RESULTS_DIR, "career_path_cache.json"))
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    args = parser.parse_args()
+
+    with harness.quiet(not args.verbose):
+        results = asyncio.run(run(args))
+    harness.write_results(args.output, "career_path_cache", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
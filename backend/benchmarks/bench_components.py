@@ -0,0 +1,162 @@
+"""
+Micro-benchmarks for the pieces behind the API hot paths, run in-process with
+the offline backends from harness.py:
+
+  parse_*        resume_parser on every document in benchmarks/documents, both
+                 the bare parse in this process and parse_resume_content
+                 through the process pool (IPC and page splitting included)
+  skills_*       agent.get_skills_for_job on a memory hit, a Firestore hit
+                 (memory tier cleared) and a miss that goes to the fake LLM
+  verify_token_* auth_utils.verify_token on new tokens (signature checked) and
+                 on repeats (served from the token cache)
+
+Results are printed and written as JSON (see benchmarks/compare.py).
+
+Usage (from backend/):
+    python benchmarks/bench_components.py [--iterations 200] [--only parse,skills,verify_token]
+        [--llm-latency-ms 0] [--output PATH]
+"""
+import os
+import time
+import uuid
+import asyncio
+import argparse
+
+import harness  # before anything from the app
+
+import agent
+import auth_utils
+import skills_cache
+import resume_parser
+from resume_parser import PDF_CONTENT_TYPE, DOCX_CONTENT_TYPE
+
+
+def _result(name: str, latencies: list[float], elapsed: float, **extra) -> dict:
+    summary = harness.summarize(latencies, elapsed)
+    result = {
+        "name": name,
+        "iterations": summary["count"],
+        "ops_per_s": summary["per_second"],
+        "mean_ms": summary["mean_ms"],
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+        **extra,
+    }
+    harness.report(f"{name:<44}{result['iterations']:>7}{result['ops_per_s']:>11}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+    return result
+
+
+async def _measure(name: str, iterations: int, call, **extra) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        op_started = time.perf_counter()
+        await call(i)
+        latencies.append(time.perf_counter() - op_started)
+    return _result(name, latencies, time.perf_counter() - started, **extra)
+
+
+def _parse_locally(content: bytes, content_type: str) -> str:
+    """The parse work alone, in this process, as one pool worker would do it."""
+    if content_type == DOCX_CONTENT_TYPE:
+        return resume_parser._parse_docx(content)
+    _, text = resume_parser._parse_pdf_head(content, resume_parser.RESUME_MAX_PAGES, resume_parser.RESUME_MAX_PAGES)
+    return text
+
+
+async def bench_parse(iterations: int) -> list[dict]:
+    documents = []
+    for name in sorted(os.listdir(harness.DOCUMENTS_DIR)):
+        with open(os.path.join(harness.DOCUMENTS_DIR, name), "rb") as f:
+            documents.append((name, f.read(), PDF_CONTENT_TYPE if name.endswith(".pdf") else DOCX_CONTENT_TYPE))
+    # Start the workers first so their spawn cost is not charged to the first document.
+    await asyncio.gather(*(resume_parser.parse_resume_content(content, content_type) for _, content, content_type in documents))
+
+    results = []
+    for name, content, content_type in documents:
+
+        async def local(i):
+            _parse_locally(content, content_type)
+
+        async def pooled(i):
+            await resume_parser.parse_resume_content(content, content_type)
+
+        results.append(await _measure(f"parse_local[{name}]", iterations, local, bytes=len(content)))
+        results.append(await _measure(f"parse_pool[{name}]", iterations, pooled, bytes=len(content)))
+    return results
+
+
+async def bench_skills(iterations: int) -> list[dict]:
+    title = "Software Engineer"
+    await agent.get_skills_for_job(title)
+
+    async def memory_hit(i):
+        await agent.get_skills_for_job(title)
+
+    async def firestore_hit(i):
+        skills_cache._memory.clear()
+        await agent.get_skills_for_job(title)
+
+    async def miss(i):
+        await agent.get_skills_for_job(f"role {uuid.uuid4().hex}")
+
+    return [
+        await _measure("skills_memory_hit", iterations, memory_hit),
+        await _measure("skills_firestore_hit", iterations, firestore_hit),
+        await _measure("skills_miss", iterations, miss),
+    ]
+
+
+async def bench_verify_token(iterations: int) -> list[dict]:
+    cold_tokens = [harness.make_token(f"cold-user-{i}") for i in range(iterations)]
+    warm_token = harness.make_token("warm-user")
+    await auth_utils.verify_token(warm_token)
+
+    async def cold(i):
+        await auth_utils.verify_token(cold_tokens[i])
+
+    async def cached(i):
+        await auth_utils.verify_token(warm_token)
+
+    return [
+        await _measure("verify_token_new", iterations, cold),
+        await _measure("verify_token_cached", iterations, cached),
+    ]
+
+
+BENCHMARKS = {"parse": bench_parse, "skills": bench_skills, "verify_token": bench_verify_token}
+
+
+async def run(args) -> list[dict]:
+    model = agent.get_model()
+    model.latency_ms = args.llm_latency_ms
+    model.latency_sigma = 0
+    harness.install_signing_key()
+
+    harness.report(f"{'benchmark':<44}{'iters':>7}{'ops/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    results = []
+    try:
+        for name in (args.only.split(",") if args.only else BENCHMARKS):
+            results += await BENCHMARKS[name](args.iterations)
+    finally:
+        resume_parser.shutdown_parser_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--only", default="", help="comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="fake LLM latency for skills_miss")
+    parser.add_argument("--output", default=os.path.join(harness.RESULTS_DIR, "components.json"))
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    args = parser.parse_args()
+
+    with harness.quiet(not args.verbose):
+        results = asyncio.run(run(args))
+    harness.write_results(args.output, "components", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures JobSkillMatrix build and ranking time against a synthetic catalogue.
+
+Usage (from backend/):
+    python benchmarks/bench_job_matrix.py --jobs 50000 --queries 1000
+"""
+import os
+import sys
+import time
+import random
+import itertools
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_matrix import JobSkillMatrix
+
+
+def _percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--skills", type=int, default=5000, help="size of the skill vocabulary")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"skill_{i:04d}" for i in range(args.skills)]
+    # Skewed popularity, so common skills have long posting lists like real data.
+    popularity = list(itertools.accumulate(1.0 / (i + 1) ** 0.8 for i in range(args.skills)))
+
+    matrix = JobSkillMatrix()
+    started = time.perf_counter()
+    for i in range(args.jobs):
+        matrix.add_job(f"job_{i}", f"Job {i}", {
+            # Two requirements met by any of three alternatives ("a/b/c"), like "Cloud platforms (AWS, GCP, Azure)".
+            "technical_skills": rng.choices(vocabulary, cum_weights=popularity, k=13)
+                + ["/".join(rng.choices(vocabulary, cum_weights=popularity, k=3)) for _ in range(2)],
+            "tool_skills": rng.choices(vocabulary, cum_weights=popularity, k=6),
+            "soft_skills": rng.choices(vocabulary, cum_weights=popularity, k=4),
+        })
+    build_seconds = time.perf_counter() - started
+
+    timings = []
+    for _ in range(args.queries):
+        user_skills = rng.choices(vocabulary, cum_weights=popularity, k=rng.randint(5, 30))
+        started = time.perf_counter()
+        matrix.rank(user_skills, top_k=5)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"jobs={args.jobs} vocabulary={args.skills} queries={args.queries}")
+    print(f"build: {build_seconds:.2f}s ({build_seconds / args.jobs * 1e6:.1f}us per job)")
+    print(f"rank:  p50={_percentile(timings, 50):.3f}ms p95={_percentile(timings, 95):.3f}ms "
+          f"p99={_percentile(timings, 99):.3f}ms max={max(timings):.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Runs the prewarm scheduler (prewarm.py) against the fake LLM and the
+in-memory Firestore, and measures how many user lookups of job skills still
+had to wait for the LLM, with and without it.
+
+The cache is seeded with --titles entries whose ages are spread over
+--min-age-days..--max-age-days. Each round stands for --days-per-round of
+traffic: --lookups user lookups drawn from a Zipf distribution over the
+titles, plus titles that the previous round's job suggestions showed, after
+which the scheduler gets --budget fetches and the clock is moved forward
+(cached_at dates, expiry times and demand timestamps are shifted back, and
+the memory tier is cleared), so entries go stale while they are in demand.
+A lookup is counted as cold when it took longer than half the fake LLM
+latency.
+
+Usage (from backend/):
+    python benchmarks/bench_prewarm.py [--titles 300] [--rounds 30] [--lookups 100] [--budget 10]
+        [--days-per-round 1] [--llm-latency-ms 20] [--output PATH]
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone, timedelta
+
+import harness  # before anything from the app
+
+import agent
+import database
+import prewarm
+import skills_cache
+from title_index import legacy_doc_id
+
+
+async def _seed(titles: list[str], rng: random.Random, min_age_days: float, max_age_days: float):
+    db = database.get_db()
+    now = datetime.now(timezone.utc)
+    for title in titles:
+        skills_data = {"technical_skills": [f"{title} skill"], "soft_skills": ["Communication"], "tool_skills": ["Git"]}
+        cached_at = now - timedelta(days=rng.uniform(min_age_days, max_age_days))
+        await db.collection('job_skills_cache').document(legacy_doc_id(title)).set(
+            {'job_title': title, 'skills_data': skills_data, 'cached_at': cached_at}
+        )
+    await skills_cache.load_cached_jobs()
+
+
+def _advance(days: float):
+    """Moves the simulated clock forward by aging everything that carries a timestamp."""
+    delta = timedelta(days=days)
+    for path, data in database.get_db()._documents.items():
+        if path.startswith("job_skills_cache/"):
+            data['cached_at'] -= delta
+    scheduler = skills_cache.prewarmer
+    for doc_id in scheduler._expires:
+        scheduler._expires[doc_id] -= delta
+    for entry in scheduler._demand.values():
+        entry[1] -= delta.total_seconds()
+    skills_cache._memory.clear()
+
+
+def _reset():
+    database._memory_db = None
+    skills_cache._memory.clear()
+    skills_cache.prewarmer = prewarm.Prewarmer()
+    agent.llm.breaker.record_success()
+
+
+async def _run(args, with_prewarm: bool) -> dict:
+    _reset()
+    rng = random.Random(args.seed)
+    titles = [f"Seeded Role {i}" for i in range(args.titles)]
+    await _seed(titles, rng, args.min_age_days, args.max_age_days)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(titles))]
+
+    scheduler = skills_cache.prewarmer
+    scheduler._fetch, scheduler._load = agent.prewarm_job_skills, agent.llm_load
+    cold_threshold = args.llm_latency_ms / 2000
+    shown, cold, lookups, prewarm_calls = [], 0, 0, 0
+
+    for round_number in range(args.rounds):
+        batch = rng.choices(titles, weights=weights, k=args.lookups)
+        # Users open some of the titles an earlier round's suggestions showed them.
+        batch += [title for title in shown if rng.random() < args.click_rate]
+        for title in batch:
+            started = time.perf_counter()
+            await agent.get_skills_for_job(title)
+            lookups += 1
+            cold += time.perf_counter() - started > cold_threshold
+
+        new_titles = [f"Suggested Role {round_number}-{i}" for i in range(args.suggestions)]
+        shown = new_titles
+        if with_prewarm:
+            skills_cache.prefill(new_titles)
+            for _ in range(args.budget):
+                prewarm_calls += await scheduler.run_once()
+        _advance(args.days_per_round)
+
+    return {
+        "name": "with_prewarm" if with_prewarm else "without_prewarm",
+        "lookups": lookups,
+        "cold_lookups": cold,
+        "cold_share": round(cold / lookups, 4) if lookups else 0.0,
+        "prewarm_llm_calls": prewarm_calls,
+        "prewarm": scheduler.stats(),
+    }
+
+
+async def run(args) -> list[dict]:
+    model = agent.get_model()
+    model.latency_ms = args.llm_latency_ms
+    model.latency_sigma = 0
+    results = []
+    harness.report(f"{'mode':<18}{'lookups':>9}{'cold':>7}{'cold %':>9}{'prewarm calls':>15}")
+    for with_prewarm in (False, True):
+        result = await _run(args, with_prewarm)
+        results.append(result)
+        harness.report(f"{result['name']:<18}{result['lookups']:>9}{result['cold_lookups']:>7}"
+                       f"{result['cold_share']:>9.1%}{result['prewarm_llm_calls']:>15}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--lookups", type=int, default=100, help="user lookups per round")
+    parser.add_argument("--budget", type=int, default=10, help="scheduler fetches per round")
+    parser.add_argument("--suggestions", type=int, default=5, help="new suggested titles per round")
+    parser.add_argument("--click-rate", type=float, default=0.5, help="share of suggested titles users open")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of title popularity")
+    parser.add_argument("--days-per-round", type=float, default=1)
+    parser.add_argument("--min-age-days", type=float, default=0)
+    parser.add_argument("--max-age-days", type=float, default=30)
+    parser.add_argument("--llm-latency-ms", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join(harness.RESULTS_DIR, "prewarm.json"))
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    args = parser.parse_args()
+
+    with harness.quiet(not args.verbose):
+        results = asyncio.run(run(args))
+    harness.write_results(args.output, "prewarm", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
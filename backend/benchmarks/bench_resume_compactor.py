@@ -0,0 +1,61 @@
+"""
+Compares the prompt input produced by resume_compactor against the old
+resume_text[:4000] slice over the sample resumes in benchmarks/corpus.
+
+For every resume it reports the estimated tokens of the old slice and the
+compacted text, and whether each one still contains the skills section.
+
+Usage (from backend/):
+    python benchmarks/bench_resume_compactor.py [--budget 1000] [--corpus DIR]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resume_compactor import compact_resume, estimate_tokens, split_sections
+
+
+def _skills_lines(text: str) -> list[str]:
+    return [line for section, lines in split_sections(text) if section == "skills" for line in lines]
+
+
+def _keeps(prompt_input: str, lines: list[str]) -> str:
+    """Whether every skills line survives, compared after the same normalization."""
+    if not lines:
+        return "n/a"
+    kept = {line for _, section_lines in split_sections(prompt_input) for line in section_lines}
+    return "yes" if all(line in kept for line in lines) else "no"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default: RESUME_TOKEN_BUDGET)")
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus"))
+    args = parser.parse_args()
+    budget_kwargs = {"budget": args.budget} if args.budget else {}
+
+    print(f"{'resume':<28}{'chars':>7}{'full tok':>10}{'slice tok':>11}{'compact tok':>13}{'skills slice/compact':>22}{'ms':>7}")
+    totals = [0, 0, 0]
+    for name in sorted(os.listdir(args.corpus)):
+        with open(os.path.join(args.corpus, name), encoding="utf-8") as f:
+            text = f.read()
+        started = time.perf_counter()
+        compacted = compact_resume(text, **budget_kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        old_slice = text[:4000]
+        skills = _skills_lines(text)
+        row = (estimate_tokens(text), estimate_tokens(old_slice), estimate_tokens(compacted))
+        totals = [total + value for total, value in zip(totals, row)]
+        kept = f"{_keeps(old_slice, skills)}/{_keeps(compacted, skills)}"
+        print(f"{name:<28}{len(text):>7}{row[0]:>10}{row[1]:>11}{row[2]:>13}{kept:>22}{elapsed:>7.2f}")
+
+    saved = 1 - totals[2] / totals[1] if totals[1] else 0.0
+    print(f"{'total':<28}{'':>7}{totals[0]:>10}{totals[1]:>11}{totals[2]:>13}")
+    print(f"compacted input is {saved:.0%} smaller than the [:4000] slice")
+
+
+if __name__ == "__main__":
+    main()
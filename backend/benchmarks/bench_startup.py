@@ -0,0 +1,132 @@
+"""
+Cold-start profile: starts the app in fresh interpreters and reports, per
+run, how long each module took to import (python -X importtime), how long
+until GET / answered, and how long each background initialization step took
+(the startup_step timings from telemetry.py).
+
+Module times are cumulative, so a module includes everything it imported
+first; a package imported earlier by another module costs nothing here.
+The Gemini SDK is loaded with a placeholder key (no request is made), so its
+import and setup are part of the profile; Firestore uses the in-memory fake.
+
+Results are printed as medians over --runs and written as JSON (see
+benchmarks/compare.py).
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--runs 5] [--modules fastapi,numpy] [--output PATH]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import harness
+
+# Third-party packages reported alongside the app's own modules.
+DEFAULT_MODULES = (
+    "fastapi", "httpx", "jwt", "numpy", "firebase_admin", "google.api_core.exceptions",
+    "google.cloud.firestore", "google.generativeai", "pypdf", "docx",
+)
+_INIT_STEPS = ("firebase", "model", "firestore", "cached_jobs")
+
+# Runs inside each fresh interpreter; prints one RESULT line for the parent.
+_CHILD = """
+import time
+started = time.perf_counter()
+import asyncio, json
+import main
+imported = time.perf_counter() - started
+import httpx
+import telemetry
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/")
+            first_response = time.perf_counter() - started
+        while not all(step in telemetry._startup for step in STEPS) and time.perf_counter() - started < 60:
+            await asyncio.sleep(0.005)
+        warm = time.perf_counter() - started
+    return response.status_code, first_response, warm
+
+status, first_response, warm = asyncio.run(run())
+print("RESULT " + json.dumps({
+    "status": status, "import_main": imported, "first_response": first_response,
+    "warm": warm, "steps": telemetry._startup,
+}))
+"""
+
+
+def _first_party_modules() -> set[str]:
+    return {name[:-3] for name in os.listdir(harness.BACKEND_DIR) if name.endswith(".py")}
+
+
+def _import_times(stderr: str, modules: set[str]) -> dict:
+    """Cumulative seconds per tracked module, from -X importtime output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name in modules and name not in times:
+            times[name] = int(cumulative) / 1e6
+    return times
+
+
+def _run_once(modules: set[str]) -> dict:
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    if env.get("LLM_BACKEND") == "gemini":
+        env.setdefault("GEMINI_API_KEY", "bench-placeholder")
+    child = _CHILD.replace("STEPS", repr(_INIT_STEPS))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", child],
+        cwd=harness.BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+    )
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("RESULT ")]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f"Startup run failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(lines[-1][len("RESULT "):])
+    result["imports"] = _import_times(completed.stderr, modules)
+    return result
+
+
+def _result(name: str, samples: list[float]) -> dict:
+    summary = harness.summarize(samples, 0)
+    result = {"name": name, "runs": summary["count"], "mean_ms": summary["mean_ms"], "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"]}
+    harness.report(f"{name:<44}{result['runs']:>6}{result['p50_ms']:>11}{result['p95_ms']:>11}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", default=",".join(DEFAULT_MODULES), help="comma-separated third-party modules to report")
+    parser.add_argument("--llm-backend", default="gemini", help="gemini (placeholder key, SDK loaded) or fake")
+    parser.add_argument("--output", default=os.path.join(harness.RESULTS_DIR, "startup.json"))
+    args = parser.parse_args()
+    os.environ["LLM_BACKEND"] = args.llm_backend
+
+    modules = _first_party_modules() | set(args.modules.split(","))
+    runs = [_run_once(modules) for _ in range(args.runs)]
+
+    harness.report(f"{'startup':<44}{'runs':>6}{'p50 ms':>11}{'p95 ms':>11}")
+    results = [
+        _result("import_main", [run["import_main"] for run in runs]),
+        _result("first_response", [run["first_response"] for run in runs]),
+        _result("warm", [run["warm"] for run in runs]),
+    ]
+    for step in _INIT_STEPS:
+        results.append(_result(f"init[{step}]", [run["steps"].get(step, 0.0) for run in runs]))
+    by_cost = sorted(modules, key=lambda module: -sum(run["imports"].get(module, 0.0) for run in runs))
+    for module in by_cost:
+        samples = [run["imports"][module] for run in runs if module in run["imports"]]
+        if samples:
+            results.append(_result(f"import[{module}]", samples))
+    harness.write_results(args.output, "startup", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares two result files from bench_api.py or bench_components.py and exits
+non-zero when the current run regressed against the baseline.
+
+Results are matched by name (and concurrency, for the API benchmark).
+Throughput may not drop, and p50/p95/p99 may not rise, by more than
+--tolerance (relative). Changes that add less than --min-ms per operation
+are ignored as noise.
+
+Usage (from backend/):
+    python benchmarks/compare.py BASELINE.json CURRENT.json [--tolerance 0.15] [--min-ms 0.5]
+"""
+import sys
+import json
+import argparse
+
+# metric -> True when higher is better
+METRICS = {"rps": True, "ops_per_s": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {(result["name"], result.get("concurrency")): result for result in report["results"]}
+
+
+def compare(baseline: dict, current: dict, tolerance: float, min_ms: float) -> list[str]:
+    regressions = []
+    print(f"{'result':<48}{'metric':>10}{'baseline':>12}{'current':>12}{'change':>9}")
+    for key in sorted(baseline.keys() & current.keys(), key=str):
+        label = key[0] if key[1] is None else f"{key[0]} @{key[1]}"
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline[key].get(metric), current[key].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            # Compare as time per operation against the noise floor, so sub-ms operations do not flap.
+            added_ms = (1000 / new - 1000 / old if new else float("inf")) if higher_is_better else new - old
+            regressed = worse > tolerance and added_ms >= min_ms
+            marker = "  <-- regression" if regressed else ""
+            print(f"{label:<48}{metric:>10}{old:>12}{new:>12}{change:>+9.1%}{marker}")
+            if regressed:
+                regressions.append(f"{label} {metric}: {old} -> {new} ({change:+.1%})")
+    for key in sorted(baseline.keys() - current.keys(), key=str):
+        print(f"missing from current run: {key[0]}" + (f" @{key[1]}" if key[1] is not None else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative change before failing")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore latency increases smaller than this")
+    args = parser.parse_args()
+
+    regressions = compare(_load(args.baseline), _load(args.current), args.tolerance, args.min_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Shared setup for the in-process benchmarks (bench_api, bench_components).
+
+Importing this module points the app at its offline backends before anything
+from the app is imported: the fake LLM (fake_llm.py), the in-memory Firestore
+(memory_firestore.py) and a locally generated RSA key that stands in for
+Google's token signing certificates. Tokens from make_token() therefore go
+through the real verification path in auth_utils without any network.
+Per-user rate limits are off and the LLM queue is effectively unbounded, so
+the load tests measure throughput rather than admission control.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+os.environ.setdefault("FIREBASE_PROJECT_ID", "bench-project")
+# A few users send every request, which per-user limits would mostly refuse.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("LLM_MAX_QUEUE", "100000")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+DOCUMENTS_DIR = os.path.join(BENCH_DIR, "documents")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, BACKEND_DIR)
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+import auth_utils
+
+_KEY_ID = "bench"
+_private_key = None
+
+
+def install_signing_key():
+    """Replaces the signing certificates with a local key that never expires."""
+    global _private_key
+    _private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    auth_utils._keys = {_KEY_ID: _private_key.public_key()}
+    auth_utils._keys_fetched_at = time.monotonic()
+    auth_utils._keys_expire_at = time.monotonic() + 10 ** 9
+
+
+def make_token(uid: str, lifetime: int = 3600) -> str:
+    """Signs a Firebase-shaped ID token for uid with the local key."""
+    if _private_key is None:
+        install_signing_key()
+    project_id = os.environ["FIREBASE_PROJECT_ID"]
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "aud": project_id,
+        "sub": uid,
+        "iat": now,
+        "auth_time": now,
+        "exp": now + lifetime,
+    }
+    return jwt.encode(claims, _private_key, algorithm="RS256", headers={"kid": _KEY_ID})
+
+
+def report(line: str):
+    """Prints to the real stdout, which quiet() leaves alone."""
+    sys.__stdout__.write(line + "\n")
+    sys.__stdout__.flush()
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Discards the app's log output while a benchmark runs."""
+    if not enabled:
+        yield
+        return
+    logging.disable(logging.CRITICAL)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """Throughput and latency percentiles (in ms) for a list of per-operation seconds."""
+    if not latencies:
+        return {"count": 0, "per_second": 0.0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "count": len(latencies),
+        "per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_results(path: str, benchmark: str, settings: dict, results: list[dict]):
+    """Writes a machine-readable result file; benchmarks/compare.py diffs two of them."""
+    report = {
+        "benchmark": benchmark,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": settings,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
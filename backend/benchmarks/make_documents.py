@@ -0,0 +1,97 @@
+"""
+Builds the PDF and DOCX resumes in benchmarks/documents from the text resumes
+in benchmarks/corpus, plus one long multi-page PDF that takes the parallel
+page-range path in resume_parser. The output is committed; rerun this only
+when the corpus changes.
+
+PDFs are written directly (one Helvetica text stream per page) so no PDF
+library beyond what the app already uses is needed.
+
+Usage (from backend/):
+    python benchmarks/make_documents.py
+"""
+import os
+import docx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(HERE, "corpus")
+DOCUMENTS = os.path.join(HERE, "documents")
+
+_LINES_PER_PAGE = 56
+_MAX_LINE_CHARS = 95
+# The long PDF repeats this resume until it has this many pages.
+_LONG_SOURCE = "ml_engineer_long.txt"
+_LONG_PAGES = 24
+
+
+def _pdf_text(line: str) -> str:
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(lines: list[str]) -> list[str]:
+    wrapped = []
+    for line in lines:
+        while len(line) > _MAX_LINE_CHARS:
+            cut = line.rfind(" ", 0, _MAX_LINE_CHARS)
+            cut = cut if cut > 0 else _MAX_LINE_CHARS
+            wrapped.append(line[:cut])
+            line = line[cut:].lstrip()
+        wrapped.append(line)
+    return wrapped
+
+
+def write_pdf(path: str, lines: list[str]):
+    lines = _wrap(lines)
+    pages = [lines[i:i + _LINES_PER_PAGE] for i in range(0, len(lines), _LINES_PER_PAGE)] or [[]]
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page and its content stream per page.
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in pages:
+        body = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({_pdf_text(line)}) Tj T*" for line in page) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, lines: list[str]):
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def main():
+    os.makedirs(DOCUMENTS, exist_ok=True)
+    for name in sorted(os.listdir(CORPUS)):
+        with open(os.path.join(CORPUS, name), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        stem = os.path.splitext(name)[0]
+        write_pdf(os.path.join(DOCUMENTS, f"{stem}.pdf"), lines)
+        write_docx(os.path.join(DOCUMENTS, f"{stem}.docx"), lines)
+        if name == _LONG_SOURCE:
+            long_lines = []
+            while len(_wrap(long_lines)) < _LONG_PAGES * _LINES_PER_PAGE:
+                long_lines += lines + [""]
+            write_pdf(os.path.join(DOCUMENTS, f"{stem}_{_LONG_PAGES}p.pdf"), long_lines)
+    print(f"Wrote {len(os.listdir(DOCUMENTS))} documents to {DOCUMENTS}")
+
+
+if __name__ == "__main__":
+    main()
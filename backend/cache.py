@@ -0,0 +1,88 @@
+"""
+A small in-process LRU cache with per-entry TTLs, negative entries and
+hit/miss/eviction counters. Not thread-safe; meant for use on the event loop.
+"""
+import time
+from collections import OrderedDict
+
+MISSING = object()
+NEGATIVE = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, count=False) is not MISSING
+
+    def get(self, key, default=MISSING, count: bool = True):
+        """
+        Returns the live value for key, NEGATIVE for a live negative entry,
+        or default when the key is absent or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            if count:
+                self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        if count:
+            if entry[0] is NEGATIVE:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set_negative(self, key, ttl: float):
+        """Remembers that key just failed, so callers can skip retrying it for ttl seconds."""
+        self.set(key, NEGATIVE, ttl)
+
+    def keys(self) -> list:
+        """Keys of the live entries, least recently used first, without touching their recency."""
+        now = time.monotonic()
+        return [key for key, (_, expires_at) in self._entries.items() if expires_at > now]
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
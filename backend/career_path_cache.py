@@ -0,0 +1,146 @@
+"""
+Result cache for generate_career_path, with near-duplicate lookup.
+
+Entries are keyed by the normalized target job and the sorted set of
+normalized skills, so the same skills in another order, case or spelling hit
+exactly. On an exact miss, the entries for the same job that share at least
+one skill (found through an inverted (job, skill) -> keys index) are compared
+by Jaccard similarity of their skill sets, and the closest one is served when
+it reaches CAREER_PATH_SIMILARITY_THRESHOLD. Next skills the requester already
+has are removed from a reused result.
+
+A job rarely has more than a few hundred cached skill sets, so the exact
+comparison costs well under a millisecond and no MinHash approximation is
+needed. stats() reports exact and similar hits, misses, and how the best
+similarity found on each exact miss was distributed, including the matches
+below the threshold: the count in a bucket is the number of LLM calls that
+moving the threshold down to it would have saved.
+"""
+import os
+from cache import TTLCache, MISSING
+from skills import normalize_skill
+
+CAREER_PATH_CACHE_MAX_ENTRIES = int(os.getenv("CAREER_PATH_CACHE_MAX_ENTRIES", "2048"))
+CAREER_PATH_CACHE_TTL_SECONDS = float(os.getenv("CAREER_PATH_CACHE_TTL_SECONDS", "86400"))
+# Jaccard similarity of skill sets needed to reuse a result; above 1 only exact matches are served.
+CAREER_PATH_SIMILARITY_THRESHOLD = float(os.getenv("CAREER_PATH_SIMILARITY_THRESHOLD", "0.8"))
+
+# Lower bounds of the similarity distribution buckets.
+_SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.9)
+_FIELDS = ("milestones", "next_skills", "recommended_actions")
+
+
+def _bucket_names() -> list[str]:
+    bounds = _SIMILARITY_BUCKETS + (1.0,)
+    return [f"lt_{bounds[0]}"] + [f"{low}-{high}" for low, high in zip(bounds, bounds[1:])]
+
+
+class CareerPathCache:
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.threshold = threshold
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._index = {}   # (job, skill) -> keys of entries whose skill set contains it
+        self._stored_since_prune = 0
+        self._counters = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "stored": 0}
+        self._similarity = dict.fromkeys(_bucket_names(), 0)
+
+    def get(self, key: tuple) -> dict | None:
+        """
+        Returns the result cached for key, a (normalized job, sorted skills)
+        pair, or for the most similar skill set of the same job; else None.
+        """
+        value = self._entries.get(key, count=False)
+        if value is not MISSING:
+            self._counters["exact_hits"] += 1
+            return dict(value)
+
+        job, skills = key
+        wanted = set(skills)
+        best, best_value = 0.0, None
+        for candidate in self._candidates(job, skills):
+            other = set(candidate[1])
+            similarity = len(wanted & other) / len(wanted | other)
+            if similarity <= best:
+                continue
+            value = self._entries.get(candidate, count=False)
+            if value is MISSING:
+                self._unindex(candidate)
+                continue
+            best, best_value = similarity, value
+
+        self._observe(best)
+        if best_value is None or best < self.threshold:
+            self._counters["misses"] += 1
+            return None
+        self._counters["similar_hits"] += 1
+        result = dict(best_value)
+        result["next_skills"] = [skill for skill in result.get("next_skills", []) if normalize_skill(skill) not in wanted]
+        return result
+
+    def set(self, key: tuple, result: dict):
+        """Caches a generated career path; results with nothing in them are not kept."""
+        if not isinstance(result, dict) or not any(result.get(field) for field in _FIELDS):
+            return
+        self._entries.set(key, result)
+        self._counters["stored"] += 1
+        job, skills = key
+        for skill in skills:
+            self._index.setdefault((job, skill), set()).add(key)
+        self._stored_since_prune += 1
+        # Evicted and expired keys are dropped lazily by get(); a full sweep
+        # every maxsize writes keeps the index bounded for jobs nobody asks for again.
+        if self._stored_since_prune >= self._entries.maxsize:
+            self._prune()
+
+    def _candidates(self, job: str, skills: tuple) -> set:
+        candidates = set()
+        for skill in skills:
+            candidates |= self._index.get((job, skill), set())
+        return candidates
+
+    def _unindex(self, key: tuple):
+        job, skills = key
+        for skill in skills:
+            keys = self._index.get((job, skill))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(job, skill)]
+
+    def _prune(self):
+        self._stored_since_prune = 0
+        live = set(self._entries.keys())
+        for index_key, keys in list(self._index.items()):
+            keys &= live
+            if not keys:
+                del self._index[index_key]
+
+    def _observe(self, similarity: float):
+        names = list(self._similarity)
+        position = sum(similarity >= bound for bound in _SIMILARITY_BUCKETS)
+        self._similarity[names[position]] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
+
+    def stats(self) -> dict:
+        hits = self._counters["exact_hits"] + self._counters["similar_hits"]
+        lookups = hits + self._counters["misses"]
+        entries = self._entries.stats()
+        return {
+            **self._counters,
+            "size": entries["size"],
+            "maxsize": entries["maxsize"],
+            "evictions": entries["evictions"],
+            "expirations": entries["expirations"],
+            "threshold": self.threshold,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            # Best similarity found on exact misses, served or not.
+            "similarity": dict(self._similarity),
+        }
+
+
+career_path_cache = CareerPathCache(
+    CAREER_PATH_CACHE_MAX_ENTRIES, CAREER_PATH_CACHE_TTL_SECONDS, CAREER_PATH_SIMILARITY_THRESHOLD
+)
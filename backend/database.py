@@ -1,39 +1,141 @@
+import logging
 import os
-from google.cloud import firestore
+import json
+import asyncio
+import random
+import hashlib
+import itertools
+import weakref
 from datetime import datetime, timezone, timedelta
+from cache import TTLCache
+from write_behind import WriteBehindQueue
+from telemetry import span
 
-# --- Firestore Client Initialization ---
-try:
-    db = firestore.Client()
-    print("Firestore client initialized successfully.")
-except Exception as e:
-    print(f"Error initializing Firestore client: {e}")
-    db = None
+logger = logging.getLogger(__name__)
+
+# --- Firestore Client Pool ---
+# FIRESTORE_BACKEND=memory swaps in the in-process fake from memory_firestore.py.
+FIRESTORE_BACKEND = os.getenv("FIRESTORE_BACKEND", "firestore")
+FIRESTORE_POOL_SIZE = int(os.getenv("FIRESTORE_POOL_SIZE", "4"))
+
+# Entries in job_skills_cache older than this are treated as stale.
+JOB_SKILLS_MAX_AGE = timedelta(days=30)
+
+# AsyncClient channels are bound to the event loop that first uses them,
+# so each loop gets its own round-robin pool of clients.
+_pools = weakref.WeakKeyDictionary()
+_memory_db = None
+
+def _create_pool() -> list:
+    clients = []
+    try:
+        # Imported on first use: the client library (gRPC, protobuf) is slow to load.
+        from google.cloud import firestore
+        for _ in range(FIRESTORE_POOL_SIZE):
+            clients.append(firestore.AsyncClient())
+        logger.info("Firestore async client pool initialized (%s clients).", FIRESTORE_POOL_SIZE)
+    except Exception as e:
+        logger.error("Error initializing Firestore client: %s", e)
+    return clients
+
+def get_db():
+    """Returns a pooled Firestore AsyncClient for the running loop, or None if unavailable."""
+    global _memory_db
+    if FIRESTORE_BACKEND == "memory":
+        if _memory_db is None:
+            from memory_firestore import AsyncClient as MemoryAsyncClient
+            _memory_db = MemoryAsyncClient()
+        return _memory_db
+
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        clients = _create_pool()
+        pool = (clients, itertools.cycle(clients)) if clients else None
+        _pools[loop] = pool
+    if pool is None:
+        return None
+    return next(pool[1])
+
+async def init_db():
+    """
+    Builds the running loop's client pool in a worker thread, so the import and
+    credential lookup do not block the loop. Called by the startup warm-up;
+    get_db() still builds the pool itself if a request needs it first.
+    """
+    if FIRESTORE_BACKEND == "memory":
+        get_db()
+        return
+    loop = asyncio.get_running_loop()
+    if loop in _pools:
+        return
+    clients = await asyncio.to_thread(_create_pool)
+    if loop in _pools:
+        # A request built the pool while this one was being created.
+        for client in clients:
+            client.close()
+        return
+    _pools[loop] = (clients, itertools.cycle(clients)) if clients else None
+
+async def close_db():
+    """Drains queued writes, then closes the client pool owned by the running loop."""
+    await write_queue.drain()
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool:
+        for client in pool[0]:
+            client.close()
+
+def _increment(amount: int):
+    if FIRESTORE_BACKEND == "memory":
+        from memory_firestore import Increment
+    else:
+        from google.cloud.firestore import Increment
+    return Increment(amount)
+
+def _transactional(fn):
+    if FIRESTORE_BACKEND == "memory":
+        from memory_firestore import async_transactional
+    else:
+        from google.cloud.firestore import async_transactional
+    return async_transactional(fn)
+
+def _forget_dropped_write(collection: str, document_id: str, data: dict):
+    # A skills profile that never reached Firestore must not suppress the next identical save.
+    if collection == 'users' and _last_saved_skills.get(document_id, count=False) == tuple(data['skills']):
+        _last_saved_skills.delete(document_id)
+
+# Feedback and skill profiles are written behind the request, in batches.
+write_queue = WriteBehindQueue(get_db, _increment, _forget_dropped_write, _transactional)
+# user id -> the skills last queued for them, so unchanged profiles are not rewritten.
+_last_saved_skills = TTLCache(maxsize=10000, ttl=86400)
+
+# Per-user saved-path listings: user id -> {(limit, start_after, summary): (paths, etag)}.
+# A user's entry is dropped whenever they save or delete a path.
+SAVED_PATHS_CACHE_TTL_SECONDS = float(os.getenv("SAVED_PATHS_CACHE_TTL_SECONDS", "300"))
+_paths_cache = TTLCache(maxsize=10000, ttl=SAVED_PATHS_CACHE_TTL_SECONDS)
+SAVED_PATH_SUMMARY_FIELDS = ['target_job', 'saved_at']
 
 # --- Database Functions ---
 
-def save_user_skills(user_id: str, skills: list):
-    """Saves or updates a user's skills in the Firestore database."""
-    if not db:
-        print("Database client not available. Cannot save skills.")
+async def save_user_skills(user_id: str, skills: list):
+    """Queues a write of a user's skills, unless they match the last write."""
+    if _last_saved_skills.get(user_id, count=False) == tuple(skills):
+        logger.debug("Skills unchanged for user: %s. Skipping write.", user_id)
         return
-    
-    user_ref = db.collection('users').document(user_id)
+
     user_data = {
         'userId': user_id,
         'skills': skills,
         'last_updated': datetime.now(timezone.utc)
     }
-    try:
-        user_ref.set(user_data)
-        print(f"Successfully saved skills for user: {user_id}")
-    except Exception as e:
-        print(f"Error saving skills for user {user_id}: {e}")
+    await write_queue.enqueue('users', user_id, user_data)
+    _last_saved_skills.set(user_id, tuple(skills))
+    logger.debug("Queued skills for user: %s", user_id)
 
 # --- NEW V2 FUNCTION ---
-def save_feedback(suggestion_id: str, job_title: str, user_id: str, rating: str):
+async def save_feedback(suggestion_id: str, job_title: str, user_id: str, rating: str):
     """
-    Saves user feedback for a specific job suggestion.
+    Queues user feedback for a specific job suggestion; it is written in the next batch.
 
     Args:
         suggestion_id: The unique ID of the suggestion.
@@ -41,11 +143,6 @@ def save_feedback(suggestion_id: str, job_title: str, user_id: str, rating: str)
         user_id: The unique identifier for the user.
         rating: The user's rating (e.g., 'helpful' or 'not_helpful').
     """
-    if not db:
-        print("Database client not available. Cannot save feedback.")
-        return
-        
-    feedback_ref = db.collection('feedback').document(suggestion_id)
     feedback_data = {
         'suggestion_id': suggestion_id,
         'job_title': job_title,
@@ -53,125 +150,340 @@ def save_feedback(suggestion_id: str, job_title: str, user_id: str, rating: str)
         'rating': rating,
         'timestamp': datetime.now(timezone.utc)
     }
+    await write_queue.enqueue('feedback', suggestion_id, feedback_data)
+    logger.debug("Queued feedback for suggestion: %s", suggestion_id)
+
+# --- Feedback Counters ---
+# Helpful / not-helpful totals per job title, spread over FEEDBACK_COUNTER_SHARDS
+# documents (feedback_counters/{counter id}/shards/{n}) so that a popular title
+# stays under Firestore's sustained rate of about one write per second per
+# document, across all instances. A title's totals are the sum of its shards.
+FEEDBACK_COUNTER_SHARDS = int(os.getenv("FEEDBACK_COUNTER_SHARDS", "10"))
+FEEDBACK_COUNTER_FIELDS = ('helpful', 'not_helpful')
+
+async def increment_feedback_counts(counter_id: str, job_title: str, counts: dict):
+    """Queues increments of a title's counters (field -> amount) on a random shard."""
+    shard = str(random.randrange(FEEDBACK_COUNTER_SHARDS))
+    await write_queue.enqueue_increment(f'feedback_counters/{counter_id}/shards', shard, counts, {'job_title': job_title})
+
+async def get_feedback_counts(counter_ids: list[str]) -> dict | None:
+    """
+    Sums the counter shards of several titles in one round trip, plus the
+    increments still waiting in the write-behind queue.
+    Returns {counter_id: {'helpful': n, 'not_helpful': n}}, or None on error.
+    """
+    db = get_db()
+    if not db:
+        logger.warning("Database client not available. Cannot read feedback counters.")
+        return None
+
+    totals = {counter_id: dict.fromkeys(FEEDBACK_COUNTER_FIELDS, 0) for counter_id in counter_ids}
+    if not counter_ids:
+        return totals
     try:
-        feedback_ref.set(feedback_data)
-        print(f"Successfully saved feedback for suggestion: {suggestion_id}")
+        references = [
+            db.collection(f'feedback_counters/{counter_id}/shards').document(str(shard))
+            for counter_id in counter_ids for shard in range(FEEDBACK_COUNTER_SHARDS)
+        ]
+        with span("firestore"):
+            async for doc in db.get_all(references, field_paths=list(FEEDBACK_COUNTER_FIELDS)):
+                if not doc.exists:
+                    continue
+                counter_id = doc.reference.path.split('/')[-3]
+                data = doc.to_dict()
+                for field in FEEDBACK_COUNTER_FIELDS:
+                    totals[counter_id][field] += data.get(field) or 0
     except Exception as e:
-        print(f"Error saving feedback for suggestion {suggestion_id}: {e}")
+        logger.error("Error reading feedback counters for %s titles: %s", len(counter_ids), e)
+        return None
+    for counter_id in counter_ids:
+        for shard in range(FEEDBACK_COUNTER_SHARDS):
+            pending = write_queue.pending_increments(f'feedback_counters/{counter_id}/shards', str(shard))
+            for field, amount in pending.items():
+                totals[counter_id][field] += amount
+    return totals
+
+# --- Feedback Votes ---
+# feedback_votes/{vote id}: the rating a user last gave a job title, so that each
+# user moves a title's counters by at most one vote, whatever suggestion ids they send.
+
+def _resolve_feedback_vote(stored: dict | None, vote: dict) -> tuple:
+    """The vote document and counter increments for a new rating, given the stored vote."""
+    previous = (stored or {}).get('rating')
+    if previous == vote['rating']:
+        return None, []
+    counts = {vote['rating']: 1}
+    if previous in FEEDBACK_COUNTER_FIELDS:
+        counts[previous] = -1
+    vote_data = {**vote, 'timestamp': datetime.now(timezone.utc)}
+    shard = str(random.randrange(FEEDBACK_COUNTER_SHARDS))
+    return vote_data, [(f"feedback_counters/{vote['counter_id']}/shards", shard, counts, {'job_title': vote['job_title']})]
+
+async def save_feedback_vote(vote_id: str, user_id: str, counter_id: str, job_title: str, rating: str):
+    """
+    Queues a user's rating of a title. When its batch is written, the stored
+    vote is read and replaced in the same transaction, and the title's counters
+    move only by the difference, so concurrent instances cannot both count it.
+    """
+    vote = {'user_id': user_id, 'counter_id': counter_id, 'job_title': job_title, 'rating': rating}
+    await write_queue.enqueue_resolved('feedback_votes', vote_id, vote, _resolve_feedback_vote)
 
-def save_career_path(user_id: str, target_job: str, path_data: dict):
+async def save_career_path(user_id: str, target_job: str, path_data: dict):
     """Saves a generated career path to the user's profile."""
+    db = get_db()
     if not db:
-        print("Database client not available. Cannot save path.")
+        logger.warning("Database client not available. Cannot save path.")
         return
 
-    path_ref = db.collection('saved_paths').document() 
+    path_ref = db.collection('saved_paths').document()
     full_path_data = {
         'userId': user_id,
         'target_job': target_job,
-        'path_data': path_data, 
-        'saved_at': datetime.now(timezone.utc) 
+        'path_data': path_data,
+        'saved_at': datetime.now(timezone.utc)
     }
     try:
-        path_ref.set(full_path_data)
-        print(f"Successfully saved path for user: {user_id}")
+        with span("firestore"):
+            await path_ref.set(full_path_data)
+        _paths_cache.delete(user_id)
+        logger.info("Successfully saved path for user: %s", user_id)
     except Exception as e:
-        print(f"Error saving path for user {user_id}: {e}")
+        logger.error("Error saving path for user %s: %s", user_id, e)
 
-def get_saved_paths(user_id: str) -> list:
-    """Retrieves all saved career paths for a given user."""
+async def list_saved_paths(user_id: str, limit: int | None = None, start_after: tuple[datetime, str] | None = None, summary: bool = False) -> tuple[list, str]:
+    """
+    Retrieves a user's saved career paths, newest first, with an ETag for the listing.
+    limit and start_after (the saved_at and path_id of the last path already
+    seen) page through them; paths saved at the same instant are ordered by id,
+    so none is skipped. summary returns only path_id, target_job and saved_at.
+    Needs a composite index on saved_paths (userId ==, saved_at desc).
+    """
+    query_key = (limit, start_after, summary)
+    listings = _paths_cache.get(user_id, default=None)
+    if listings and query_key in listings:
+        return listings[query_key]
+
+    db = get_db()
     if not db:
-        print("Database client not available. Cannot retrieve paths.")
-        return []
+        logger.warning("Database client not available. Cannot retrieve paths.")
+        return [], ""
 
     paths_list = []
     try:
-        docs = db.collection('saved_paths').where('userId', '==', user_id).stream()
-        for doc in docs:
-            path_data = doc.to_dict()
-            path_data['path_id'] = doc.id
-            paths_list.append(path_data)
-        print(f"Found {len(paths_list)} paths for user {user_id}")
+        collection = db.collection('saved_paths')
+        query = collection.where('userId', '==', user_id).order_by('saved_at', direction='DESCENDING').order_by('__name__', direction='DESCENDING')
+        if start_after is not None:
+            saved_at, path_id = start_after
+            query = query.start_after({'saved_at': saved_at, '__name__': collection.document(path_id)})
+        if limit is not None:
+            query = query.limit(limit)
+        if summary:
+            query = query.select(SAVED_PATH_SUMMARY_FIELDS)
+        with span("firestore"):
+            async for doc in query.stream():
+                path_data = doc.to_dict()
+                path_data['path_id'] = doc.id
+                paths_list.append(path_data)
+        logger.debug("Found %s paths for user %s", len(paths_list), user_id)
     except Exception as e:
-        print(f"Error retrieving paths for user {user_id}: {e}")
-    return paths_list
+        logger.error("Error retrieving paths for user %s: %s", user_id, e)
+        return paths_list, ""
+
+    etag = '"' + hashlib.sha256(json.dumps(paths_list, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32] + '"'
+    if listings is None:
+        listings = {}
+        _paths_cache.set(user_id, listings)
+    listings[query_key] = (paths_list, etag)
+    return paths_list, etag
 
-def delete_saved_path(user_id: str, path_id: str):
+async def get_saved_paths(user_id: str) -> list:
+    """Retrieves all saved career paths for a given user, newest first."""
+    paths, _ = await list_saved_paths(user_id)
+    return paths
+
+async def get_saved_path(user_id: str, path_id: str) -> dict:
+    """Fetches one saved path with its full path_data, verifying user ownership."""
+    db = get_db()
+    if not db:
+        logger.warning("Database client not available. Cannot retrieve path.")
+        raise Exception("Database client not available.")
+
+    with span("firestore"):
+        doc = await db.collection('saved_paths').document(path_id).get()
+    if not doc.exists:
+        raise Exception("Path not found.")
+    path_data = doc.to_dict()
+    if path_data.get('userId') != user_id:
+        raise Exception("User does not have permission to view this path.")
+    path_data['path_id'] = doc.id
+    return path_data
+
+async def delete_saved_path(user_id: str, path_id: str):
     """Deletes a specific saved path, verifying user ownership."""
+    db = get_db()
     if not db:
-        print("Database client not available. Cannot delete path.")
+        logger.warning("Database client not available. Cannot delete path.")
         raise Exception("Database client not available.")
 
     path_ref = db.collection('saved_paths').document(path_id)
-    
+
     try:
-        doc = path_ref.get()
+        with span("firestore"):
+            doc = await path_ref.get()
         if not doc.exists:
-            print(f"Path {path_id} not found. Cannot delete.")
+            logger.warning("Path %s not found. Cannot delete.", path_id)
             raise Exception("Path not found.")
-        
+
         path_data = doc.to_dict()
         if path_data.get('userId') != user_id:
-            print(f"User {user_id} does not own path {path_id}. Deletion forbidden.")
+            logger.warning("User %s does not own path %s. Deletion forbidden.", user_id, path_id)
             raise Exception("User does not have permission to delete this path.")
 
-        path_ref.delete()
-        print(f"Successfully deleted path {path_id} for user {user_id}")
-    
+        with span("firestore"):
+            await path_ref.delete()
+        _paths_cache.delete(user_id)
+        logger.info("Successfully deleted path %s for user %s", path_id, user_id)
+
     except Exception as e:
-        print(f"Error deleting path {path_id} for user {user_id}: {e}")
-        raise e 
+        logger.error("Error deleting path %s for user %s: %s", path_id, user_id, e)
+        raise e
 
-def get_cached_job_skills(job_title: str) -> dict | None:
+async def get_cached_job_skills_entry(job_title: str, doc_id: str | None = None) -> dict | None:
     """
-    Checks the cache for a job title's skills.
-    Returns the data if found and not older than 30 days.
+    Fetches the raw cache document for a job title, fresh or not.
+    Returns {'skills_data': ..., 'cached_at': ...} or None if nothing is cached.
+    doc_id overrides the document derived from the title.
     """
+    db = get_db()
     if not db:
-        print("Database client not available. Skipping cache check.")
+        logger.warning("Database client not available. Skipping cache check.")
         return None
 
     try:
-        doc_id = job_title.lower().replace(" ", "_")
+        doc_id = doc_id or job_title.lower().replace(" ", "_")
         cache_ref = db.collection('job_skills_cache').document(doc_id)
-        
-        doc = cache_ref.get()
+
+        with span("firestore"):
+            doc = await cache_ref.get()
         if not doc.exists:
-            print(f"CACHE MISS for job: {job_title}")
+            logger.debug("CACHE MISS for job: %s", job_title)
             return None
 
         data = doc.to_dict()
-        cached_at = data.get('cached_at', datetime.now(timezone.utc))
+        return {
+            'skills_data': data.get('skills_data'),
+            'cached_at': data.get('cached_at', datetime.now(timezone.utc))
+        }
 
-        if datetime.now(timezone.utc) - cached_at > timedelta(days=30):
-            print(f"CACHE STALE for job: {job_title}")
-            return None
+    except Exception as e:
+        logger.error("Error getting cached skills for %s: %s", job_title, e)
+        return None
 
-        print(f"CACHE HIT for job: {job_title}")
-        return data.get('skills_data')
+async def get_cached_job_skills_entries(doc_ids: list[str]) -> dict:
+    """
+    Fetches several job_skills_cache documents in one round trip.
+    Returns {doc_id: {'skills_data': ..., 'cached_at': ...}} for the ones that exist.
+    """
+    db = get_db()
+    if not db or not doc_ids:
+        return {}
 
+    entries = {}
+    try:
+        references = [db.collection('job_skills_cache').document(doc_id) for doc_id in doc_ids]
+        with span("firestore"):
+            async for doc in db.get_all(references):
+                if not doc.exists:
+                    continue
+                data = doc.to_dict()
+                entries[doc.id] = {
+                    'skills_data': data.get('skills_data'),
+                    'cached_at': data.get('cached_at', datetime.now(timezone.utc))
+                }
+        logger.debug("CACHE BATCH: %s of %s jobs found", len(entries), len(doc_ids))
     except Exception as e:
-        print(f"Error getting cached skills for {job_title}: {e}")
+        logger.error("Error getting cached skills for %s jobs: %s", len(doc_ids), e)
+    return entries
+
+async def get_cached_job_skills(job_title: str) -> dict | None:
+    """
+    Checks the cache for a job title's skills.
+    Returns the data if found and not older than 30 days.
+    """
+    entry = await get_cached_job_skills_entry(job_title)
+    if entry is None:
         return None
 
+    if datetime.now(timezone.utc) - entry['cached_at'] > JOB_SKILLS_MAX_AGE:
+        logger.debug("CACHE STALE for job: %s", job_title)
+        return None
+
+    logger.debug("CACHE HIT for job: %s", job_title)
+    return entry['skills_data']
+
 
-def cache_job_skills(job_title: str, skills_data: dict):
-    """Saves a job's skill data to the Firestore cache."""
+async def cache_job_skills(job_title: str, skills_data: dict, doc_id: str | None = None):
+    """Saves a job's skill data to the Firestore cache, optionally under a given document id."""
+    db = get_db()
     if not db:
-        print("Database client not available. Cannot save to cache.")
+        logger.warning("Database client not available. Cannot save to cache.")
         return
 
     try:
-        doc_id = job_title.lower().replace(" ", "_")
+        doc_id = doc_id or job_title.lower().replace(" ", "_")
         cache_ref = db.collection('job_skills_cache').document(doc_id)
-        
+
         cache_data = {
             'job_title': job_title,
-            'skills_data': skills_data, 
+            'skills_data': skills_data,
             'cached_at': datetime.now(timezone.utc)
         }
-        cache_ref.set(cache_data)
-        print(f"CACHE SAVED for job: {job_title}")
+        with span("firestore"):
+            await cache_ref.set(cache_data)
+        logger.debug("CACHE SAVED for job: %s", job_title)
+
+    except Exception as e:
+        logger.error("Error saving skills to cache for %s: %s", job_title, e)
+
+async def list_cached_job_skills() -> list:
+    """Returns (doc_id, job_title, skills_data, cached_at) for every entry in the job skills cache."""
+    db = get_db()
+    if not db:
+        logger.warning("Database client not available. Cannot list cached jobs.")
+        return []
+
+    jobs = []
+    try:
+        with span("firestore"):
+            async for doc in db.collection('job_skills_cache').stream():
+                data = doc.to_dict()
+                jobs.append((doc.id, data.get('job_title') or doc.id.replace("_", " "), data.get('skills_data') or {}, data.get('cached_at')))
+    except Exception as e:
+        logger.error("Error listing cached jobs: %s", e)
+    return jobs
 
+async def get_cached_resume(resume_hash: str) -> dict | None:
+    """Returns the cached analysis stored under a resume content hash, if any."""
+    db = get_db()
+    if not db:
+        return None
+
+    try:
+        with span("firestore"):
+            doc = await db.collection('resume_cache').document(resume_hash).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        logger.error("Error getting cached resume %s: %s", resume_hash, e)
+        return None
+
+async def cache_resume(resume_hash: str, data: dict):
+    """Stores a resume analysis under a content hash."""
+    db = get_db()
+    if not db:
+        return
+
+    try:
+        with span("firestore"):
+            await db.collection('resume_cache').document(resume_hash).set({**data, 'cached_at': datetime.now(timezone.utc)})
     except Exception as e:
-        print(f"Error saving skills to cache for {job_title}: {e}")
\ No newline at end of file
+        logger.error("Error caching resume %s: %s", resume_hash, e)
@@ -0,0 +1,46 @@
+"""
+Blocking wrappers around the async data layer in database.py, for scripts and
+other code without an event loop. Every call runs on one private background
+loop, so the Firestore client pool is created once and reused across calls.
+"""
+import asyncio
+import threading
+import database
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _run(coro):
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="database-sync", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+async def _flushed(coro):
+    # Callers here expect the write to be done on return, not left in the write-behind queue.
+    result = await coro
+    await database.write_queue.flush()
+    return result
+
+def save_user_skills(user_id: str, skills: list):
+    return _run(_flushed(database.save_user_skills(user_id, skills)))
+
+def save_feedback(suggestion_id: str, job_title: str, user_id: str, rating: str):
+    return _run(_flushed(database.save_feedback(suggestion_id, job_title, user_id, rating)))
+
+def save_career_path(user_id: str, target_job: str, path_data: dict):
+    return _run(database.save_career_path(user_id, target_job, path_data))
+
+def get_saved_paths(user_id: str) -> list:
+    return _run(database.get_saved_paths(user_id))
+
+def delete_saved_path(user_id: str, path_id: str):
+    return _run(database.delete_saved_path(user_id, path_id))
+
+def get_cached_job_skills(job_title: str) -> dict | None:
+    return _run(database.get_cached_job_skills(job_title))
+
+def cache_job_skills(job_title: str, skills_data: dict):
+    return _run(database.cache_job_skills(job_title, skills_data))
@@ -0,0 +1,173 @@
+"""
+A deterministic, in-process stand-in for the Gemini GenerativeModel that
+agent.py uses. Selected with LLM_BACKEND=fake for offline runs and load tests:
+no network and no API key.
+
+It implements the one method the agent calls, generate_content_async(prompt,
+generation_config=..., stream=...), and answers each prompt with schema-valid
+output for the task the prompt asks for (job skills, skill gap, suggestions,
+career path, skill list, resume structure). Answers are derived from a hash of
+the prompt, so the same prompt always gets the same answer.
+
+Latency is drawn from a log-normal distribution with median FAKE_LLM_LATENCY_MS
+and shape FAKE_LLM_LATENCY_SIGMA (0 for a fixed latency); a FAKE_LLM_ERROR_RATE
+share of calls fail with ServiceUnavailable and a FAKE_LLM_RATE_LIMIT_RATE share
+with ResourceExhausted. Draws come from a generator seeded with FAKE_LLM_SEED.
+Responses carry usage_metadata with token counts from
+resume_compactor.estimate_tokens, cumulative across a stream as Gemini's are.
+"""
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+from types import SimpleNamespace
+from google.api_core import exceptions as api_exceptions
+from skill_extractor import SKILL_TAXONOMY, extract_skills
+from resume_compactor import estimate_tokens
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# Streamed responses arrive in chunks of this many characters, spread over the latency.
+_STREAM_CHUNK_CHARS = 24
+_FIRST_CHUNK_SHARE = 0.3   # share of the latency spent before the first chunk
+
+SOFT_SKILLS = ("Communication", "Teamwork", "Problem Solving", "Leadership", "Time Management", "Adaptability", "Critical Thinking", "Collaboration")
+TOOL_SKILLS = ("Git", "Jira", "Docker", "VS Code", "Postman", "Figma", "Confluence", "Slack")
+
+_QUOTED = re.compile(r"'([^']+)'")
+_SKILLS_LINE = re.compile(r"^\s*(?:Skills|My current skills are):?\s*(.*?)\.?\s*(?:My target job|$)", re.MULTILINE)
+_DELIMITED = re.compile(r"---\n(.*?)\n\s*---", re.DOTALL)
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0, response_tokens: int = 0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=response_tokens)
+
+
+class FakeModel:
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, latency_sigma: float = FAKE_LLM_LATENCY_SIGMA,
+                 error_rate: float = FAKE_LLM_ERROR_RATE, rate_limit_rate: float = FAKE_LLM_RATE_LIMIT_RATE,
+                 seed: int = FAKE_LLM_SEED):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False):
+        self.calls += 1
+        latency = self._latency()
+        text = respond(prompt)
+        if not stream:
+            await asyncio.sleep(latency)
+            self._maybe_fail()
+            return FakeResponse(text, estimate_tokens(prompt), estimate_tokens(text))
+
+        await asyncio.sleep(latency * _FIRST_CHUNK_SHARE)
+        self._maybe_fail()
+        return self._stream(text, estimate_tokens(prompt), latency * (1 - _FIRST_CHUNK_SHARE))
+
+    async def _stream(self, text: str, prompt_tokens: int, duration: float):
+        chunks = [text[i:i + _STREAM_CHUNK_CHARS] for i in range(0, len(text), _STREAM_CHUNK_CHARS)]
+        response_tokens = 0
+        for chunk in chunks:
+            await asyncio.sleep(duration / len(chunks))
+            response_tokens += estimate_tokens(chunk)
+            yield FakeResponse(chunk, prompt_tokens, response_tokens)
+
+    def _latency(self) -> float:
+        median = self.latency_ms / 1000
+        if self.latency_sigma <= 0:
+            return median
+        return self._random.lognormvariate(0, self.latency_sigma) * median
+
+    def _maybe_fail(self):
+        draw = self._random.random()
+        if draw < self.error_rate:
+            raise api_exceptions.ServiceUnavailable("Fake LLM: injected failure.")
+        if draw < self.error_rate + self.rate_limit_rate:
+            raise api_exceptions.ResourceExhausted("Fake LLM: injected rate limit.")
+
+
+# --- Responses ---
+
+def _picks(seed: str, options: tuple, count: int) -> list[str]:
+    """A deterministic sample of `count` options for a seed string."""
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    rng = random.Random(digest)
+    return rng.sample(options, min(count, len(options)))
+
+def _job_title(prompt: str) -> str:
+    match = _QUOTED.search(prompt)
+    return match.group(1) if match else "Software Engineer"
+
+def _listed_skills(prompt: str) -> list[str]:
+    match = _SKILLS_LINE.search(prompt)
+    if not match:
+        return []
+    return [s.strip() for s in match.group(1).split(",") if s.strip()]
+
+def _delimited_text(prompt: str) -> str:
+    match = _DELIMITED.search(prompt)
+    return match.group(1) if match else prompt
+
+def _job_skills(job_title: str) -> dict:
+    return {
+        "technical_skills": _picks(job_title + ":technical", SKILL_TAXONOMY, 8),
+        "soft_skills": _picks(job_title + ":soft", SOFT_SKILLS, 4),
+        "tool_skills": _picks(job_title + ":tools", TOOL_SKILLS, 3),
+    }
+
+def _suggestions(seed: str) -> list[dict]:
+    titles = ("Software Engineer", "Data Analyst", "Data Scientist", "Backend Developer", "Frontend Developer",
+              "DevOps Engineer", "Machine Learning Engineer", "Product Manager", "QA Engineer", "Cloud Architect")
+    rng = random.Random(hashlib.sha256(seed.encode("utf-8")).digest())
+    return [{"job_title": title, "match_score": rng.randint(55, 95)} for title in rng.sample(titles, 5)]
+
+def respond(prompt: str) -> str:
+    """Returns the response text a prompt would get, shaped like the schema it asks for."""
+    if '"technical_skills"' in prompt:
+        return json.dumps(_job_skills(_job_title(prompt)))
+
+    if '"matching_skills"' in prompt:
+        required = _job_skills(_job_title(prompt))
+        required = required["technical_skills"] + required["tool_skills"]
+        have = {s.lower() for s in _listed_skills(prompt)}
+        return json.dumps({
+            "matching_skills": [s for s in required if s.lower() in have],
+            "missing_skills": [s for s in required if s.lower() not in have],
+        })
+
+    if '"milestones"' in prompt:
+        target = _job_title(prompt)
+        next_skills = [s for s in _job_skills(target)["technical_skills"] if s not in _listed_skills(prompt)][:4]
+        return json.dumps({
+            "milestones": [f"Build a portfolio project using {skill}" for skill in next_skills[:2]] + [f"Land an entry-level {target} role"],
+            "next_skills": next_skills,
+            "recommended_actions": [f"Take an online course in {next_skills[0] if next_skills else target}", f"Network with people working as a {target}"],
+        })
+
+    if '"parsed_skills"' in prompt:
+        text = _delimited_text(prompt)
+        return json.dumps({"parsed_skills": extract_skills(text) or _picks(text, SKILL_TAXONOMY, 6), "suggestions": _suggestions(text)})
+
+    if '"suggestions"' in prompt:
+        return json.dumps({"suggestions": _suggestions(_delimited_text(prompt))})
+
+    if "comma-separated" in prompt:
+        text = _delimited_text(prompt)
+        return ", ".join(extract_skills(text) or _picks(text, SKILL_TAXONOMY + SOFT_SKILLS, 6))
+
+    if '"education"' in prompt:
+        text = _delimited_text(prompt)
+        return json.dumps({"education": [], "experience": [], "skills": extract_skills(text)})
+
+    return json.dumps({})
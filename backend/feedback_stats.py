@@ -0,0 +1,112 @@
+"""
+Per-title feedback aggregates, kept up to date as feedback arrives.
+
+record() queues each rating as the user's vote for the title, written behind
+the request like the raw feedback document. Each user has one vote per title,
+in Firestore: when the vote is written, the stored one is read in the same
+transaction and the title's sharded counters (see database.py) move only by
+the difference. Rating the title again, through any suggestion id, only moves
+that vote, so a client cannot inflate the counts by sending new suggestion ids.
+
+counts() serves a title's totals from an in-process cache, refreshed from
+the shards at most every FEEDBACK_COUNTS_CACHE_TTL_SECONDS; recording a
+rating drops the title's cached totals, so they are read again once the
+vote is written. rerank() uses them to
+reorder job suggestions with no LLM call: each title's helpful rate,
+smoothed toward 50% by FEEDBACK_PRIOR_WEIGHT ratings, moves its match score
+by up to FEEDBACK_RERANK_POINTS for sorting. Suggestions are left in their
+original order while none of their titles has feedback, and the match_score
+shown to the user is unchanged.
+"""
+import os
+import hashlib
+from cache import TTLCache, MISSING
+from database import get_feedback_counts, save_feedback_vote, FEEDBACK_COUNTER_FIELDS
+from title_index import normalize_title, canonical_doc_id
+from telemetry import span
+
+FEEDBACK_COUNTS_CACHE_MAX_ENTRIES = int(os.getenv("FEEDBACK_COUNTS_CACHE_MAX_ENTRIES", "5000"))
+FEEDBACK_COUNTS_CACHE_TTL_SECONDS = float(os.getenv("FEEDBACK_COUNTS_CACHE_TTL_SECONDS", "300"))
+# 0 disables re-ranking.
+FEEDBACK_RERANK_POINTS = float(os.getenv("FEEDBACK_RERANK_POINTS", "10"))
+FEEDBACK_PRIOR_WEIGHT = float(os.getenv("FEEDBACK_PRIOR_WEIGHT", "5"))
+
+
+def counter_id(job_title: str) -> str:
+    """The counter document for a job title; spelling variants of a title share it."""
+    return canonical_doc_id(normalize_title(job_title))
+
+
+def vote_id(user_id: str, counter: str) -> str:
+    return hashlib.sha256(f"{user_id}\n{counter}".encode("utf-8")).hexdigest()[:40]
+
+
+def summarize(counts: dict) -> dict:
+    total = counts["helpful"] + counts["not_helpful"]
+    return {**counts, "total": total, "helpful_rate": counts["helpful"] / total if total else None}
+
+
+class FeedbackStats:
+    def __init__(self):
+        self._counts = TTLCache(maxsize=FEEDBACK_COUNTS_CACHE_MAX_ENTRIES, ttl=FEEDBACK_COUNTS_CACHE_TTL_SECONDS)
+        self._counters = {"recorded": 0, "ignored": 0, "read_errors": 0, "reranked": 0}
+
+    async def record(self, user_id: str, job_title: str, rating: str):
+        """Queues a user's rating of a title as their vote; ratings other than helpful / not_helpful are ignored."""
+        rating = rating.strip().lower()
+        counter = counter_id(job_title)
+        if rating not in FEEDBACK_COUNTER_FIELDS or not counter:
+            self._counters["ignored"] += 1
+            return
+
+        await save_feedback_vote(vote_id(user_id, counter), user_id, counter, job_title, rating)
+        self._counts.delete(counter)
+        self._counters["recorded"] += 1
+
+    async def counts_many(self, job_titles: list[str]) -> dict:
+        """Returns {job title: {'helpful': n, 'not_helpful': n}}, reading uncached titles in one round trip."""
+        counters = {title: counter_id(title) for title in job_titles}
+        with span("cache"):
+            found = {}
+            for counter in set(counters.values()) - {""}:
+                cached = self._counts.get(counter)
+                if cached is not MISSING:
+                    found[counter] = cached
+            missing = [counter for counter in set(counters.values()) - {""} if counter not in found]
+            if missing:
+                fetched = await get_feedback_counts(missing)
+                if fetched is None:
+                    self._counters["read_errors"] += 1
+                    fetched = {}
+                for counter, counts in fetched.items():
+                    self._counts.set(counter, counts)
+                found.update(fetched)
+        empty = dict.fromkeys(FEEDBACK_COUNTER_FIELDS, 0)
+        return {title: dict(found.get(counter, empty)) for title, counter in counters.items()}
+
+    async def counts(self, job_title: str) -> dict:
+        """A title's helpful / not_helpful totals, total and helpful_rate (None before any rating)."""
+        return summarize((await self.counts_many([job_title]))[job_title])
+
+    def _adjusted_score(self, suggestion: dict, counts: dict) -> float:
+        total = counts["helpful"] + counts["not_helpful"]
+        rate = (counts["helpful"] + FEEDBACK_PRIOR_WEIGHT / 2) / (total + FEEDBACK_PRIOR_WEIGHT) if total else 0.5
+        return (suggestion.get("match_score") or 0) + FEEDBACK_RERANK_POINTS * (2 * rate - 1)
+
+    async def rerank(self, suggestions: list[dict]) -> list[dict]:
+        """Reorders suggestions by match score adjusted for their titles' feedback."""
+        if FEEDBACK_RERANK_POINTS <= 0 or len(suggestions) < 2:
+            return suggestions
+        counts = await self.counts_many([suggestion["job_title"] for suggestion in suggestions])
+        if not any(title_counts["helpful"] or title_counts["not_helpful"] for title_counts in counts.values()):
+            return suggestions
+        reranked = sorted(suggestions, key=lambda s: self._adjusted_score(s, counts[s["job_title"]]), reverse=True)
+        if reranked != suggestions:
+            self._counters["reranked"] += 1
+        return reranked
+
+    def stats(self) -> dict:
+        return {**self._counters, "cache": self._counts.stats()}
+
+
+feedback_stats = FeedbackStats()
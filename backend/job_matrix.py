@@ -0,0 +1,139 @@
+"""
+A sparse skill x job matrix over every job in job_skills_cache, used to rank
+jobs for a set of skills without calling the LLM.
+
+The matrix is stored column-wise: each canonical skill owns a growable
+posting array of (job row, requirement slot, weight). A requirement with
+alternatives ('Cloud platforms (AWS, GCP, Azure)') gets a slot of its own,
+posted under each alternative's column; other requirements have slot -1.
+Ranking concatenates the postings of the user's skills, keeps each slot
+once, so a requirement is credited at most once however many of its
+alternatives the user has, and sums them per job with one np.bincount. The
+cost depends on how many jobs need those skills, not on the size of the
+vocabulary. Jobs are added or replaced incrementally whenever the skills
+cache is written.
+"""
+import numpy as np
+from skills import normalize_skill, requirement_keys
+
+CATEGORY_WEIGHTS = {"technical_skills": 1.0, "tool_skills": 0.8, "soft_skills": 0.4}
+
+
+class _Posting:
+    __slots__ = ("rows", "slots", "weights", "size", "alternatives")
+
+    def __init__(self):
+        self.rows = np.empty(8, dtype=np.int32)
+        self.slots = np.empty(8, dtype=np.int64)
+        self.weights = np.empty(8, dtype=np.float32)
+        self.size = 0
+        self.alternatives = 0   # postings with a slot
+
+    def append(self, row: int, slot: int, weight: float) -> int:
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, self.size * 2)
+            self.slots = np.resize(self.slots, self.size * 2)
+            self.weights = np.resize(self.weights, self.size * 2)
+        self.rows[self.size] = row
+        self.slots[self.size] = slot
+        self.weights[self.size] = weight
+        self.size += 1
+        self.alternatives += slot >= 0
+        return self.size - 1
+
+
+class JobSkillMatrix:
+    def __init__(self):
+        self._rows = {}          # cache document id -> row
+        self._titles = []        # row -> job title
+        self._row_entries = []   # row -> [(column, position)] of its live postings
+        self._row_norms = np.zeros(1024, dtype=np.float32)
+        self._columns = {}       # canonical skill -> column
+        self._postings = []      # column -> _Posting
+        self._next_slot = 0      # requirement slots are never reused, so a replaced row's stay zeroed
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def add_job(self, doc_id: str, job_title: str, skills_data: dict):
+        """Adds a job, or replaces its row if the document was already indexed."""
+        row = self._rows.get(doc_id)
+        if row is None:
+            row = len(self._titles)
+            self._rows[doc_id] = row
+            self._titles.append(job_title)
+            self._row_entries.append([])
+            if row == len(self._row_norms):
+                self._row_norms = np.concatenate([self._row_norms, np.zeros_like(self._row_norms)])
+        else:
+            # Zero the old postings in place; a replaced job keeps its row.
+            for column, position in self._row_entries[row]:
+                self._postings[column].weights[position] = 0.0
+            self._row_entries[row] = []
+            self._titles[row] = job_title
+
+        # A requirement listed twice, in one category or several, counts once at
+        # its highest weight, as in compute_skill_gap.
+        requirements = {}   # requirement keys -> weight
+        for category, weight in CATEGORY_WEIGHTS.items():
+            for requirement in skills_data.get(category) or []:
+                keys = requirement_keys(requirement)
+                if keys:
+                    requirements[keys] = max(requirements.get(keys, 0.0), weight)
+
+        postings = []   # (slot, key, weight)
+        for keys, weight in requirements.items():
+            if len(keys) == 1:
+                postings.extend((-1, key, weight) for key in keys)
+                continue
+            slot = self._next_slot
+            self._next_slot += 1
+            postings.extend((slot, key, weight) for key in keys)
+
+        for slot, key, weight in postings:
+            column = self._columns.get(key)
+            if column is None:
+                column = len(self._postings)
+                self._columns[key] = column
+                self._postings.append(_Posting())
+            position = self._postings[column].append(row, slot, weight)
+            self._row_entries[row].append((column, position))
+        self._row_norms[row] = sum(requirements.values())
+
+    def rank(self, user_skills: list[str], top_k: int = 5) -> list[dict]:
+        """
+        Scores every known job by the weighted share of its requirements the
+        user covers and returns the top_k as {"job_title", "match_score"} (0-100).
+        """
+        columns = {self._columns.get(normalize_skill(skill)) for skill in user_skills}
+        postings = [self._postings[c] for c in columns if c is not None]
+        if not postings:
+            return []
+
+        n_rows = len(self._titles)
+        rows = np.concatenate([p.rows[:p.size] for p in postings])
+        weights = np.concatenate([p.weights[:p.size] for p in postings])
+        if sum(1 for p in postings if p.alternatives) > 1:
+            # A requirement met through several alternatives counts once.
+            slots = np.concatenate([p.slots[:p.size] for p in postings])
+            alternatives = slots >= 0
+            _, first = np.unique(slots[alternatives], return_index=True)
+            rows = np.concatenate([rows[~alternatives], rows[alternatives][first]])
+            weights = np.concatenate([weights[~alternatives], weights[alternatives][first]])
+        scores = np.bincount(rows, weights=weights, minlength=n_rows)
+        norms = self._row_norms[:n_rows]
+        scores = np.divide(scores, norms, out=np.zeros(n_rows), where=norms > 0)
+        np.minimum(scores, 1.0, out=scores)
+
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k == 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {"job_title": self._titles[row], "match_score": int(round(scores[row] * 100))}
+            for row in top
+        ]
+
+
+job_matrix = JobSkillMatrix()
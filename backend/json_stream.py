@@ -0,0 +1,76 @@
+"""
+Incremental parsing of a streamed JSON object whose values are arrays.
+
+Gemini streams a JSON response in arbitrary text chunks. ArrayItemParser
+scans each chunk once and reports every element of a top-level array as soon
+as the element is complete, e.g. '"milestones": ["Learn SQL", ' yields
+("milestones", "Learn SQL") before the rest of the object has arrived.
+"""
+import json
+
+
+class ArrayItemParser:
+    def __init__(self):
+        self._buffer = []      # every character fed so far
+        self._depth = 0        # 1 inside the top-level object, 2 inside one of its arrays
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_key = None  # last string seen directly in the top-level object
+        self._array_key = None
+        self._item_start = None
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        """Consumes the next chunk and returns the (key, item) pairs it completed."""
+        items = []
+        for ch in chunk:
+            index = len(self._buffer)
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = json.loads("".join(self._buffer[self._string_start:index + 1]))
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = index
+            elif ch in "{[":
+                if self._depth == 1 and ch == "[":
+                    self._array_key = self._last_key
+                    self._depth = 2
+                    self._item_start = None
+                    continue
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 2 and ch == "]":
+                    self._emit(index, items)
+                    self._array_key = None
+                self._depth -= 1
+                continue
+            elif ch == "," and self._depth == 2:
+                self._emit(index, items)
+                continue
+
+            if self._depth >= 2 and self._item_start is None and not ch.isspace():
+                self._item_start = index
+        return items
+
+    def _emit(self, end: int, items: list):
+        if self._item_start is None:
+            return
+        raw = "".join(self._buffer[self._item_start:end]).strip()
+        self._item_start = None
+        try:
+            items.append((self._array_key, json.loads(raw)))
+        except ValueError:
+            pass
+
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._buffer)
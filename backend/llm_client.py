@@ -0,0 +1,336 @@
+"""
+A resilient wrapper around the Gemini model for every agent call.
+
+Each call gets one deadline (LLM_TIMEOUT_SECONDS) that covers its retries.
+Retryable failures (timeouts, rate limiting, 5xx) are retried with
+full-jitter exponential backoff up to LLM_MAX_RETRIES times; anything else,
+such as a bad request or a blocked response, is raised at once. With
+LLM_HEDGE_ENABLED, a call still running after the observed p95 latency gets
+a second identical request and whichever finishes first wins.
+
+A circuit breaker counts consecutive calls that failed retryably. At
+LLM_BREAKER_FAILURE_THRESHOLD it opens and calls fail immediately with
+CircuitOpenError for LLM_BREAKER_RESET_SECONDS; then a single probe call is
+let through, and its outcome closes or reopens the breaker. Callers can check
+circuit_open() to serve stale data instead of waiting on a degraded service.
+
+Calls beyond LLM_MAX_CONCURRENCY wait in a bounded priority queue
+(admission.PriorityGate), interactive callers ahead of background work; a
+full queue refuses new calls at once with QueueFullError, which does not
+count against the breaker.
+
+Every call is timed as the "llm" span, and the token counts Gemini reports
+go to the LLM token counters in telemetry.py.
+"""
+import logging
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from google.api_core import exceptions as api_exceptions
+from telemetry import span, record_llm_tokens
+from admission import PriorityGate, OverloadedError
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Calls waiting for a concurrency slot beyond this many are refused with QueueFullError.
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+
+# Hedging waits for this many latency samples before trusting the p95.
+_HEDGE_MIN_SAMPLES = 20
+_LATENCY_WINDOW = 200
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    ConnectionError,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.Aborted,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while the circuit breaker is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def _percentile(ordered: list[float], q: float) -> float | None:
+    return ordered[max(0, int(len(ordered) * q) - 1)] if ordered else None
+
+
+def _record_usage(response):
+    """Counts the prompt and response tokens Gemini reports for a call, when it reports them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        record_llm_tokens(getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+
+def _round(seconds: float | None) -> float | None:
+    return round(seconds, 3) if seconds is not None else None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"       # "closed", "open" or "half_open"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; past the reset timeout, lets one probe through."""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        """Whether a call made now would be refused."""
+        if self.state == "open":
+            return time.monotonic() - self._opened_at < self.reset_seconds
+        return self.state == "half_open" and self._probing
+
+    def record_success(self):
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning("LLM circuit breaker opened after %s consecutive failures.", self._failures)
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """Lets another probe through when one was cancelled before it finished."""
+        self._probing = False
+
+
+class LLMClient:
+    def __init__(self, get_model):
+        self._get_model = get_model
+        self._gate = PriorityGate(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE)
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        self._p95 = None
+        self._samples = 0
+        self._in_flight = 0
+        self._counters = {"calls": 0, "failures": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+
+    def circuit_open(self) -> bool:
+        return self.breaker.is_open()
+
+    def load(self) -> float:
+        """Callers in generate() or stream(), running or waiting, per concurrency slot; 1.0 while the breaker is open."""
+        if self.breaker.is_open():
+            return 1.0
+        return self._in_flight / LLM_MAX_CONCURRENCY
+
+    # --- Single Responses ---
+
+    async def generate(self, prompt: str, generation_config) -> str:
+        """Returns the response text, retrying and hedging within one LLM_TIMEOUT_SECONDS deadline."""
+        self._admit()
+        deadline = asyncio.get_running_loop().time() + LLM_TIMEOUT_SECONDS
+        self._in_flight += 1
+        try:
+            with span("llm"):
+                return await self._guarded(self._with_retries(lambda: self._hedged(prompt, generation_config, deadline), deadline))
+        finally:
+            self._in_flight -= 1
+
+    async def _attempt(self, prompt: str, generation_config, deadline: float) -> str:
+        async with self._gate.slot():
+            started = time.monotonic()
+            response = await asyncio.wait_for(
+                self._get_model().generate_content_async(prompt, generation_config=generation_config),
+                timeout=max(0.0, deadline - asyncio.get_running_loop().time())
+            )
+            text = response.text
+        self._record_latency(time.monotonic() - started)
+        _record_usage(response)
+        return text
+
+    async def _hedged(self, prompt: str, generation_config, deadline: float) -> str:
+        hedge_after = self._hedge_delay()
+        if hedge_after is None:
+            return await self._attempt(prompt, generation_config, deadline)
+
+        first = asyncio.ensure_future(self._attempt(prompt, generation_config, deadline))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            # Only hedge with a free slot; under saturation a second request just adds load.
+            if done or self._gate.locked():
+                return await first
+            self._counters["hedges"] += 1
+            tasks.append(asyncio.ensure_future(self._attempt(prompt, generation_config, deadline)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = task.exception()
+                if winner is not None:
+                    if winner is not first:
+                        self._counters["hedge_wins"] += 1
+                    return winner.result()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_delay(self) -> float | None:
+        if not LLM_HEDGE_ENABLED or len(self._latencies) < _HEDGE_MIN_SAMPLES:
+            return None
+        if self._p95 is None:
+            self._p95 = _percentile(sorted(self._latencies), 0.95)
+        return self._p95
+
+    def _record_latency(self, seconds: float):
+        self._latencies.append(seconds)
+        self._samples += 1
+        # Recomputed lazily, at most once per 20 samples.
+        if self._samples % 20 == 0:
+            self._p95 = None
+
+    # --- Streamed Responses ---
+
+    async def stream(self, prompt: str, generation_config):
+        """
+        Yields response text chunks. Opening the stream is retried like generate();
+        once chunks have arrived a failure is raised, since they cannot be unsent.
+        The whole stream shares one LLM_TIMEOUT_SECONDS deadline and holds a
+        concurrency slot until it ends.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_TIMEOUT_SECONDS
+
+        async def open_stream():
+            return await asyncio.wait_for(
+                self._get_model().generate_content_async(prompt, generation_config=generation_config, stream=True),
+                timeout=max(0.0, deadline - loop.time())
+            )
+
+        self._in_flight += 1
+        try:
+            with span("llm"):
+                async with self._gate.slot():
+                    response = await self._with_retries(open_stream, deadline)
+                    chunks = response.__aiter__()
+                    chunk = None
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                        except StopAsyncIteration:
+                            break
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            # Chunks that carry only metadata (e.g. the finish reason) have no text.
+                            continue
+                        yield text
+                    # Usage on a stream is cumulative, so the last chunk carries the totals.
+                    _record_usage(chunk)
+        except OverloadedError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        except BaseException:
+            # Cancelled, or the consumer stopped reading.
+            self.breaker.release()
+            raise
+        finally:
+            self._in_flight -= 1
+        self._record_outcome(None)
+
+    # --- Retries and Circuit Breaking ---
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._counters["rejected"] += 1
+            raise CircuitOpenError("The language model is unavailable right now. Try again shortly.")
+        self._counters["calls"] += 1
+
+    async def _with_retries(self, call, deadline: float):
+        loop = asyncio.get_running_loop()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._counters["timeouts"] += 1
+                delay = random.uniform(0, LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+                if not is_retryable(e) or attempt == LLM_MAX_RETRIES or loop.time() + delay >= deadline:
+                    raise
+                logger.warning("LLM call failed (%s: %s), retrying in %.2fs", type(e).__name__, e, delay)
+                self._counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def _guarded(self, call):
+        try:
+            result = await call
+        except OverloadedError:
+            # Refused before reaching the model; says nothing about its health.
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self._record_outcome(None)
+        return result
+
+    def _record_outcome(self, error: Exception | None):
+        # Only failures that say the service is unhealthy count against the breaker;
+        # a rejected prompt means it answered.
+        if error is not None:
+            self._counters["failures"] += 1
+        if error is not None and is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> dict:
+        ordered = sorted(self._latencies)
+        return {
+            **self._counters,
+            "in_flight": self._in_flight,
+            "queue": self._gate.stats(),
+            "breaker": {"state": self.breaker.state, "times_opened": self.breaker.times_opened},
+            "latency_p50": _round(_percentile(ordered, 0.5)),
+            "latency_p95": _round(_percentile(ordered, 0.95)),
+        }
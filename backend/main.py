@@ -1,65 +1,125 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends
+import time
+_imports_started = time.perf_counter()
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import firebase_admin
-from firebase_admin import credentials
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 import os
 import json
+import base64
+import asyncio
+from datetime import datetime
 
 # Schemas
 from schemas import (
     SkillAnalysisRequest, SkillAnalysisResponse,
-    JobSuggestionResponse, FeedbackRequest,
+    JobSuggestionResponse, FeedbackRequest, FeedbackStatsResponse,
     SkillRequirementsRequest, SkillRequirementsResponse,
-    CareerPathRequest, CareerPathResponse, SavePathRequest
+    CareerPathRequest, CareerPathResponse, SavePathRequest,
+    BatchSkillRequirementsRequest, BatchSkillRequirementsResponse, SkillRequirementsResult,
+    BatchSkillAnalysisRequest, BatchSkillAnalysisResponse, SkillAnalysisResult
 )
 # Agent functions
 from agent import (
-    analyze_skills_for_job, get_job_suggestions,
-    get_skills_for_job, generate_career_path,
-    get_suggestions_and_skills_from_resume
+    analyze_skills_for_job, analyze_skills_for_jobs,
+    get_skills_for_job, get_skills_for_jobs, generate_career_path, stream_career_path,
+    get_suggestions_and_skills_from_resume, suggest_jobs_for_skills, get_model, check_model_config,
+    analysis_source_stats, singleflight_stats, llm_stats, llm_load, prewarm_job_skills
 )
 # Services
-from resume_parser import parse_resume
-from database import save_user_skills, save_feedback, save_career_path, get_saved_paths, delete_saved_path
-from auth_utils import get_current_user
+from resume_parser import read_upload, parse_resume_content, shutdown_parser_pool
+import resume_cache
+import skills_cache
+from skills_cache import load_cached_jobs
+from prewarm import prewarmer
+from career_path_cache import career_path_cache
+from feedback_stats import feedback_stats
+from admission import OverloadedError, rate_limiter
+from database import save_user_skills, save_feedback, save_career_path, list_saved_paths, get_saved_path, delete_saved_path, init_db, close_db, write_queue
+from auth_utils import get_current_user, init_firebase, start_key_refresh, stop_key_refresh, token_cache_stats
 from auth_routes import router as auth_router
+from telemetry import (
+    TimingMiddleware, configure_logging, stop_logging, register_collector, render_metrics,
+    record_startup, startup_step, startup_stats
+)
 
-# --- Firebase Admin SDK Initialization ---
-if not firebase_admin._apps:
-    service_account_json_str = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
-    cred = None
+configure_logging()
+logger = logging.getLogger(__name__)
+record_startup("imports", time.perf_counter() - _imports_started)
 
-    if service_account_json_str and service_account_json_str.strip():
-        print("Initializing Firebase Admin SDK from environment variable.")
-        try:
-            service_account_info = json.loads(service_account_json_str)
-            cred = credentials.Certificate(service_account_info)
-        except json.JSONDecodeError as e:
-            print(f"\n!!! FATAL ERROR: Invalid JSON in FIREBASE_SERVICE_ACCOUNT_JSON env var: {e} !!!\n")
-            raise e
-    else:
-        print("Initializing Firebase Admin SDK from local file 'serviceAccountKey.json'.")
-        try:
-            cred = credentials.Certificate("serviceAccountKey.json")
-        except FileNotFoundError:
-            print("\n!!! WARNING: serviceAccountKey.json not found. Backend auth features (token verification) will fail. !!!\n")
-        except Exception as e:
-            print(f"\n!!! ERROR: Failed to load serviceAccountKey.json: {e} !!!\n")
+# --- Startup ---
+# Cloud Run starts instances from zero, so nothing slow happens before the app
+# can serve: Firebase, the Gemini model and the Firestore pool are initialized
+# concurrently in the background (each is also built on first use if a request
+# gets there first). The signing-key refresh starts once Firebase knows the
+# project, and the cached-jobs scan and then the prewarm scheduler once
+# Firestore is ready.
 
-    if cred:
-        try:
-            firebase_admin.initialize_app(cred)
-            print("Firebase Admin SDK initialized successfully.")
-        except Exception as e:
-            print(f"\n!!! ERROR: Firebase Admin SDK initialization failed: {e} !!!\n")
-    else:
-        print("\n!!! ERROR: Could not load Firebase credentials. Backend auth features will fail. !!!\n")
+async def _init_auth():
+    with startup_step("firebase"):
+        await asyncio.to_thread(init_firebase)
+    start_key_refresh()
+
+async def _init_firestore():
+    with startup_step("firestore"):
+        await init_db()
+    with startup_step("cached_jobs"):
+        await load_cached_jobs()
+    prewarmer.start(prewarm_job_skills, llm_load)
 
-app = FastAPI(title="Career Craft API", version="3.0.0")
+async def _init_model():
+    with startup_step("model"):
+        await asyncio.to_thread(get_model)
+
+async def _warm_up():
+    results = await asyncio.gather(
+        _init_auth(),
+        _init_model(),
+        _init_firestore(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Startup warm-up step failed: %s", result)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_model_config()  # fails startup on a missing API key rather than the first request
+    warm_up_task = asyncio.create_task(_warm_up())
+    yield
+    warm_up_task.cancel()
+    prewarmer.stop()
+    stop_key_refresh()
+    shutdown_parser_pool()
+    await close_db()
+    await rate_limiter.close()
+    stop_logging()
+
+app = FastAPI(title="Career Craft API", version="3.0.0", lifespan=lifespan)
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "Welcome to the Career Craft"}
 
+# --- Metrics ---
+register_collector("skills_cache", skills_cache.stats)
+register_collector("resume_cache", resume_cache.stats)
+register_collector("token_cache", token_cache_stats)
+register_collector("singleflight", singleflight_stats)
+register_collector("analysis_source", analysis_source_stats)
+register_collector("write_queue", write_queue.stats)
+register_collector("llm", llm_stats)
+register_collector("startup", startup_stats)
+register_collector("prewarm", prewarmer.stats)
+register_collector("career_path_cache", career_path_cache.stats)
+register_collector("feedback", feedback_stats.stats)
+register_collector("rate_limit", rate_limiter.stats)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Request, span and LLM token histograms plus component counters, in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # --- CORS Configuration ---
 origins = [
     "https://pcsr-v2.web.app",
@@ -76,68 +136,182 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Added last so it wraps everything else and its timing covers CORS handling too.
+app.add_middleware(TimingMiddleware)
 
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 
 # --- API ENDPOINTS ---
+# --- Admission Control ---
+# Endpoints that may call Gemini take a token from the caller's bucket for that
+# endpoint (see admission.py). Requests over the limit, and calls the LLM queue
+# has no room for, are answered at once with 429 / 503 and Retry-After.
+
+def rate_limited(endpoint: str):
+    """A get_current_user dependency that also charges the user's rate limit for endpoint."""
+    async def dependency(current_user: dict = Depends(get_current_user)) -> dict:
+        await rate_limiter.check(current_user['uid'], endpoint)
+        return current_user
+    return dependency
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers={"Retry-After": exc.retry_after_header()})
+
 api_router = APIRouter()
 
 
 @api_router.post("/generate-path", response_model=CareerPathResponse, tags=["V3 Features - Protected"])
 async def generate_career_path_endpoint(
     request: CareerPathRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("generate-path"))
 ):
-    result_dict = generate_career_path(
+    result_dict = await generate_career_path(
         current_skills=request.current_skills,
         target_job=request.target_job
     )
     return CareerPathResponse(**result_dict)
 
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+@api_router.post("/generate-path/stream", tags=["V3 Features - Protected"])
+async def generate_career_path_stream(
+    request: CareerPathRequest,
+    current_user: dict = Depends(rate_limited("generate-path"))
+):
+    """
+    Server-Sent Events variant of /generate-path. Sends an "item" event
+    ({"field", "value"}) for every milestone, next skill and recommended
+    action as soon as Gemini has written it, then a "complete" event with the
+    full CareerPathResponse, or an "error" event.
+    """
+    async def events():
+        try:
+            async for kind, field, value in stream_career_path(request.current_skills, request.target_job):
+                if kind == "item":
+                    yield _sse("item", json.dumps({"field": field, "value": value}))
+                else:
+                    yield _sse("complete", CareerPathResponse(**value).model_dump_json())
+        except OverloadedError as e:
+            # Headers are already sent, so the retry hint travels in the event.
+            yield _sse("error", json.dumps({"detail": str(e), "retry_after": int(e.retry_after_header())}))
+        except Exception as e:
+            logger.error("Agent Error (stream_career_path): %s", e)
+            yield _sse("error", json.dumps({"detail": "Could not generate a career path."}))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.post("/get-skills-for-job", response_model=SkillRequirementsResponse, tags=["V3 Features - Protected"])
 async def get_detailed_skills(
     request: SkillRequirementsRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("get-skills-for-job"))
 ):
-    result_dict = get_skills_for_job(job_title=request.job_title)
+    result_dict = await get_skills_for_job(job_title=request.job_title)
     return SkillRequirementsResponse(**result_dict)
 
+def _batch_error(e: Exception) -> str:
+    return str(e) or e.__class__.__name__
+
+@api_router.post("/get-skills-for-job/batch", response_model=BatchSkillRequirementsResponse, tags=["V3 Features - Protected"])
+async def get_detailed_skills_batch(
+    request: BatchSkillRequirementsRequest,
+    current_user: dict = Depends(rate_limited("get-skills-for-job/batch"))
+):
+    results = await get_skills_for_jobs(request.job_titles)
+    response = []
+    for title in request.job_titles:
+        try:
+            if isinstance(results[title], Exception):
+                raise results[title]
+            response.append(SkillRequirementsResult(job_title=title, skills=SkillRequirementsResponse(**results[title])))
+        except Exception as e:
+            response.append(SkillRequirementsResult(job_title=title, error=_batch_error(e)))
+    return BatchSkillRequirementsResponse(results=response)
+
 @api_router.post("/save-path", tags=["V3 Features - Protected"])
 async def save_path(request: SavePathRequest, current_user: dict = Depends(get_current_user)):
     user_id = current_user['uid']
-    save_career_path(
+    await save_career_path(
         user_id=user_id,
         target_job=request.target_job,
         path_data=request.path_data.dict()
     )
     return {"status": "success", "message": "Path saved successfully."}
 
+def _encode_cursor(path: dict) -> str:
+    position = json.dumps([path['saved_at'].isoformat(), path['path_id']])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        saved_at, path_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+        return datetime.fromisoformat(saved_at), str(path_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def _path_error(e: Exception) -> HTTPException:
+    if "not found" in str(e).lower():
+        return HTTPException(status_code=404, detail=str(e))
+    if "permission" in str(e).lower():
+        return HTTPException(status_code=403, detail=str(e))
+    return HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+
 @api_router.get("/my-paths", tags=["V3 Features - Protected"])
-async def get_my_paths(current_user: dict = Depends(get_current_user)):
+async def get_my_paths(
+    request: Request,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=100),
+    cursor: str | None = None,
+    summary: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Lists the user's saved paths, newest first. Without a limit every path is
+    returned. With one, pass next_cursor back as cursor for the next page.
+    summary=true returns only path_id, target_job and saved_at; fetch the full
+    path from /my-paths/{path_id}.
+    """
     user_id = current_user['uid']
-    paths = get_saved_paths(user_id=user_id)
-    return {"paths": paths}
+    start_after = _decode_cursor(cursor) if cursor else None
+    paths, etag = await list_saved_paths(user_id=user_id, limit=limit, start_after=start_after, summary=summary)
+    if etag:
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+    next_cursor = _encode_cursor(paths[-1]) if limit and len(paths) == limit else None
+    return {"paths": paths, "next_cursor": next_cursor}
+
+@api_router.get("/my-paths/{path_id}", tags=["V3 Features - Protected"])
+async def get_my_path(path_id: str, current_user: dict = Depends(get_current_user)):
+    user_id = current_user['uid']
+    try:
+        return await get_saved_path(user_id=user_id, path_id=path_id)
+    except Exception as e:
+        raise _path_error(e)
 
 @api_router.delete("/my-paths/{path_id}", tags=["V3 Features - Protected"])
 async def delete_path(path_id: str, current_user: dict = Depends(get_current_user)):
     user_id = current_user['uid']
     try:
-        delete_saved_path(user_id=user_id, path_id=path_id)
+        await delete_saved_path(user_id=user_id, path_id=path_id)
         return {"status": "success", "message": "Path deleted successfully."}
     except Exception as e:
-        if "not found" in str(e).lower():
-            raise HTTPException(status_code=404, detail=str(e))
-        if "permission" in str(e).lower():
-            raise HTTPException(status_code=403, detail=str(e))
-        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+        raise _path_error(e)
 
 
 @api_router.post("/suggest-jobs", response_model=JobSuggestionResponse, tags=["V2 Features - Protected"])
 async def suggest_jobs(
     resume_file: UploadFile = File(None),
     skills: str = Form(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("suggest-jobs"))
 ):
     user_id = current_user['uid']
     skills_to_save = []
@@ -145,18 +319,29 @@ async def suggest_jobs(
 
     try:
         if resume_file:
-            resume_text = await parse_resume(resume_file)
-            if not resume_text or resume_text.isspace():
-                raise HTTPException(status_code=422, detail="Failed to extract any text from the uploaded resume. The file might be empty, scanned, or in an unsupported format.")
+            content = await read_upload(resume_file)
+            cached_entry = await resume_cache.get_by_content(content)
+            if cached_entry is None:
+                resume_text = await parse_resume_content(content, resume_file.content_type)
+                if not resume_text or resume_text.isspace():
+                    raise HTTPException(status_code=422, detail="Failed to extract any text from the uploaded resume. The file might be empty, scanned, or in an unsupported format.")
+
+                cached_entry = await resume_cache.get_by_text(resume_text)
+                if cached_entry is not None:
+                    resume_cache.link_content(content, cached_entry)
 
-            suggestions_result_dict = await get_suggestions_and_skills_from_resume(resume_text)
+            if cached_entry is not None:
+                suggestions_result_dict = resume_cache.with_fresh_ids(cached_entry)
+            else:
+                suggestions_result_dict = await get_suggestions_and_skills_from_resume(resume_text)
+                if suggestions_result_dict.get("suggestions"):
+                    await resume_cache.store(content, resume_text, suggestions_result_dict)
             skills_to_save = suggestions_result_dict.get("parsed_skills", [])
 
         elif skills:
-            content_for_agent = skills
             skills_to_save = [s.strip() for s in skills.split(',') if s.strip()]
-            
-            suggestions_result_dict = await get_job_suggestions(content_for_agent)
+
+            suggestions_result_dict = await suggest_jobs_for_skills(skills_to_save)
             
             suggestions_result_dict['parsed_skills'] = skills_to_save
         
@@ -165,15 +350,22 @@ async def suggest_jobs(
 
     except HTTPException as http_exc:
         raise http_exc 
+    except OverloadedError:
+        raise
     except Exception as e:
-        print(f"!!! UNHANDLED CRITICAL ERROR in suggest_jobs endpoint: {e}")
+        logger.error("UNHANDLED CRITICAL ERROR in suggest_jobs endpoint: %s", e)
         raise HTTPException(status_code=500, detail="An internal server error occurred while processing the request.")
 
     if not suggestions_result_dict or not suggestions_result_dict.get("suggestions"):
         raise HTTPException(status_code=404, detail="The AI advisor could not generate job suggestions for the provided input. Please try a different resume or be more specific with your skills.")
 
+    # Titles other users found helpful move up; no extra LLM call.
+    suggestions_result_dict["suggestions"] = await feedback_stats.rerank(suggestions_result_dict["suggestions"])
+
     if skills_to_save:
-        save_user_skills(user_id=user_id, skills=skills_to_save)
+        await save_user_skills(user_id=user_id, skills=skills_to_save)
+    # The user is likely to open one of these next; have their skills ready.
+    skills_cache.prefill([suggestion["job_title"] for suggestion in suggestions_result_dict["suggestions"]])
 
     return suggestions_result_dict
 
@@ -183,20 +375,46 @@ async def handle_feedback(
     current_user: dict = Depends(get_current_user)
 ):
     user_id = current_user['uid']
-    save_feedback(
+    await save_feedback(
         suggestion_id=request.suggestion_id,
         job_title=request.job_title,
         user_id=user_id,
         rating=request.rating
     )
+    await feedback_stats.record(user_id, request.job_title, request.rating)
     return {"status": "success", "message": "Feedback received"}
 
+@api_router.get("/feedback/stats", response_model=FeedbackStatsResponse, tags=["V2 Features - Protected"])
+async def get_feedback_stats(
+    job_title: str = Query(..., min_length=1),
+    current_user: dict = Depends(get_current_user)
+):
+    """Helpful / not-helpful totals for a job title, from the sharded counters (cached)."""
+    counts = await feedback_stats.counts(job_title)
+    return FeedbackStatsResponse(job_title=job_title, **counts)
+
 @api_router.post("/analyze", response_model=SkillAnalysisResponse, tags=["VList Features - Protected"])
 async def analyze_skills(
     request: SkillAnalysisRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("analyze"))
 ):
-    result_dict = analyze_skills_for_job(skills=request.skills, job_title=request.job_title)
+    result_dict = await analyze_skills_for_job(skills=request.skills, job_title=request.job_title)
     return SkillAnalysisResponse(**result_dict)
 
+@api_router.post("/analyze/batch", response_model=BatchSkillAnalysisResponse, tags=["VList Features - Protected"])
+async def analyze_skills_batch(
+    request: BatchSkillAnalysisRequest,
+    current_user: dict = Depends(rate_limited("analyze/batch"))
+):
+    results = await analyze_skills_for_jobs(skills=request.skills, job_titles=request.job_titles)
+    response = []
+    for title in request.job_titles:
+        try:
+            if isinstance(results[title], Exception):
+                raise results[title]
+            response.append(SkillAnalysisResult(job_title=title, analysis=SkillAnalysisResponse(**results[title])))
+        except Exception as e:
+            response.append(SkillAnalysisResult(job_title=title, error=_batch_error(e)))
+    return BatchSkillAnalysisResponse(results=response)
+
 app.include_router(api_router, prefix="/api")
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+An in-process stand-in for the subset of google.cloud.firestore.AsyncClient
+that database.py uses. Selected with FIRESTORE_BACKEND=memory for local runs,
+tests and load tests; data lives only as long as the process.
+"""
+import copy
+import uuid
+
+DESCENDING = "DESCENDING"
+ASCENDING = "ASCENDING"
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class Increment:
+    """Server-side increment transform, as google.cloud.firestore.Increment."""
+    def __init__(self, value):
+        self.value = value
+
+
+def _order_value(path: str, data: dict, field_path: str):
+    # "__name__" orders by document, as Firestore does.
+    return path if field_path == "__name__" else _get_field(data, field_path)
+
+
+def _get_field(data: dict, field_path: str):
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data: dict | None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        return _get_field(self._data or {}, field_path)
+
+
+class AsyncDocumentReference:
+    def __init__(self, client, path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str):
+        return AsyncCollectionReference(self._client, f"{self.path}/{name}")
+
+    async def get(self, field_paths=None, transaction=None) -> DocumentSnapshot:
+        return self._client._snapshot(self, field_paths)
+
+    async def set(self, data: dict, merge: bool = False):
+        self._client._write(self.path, data, merge=merge)
+
+    async def update(self, data: dict):
+        if self.path not in self._client._documents:
+            raise Exception(f"No document to update: {self.path}")
+        self._client._write(self.path, data, merge=True)
+
+    async def delete(self):
+        self._client._documents.pop(self.path, None)
+
+
+class AsyncQuery:
+    def __init__(self, client, collection_path: str):
+        self._client = client
+        self._collection_path = collection_path
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._start_after = None
+        self._projection = None
+
+    def _copy(self):
+        query = AsyncQuery(self._client, self._collection_path)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._start_after = self._start_after
+        query._projection = self._projection
+        return query
+
+    def where(self, field_path: str = None, op_string: str = None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        query = self._copy()
+        query._filters.append((field_path, _OPERATORS[op_string], value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        query = self._copy()
+        query._orders.append((field_path, direction))
+        return query
+
+    def limit(self, count: int):
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def start_after(self, document_fields_or_snapshot):
+        query = self._copy()
+        if isinstance(document_fields_or_snapshot, DocumentSnapshot):
+            query._start_after = {**document_fields_or_snapshot.to_dict(), "__name__": document_fields_or_snapshot.reference}
+        else:
+            query._start_after = dict(document_fields_or_snapshot)
+        name = query._start_after.get("__name__")
+        if isinstance(name, AsyncDocumentReference):
+            query._start_after["__name__"] = name.path
+        elif isinstance(name, str) and "/" not in name:
+            query._start_after["__name__"] = f"{self._collection_path}/{name}"
+        return query
+
+    def select(self, field_paths):
+        query = self._copy()
+        query._projection = list(field_paths)
+        return query
+
+    def _matches(self):
+        prefix = self._collection_path + "/"
+        for path, data in list(self._client._documents.items()):
+            if not path.startswith(prefix) or "/" in path[len(prefix):]:
+                continue
+            if all(op(_get_field(data, field), value) for field, op, value in self._filters):
+                yield path, data
+
+    def _after_cursor(self, path: str, data: dict) -> bool:
+        for field, direction in self._orders:
+            if field not in self._start_after:
+                # A cursor on leading fields only skips everything equal on them.
+                return False
+            value, cursor = _order_value(path, data, field), self._start_after[field]
+            if value == cursor:
+                continue
+            return value < cursor if direction == DESCENDING else value > cursor
+        return False
+
+    async def stream(self):
+        results = list(self._matches())
+        for field, direction in reversed(self._orders):
+            results = [r for r in results if _order_value(*r, field) is not None]
+            results.sort(key=lambda r: _order_value(*r, field), reverse=direction == DESCENDING)
+        if self._start_after is not None and self._orders:
+            results = [r for r in results if self._after_cursor(*r)]
+        if self._limit is not None:
+            results = results[:self._limit]
+        for path, _ in results:
+            yield self._client._snapshot(AsyncDocumentReference(self._client, path), self._projection)
+
+    async def get(self) -> list:
+        return [doc async for doc in self.stream()]
+
+
+class AsyncCollectionReference(AsyncQuery):
+    def __init__(self, client, path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str = None) -> AsyncDocumentReference:
+        document_id = document_id or uuid.uuid4().hex[:20]
+        return AsyncDocumentReference(self._client, f"{self._collection_path}/{document_id}")
+
+
+class AsyncWriteBatch:
+    """Buffers writes and applies them together on commit()."""
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference: AsyncDocumentReference, data: dict, merge: bool = False):
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference: AsyncDocumentReference, data: dict):
+        self._writes.append(("update", reference, data, True))
+
+    def delete(self, reference: AsyncDocumentReference):
+        self._writes.append(("delete", reference, None, False))
+
+    async def commit(self):
+        for op, reference, _, _ in self._writes:
+            if op == "update" and reference.path not in self._client._documents:
+                raise Exception(f"No document to update: {reference.path}")
+        for op, reference, data, merge in self._writes:
+            if op == "delete":
+                self._client._documents.pop(reference.path, None)
+            else:
+                self._client._write(reference.path, data, merge=merge)
+        self._writes = []
+
+
+class AsyncTransaction(AsyncWriteBatch):
+    """
+    Writes applied together on commit(). Reads inside it see committed data
+    only; with a single event loop and no real I/O, nothing can commit between
+    a transaction's reads and its commit, so there is no contention to retry.
+    """
+
+
+def async_transactional(fn):
+    """As google.cloud.firestore.async_transactional: runs fn(transaction), then commits it."""
+    async def run(transaction, *args, **kwargs):
+        result = await fn(transaction, *args, **kwargs)
+        await transaction.commit()
+        return result
+    return run
+
+
+class AsyncClient:
+    def __init__(self):
+        self._documents = {}
+
+    def collection(self, name: str) -> AsyncCollectionReference:
+        return AsyncCollectionReference(self, name)
+
+    def document(self, path: str) -> AsyncDocumentReference:
+        return AsyncDocumentReference(self, path)
+
+    def batch(self) -> AsyncWriteBatch:
+        return AsyncWriteBatch(self)
+
+    def transaction(self) -> AsyncTransaction:
+        return AsyncTransaction(self)
+
+    async def get_all(self, references, field_paths=None):
+        for reference in references:
+            yield self._snapshot(reference, field_paths)
+
+    def close(self):
+        pass
+
+    def _snapshot(self, reference: AsyncDocumentReference, field_paths=None) -> DocumentSnapshot:
+        data = self._documents.get(reference.path)
+        if data is not None:
+            data = copy.deepcopy(data)
+            if field_paths is not None:
+                data = {f: data[f] for f in field_paths if f in data}
+        return DocumentSnapshot(reference, data)
+
+    def _write(self, path: str, data: dict, merge: bool = False):
+        current = self._documents.get(path, {}) if merge else {}
+        updated = copy.deepcopy(current)
+        for field, value in data.items():
+            if isinstance(value, Increment):
+                existing = updated.get(field)
+                updated[field] = (existing if isinstance(existing, (int, float)) else 0) + value.value
+            else:
+                updated[field] = copy.deepcopy(value)
+        self._documents[path] = updated
@@ -0,0 +1,198 @@
+"""
+Background pre-warming of job_skills_cache.
+
+skills_cache reports every user lookup of a title (record_demand) and every
+entry it reads or writes with its age (record_cached). Demand is a per-document
+score that halves every PREWARM_DEMAND_HALF_LIFE_HOURS, so it follows what is
+popular now rather than what was popular once.
+
+The scheduler makes one LLM call at a time, spaced at least
+60 / PREWARM_MAX_PER_MINUTE seconds apart, and only while the LLM client's
+load (the share of its concurrency slots wanted by callers) is below
+PREWARM_MAX_BUSY_SHARE, so it never competes with interactive requests for
+quota. Each call is one of:
+  - a title from /api/suggest-jobs results that is not cached yet (prefill);
+    users are likely to open the skills of a title they were just shown;
+  - the hottest of the top PREWARM_HOT_TITLES entries that expires within
+    PREWARM_REFRESH_WINDOW_HOURS (or already has), refreshed before the next
+    user would have paid for the Gemini call.
+
+tests/test_prewarm.py and benchmarks/bench_prewarm.py run it against the
+fake LLM and the in-memory Firestore.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_MAX_PER_MINUTE = float(os.getenv("PREWARM_MAX_PER_MINUTE", "6"))
+PREWARM_MAX_BUSY_SHARE = float(os.getenv("PREWARM_MAX_BUSY_SHARE", "0.25"))
+PREWARM_REFRESH_WINDOW_HOURS = float(os.getenv("PREWARM_REFRESH_WINDOW_HOURS", "72"))
+PREWARM_HOT_TITLES = int(os.getenv("PREWARM_HOT_TITLES", "200"))
+PREWARM_MIN_DEMAND = float(os.getenv("PREWARM_MIN_DEMAND", "2"))
+PREWARM_DEMAND_HALF_LIFE_HOURS = float(os.getenv("PREWARM_DEMAND_HALF_LIFE_HOURS", "24"))
+# Titles with demand scores, and failed titles remembered for their cooldown, kept at most.
+PREWARM_MAX_TRACKED = int(os.getenv("PREWARM_MAX_TRACKED", "5000"))
+# Idle wait between checks for refreshes; new prefills wake the scheduler at once.
+PREWARM_INTERVAL_SECONDS = float(os.getenv("PREWARM_INTERVAL_SECONDS", "30"))
+# A title whose fetch failed is not retried for this long.
+_FAILURE_COOLDOWN_SECONDS = 600
+_MAX_PREFILL_QUEUE = 500
+
+
+class Prewarmer:
+    def __init__(self):
+        self._demand = {}                 # doc id -> [score, monotonic time of score, latest title]
+        self._expires = {}                # doc id -> datetime the Firestore entry goes stale
+        self._prefill = OrderedDict()     # doc id -> title, oldest first
+        self._failed = {}                 # doc id -> monotonic time of the last failure, oldest first
+        self._fetch = None
+        self._load = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._counters = {"refreshed": 0, "prefilled": 0, "already_cached": 0, "failed": 0, "deferred_busy": 0}
+
+    # --- Signals ---
+
+    def _score(self, entry: list, now: float) -> float:
+        score, at, _ = entry
+        return score * 0.5 ** ((now - at) / (PREWARM_DEMAND_HALF_LIFE_HOURS * 3600))
+
+    def record_demand(self, doc_id: str, job_title: str):
+        """Counts a user lookup of a title."""
+        now = time.monotonic()
+        entry = self._demand.get(doc_id)
+        if entry is None:
+            if len(self._demand) >= PREWARM_MAX_TRACKED:
+                self._evict(now)
+            self._demand[doc_id] = [1.0, now, job_title]
+        else:
+            entry[:] = [self._score(entry, now) + 1.0, now, job_title]
+
+    def _evict(self, now: float):
+        # Drops the coldest tenth at once, so eviction runs rarely.
+        coldest = sorted(self._demand, key=lambda doc_id: self._score(self._demand[doc_id], now))
+        for doc_id in coldest[:max(1, len(coldest) // 10)]:
+            del self._demand[doc_id]
+
+    def record_cached(self, doc_id: str, cached_at: datetime, max_age: timedelta):
+        """Notes when a cached entry goes stale; a fresh write also settles any pending prefill."""
+        self._expires[doc_id] = cached_at + max_age
+        self._prefill.pop(doc_id, None)
+
+    def prefill(self, entries: list[tuple[str, str]]):
+        """Queues (doc id, title) pairs, e.g. from job suggestions, to be fetched if not cached."""
+        for doc_id, job_title in entries:
+            if doc_id in self._expires or doc_id in self._prefill:
+                continue
+            if len(self._prefill) >= _MAX_PREFILL_QUEUE:
+                self._prefill.popitem(last=False)
+            self._prefill[doc_id] = job_title
+        if self._prefill:
+            self._wakeup.set()
+
+    # --- Scheduling ---
+
+    def _cooling_down(self, doc_id: str, now: float) -> bool:
+        failed_at = self._failed.get(doc_id)
+        return failed_at is not None and now - failed_at < _FAILURE_COOLDOWN_SECONDS
+
+    def next_item(self) -> tuple[str, str, bool] | None:
+        """Returns (doc id, title, is_refresh) for the most useful fetch, or None."""
+        now = time.monotonic()
+        while self._prefill:
+            doc_id, job_title = self._prefill.popitem(last=False)
+            if doc_id not in self._expires and not self._cooling_down(doc_id, now):
+                return doc_id, job_title, False
+
+        refresh_before = datetime.now(timezone.utc) + timedelta(hours=PREWARM_REFRESH_WINDOW_HOURS)
+        hottest = sorted(self._demand.items(), key=lambda item: -self._score(item[1], now))[:PREWARM_HOT_TITLES]
+        for doc_id, entry in hottest:
+            if self._score(entry, now) < PREWARM_MIN_DEMAND:
+                break
+            expires_at = self._expires.get(doc_id)
+            if expires_at is not None and expires_at <= refresh_before and not self._cooling_down(doc_id, now):
+                return doc_id, entry[2], True
+        return None
+
+    def _record_failure(self, doc_id: str, now: float):
+        self._failed.pop(doc_id, None)
+        self._failed[doc_id] = now
+        # Forget failures past their cooldown, and the oldest beyond PREWARM_MAX_TRACKED.
+        while self._failed:
+            oldest, failed_at = next(iter(self._failed.items()))
+            if now - failed_at < _FAILURE_COOLDOWN_SECONDS and len(self._failed) <= PREWARM_MAX_TRACKED:
+                break
+            del self._failed[oldest]
+
+    def _busy(self) -> bool:
+        return self._load() >= PREWARM_MAX_BUSY_SHARE
+
+    async def run_once(self) -> bool:
+        """Makes at most one fetch. Returns whether an LLM call was made."""
+        if self._busy():
+            self._counters["deferred_busy"] += 1
+            return False
+        item = self.next_item()
+        if item is None:
+            return False
+        doc_id, job_title, is_refresh = item
+        try:
+            called = await self._fetch(job_title, is_refresh)
+        except Exception as e:
+            self._counters["failed"] += 1
+            self._record_failure(doc_id, time.monotonic())
+            logger.warning("Prewarm of %s failed: %s", job_title, e)
+            return True
+        if not called:
+            self._counters["already_cached"] += 1
+            return False
+        self._counters["refreshed" if is_refresh else "prefilled"] += 1
+        logger.debug("Prewarmed skills for %s (%s)", job_title, "refresh" if is_refresh else "prefill")
+        return True
+
+    async def _run(self):
+        spacing = 60 / PREWARM_MAX_PER_MINUTE
+        while True:
+            fetched = await self.run_once()
+            if fetched or self._busy():
+                await asyncio.sleep(spacing)
+            elif not self._prefill:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=PREWARM_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+    def start(self, fetch, load):
+        """
+        Starts the scheduler. fetch(job_title, refresh) stores a title's skills and
+        returns whether it called the LLM; load() is the LLM client's share of
+        concurrency in use (1.0 while it is unavailable).
+        """
+        self._fetch, self._load = fetch, load
+        if PREWARM_ENABLED and PREWARM_MAX_PER_MINUTE > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            **self._counters,
+            "enabled": PREWARM_ENABLED,
+            "tracked_titles": len(self._demand),
+            "known_entries": len(self._expires),
+            "prefill_queue": len(self._prefill),
+            "cooling_down": len(self._failed),
+        }
+
+
+prewarmer = Prewarmer()
@@ -0,0 +1,92 @@
+"""
+Cache for resume analyses, keyed by content hash.
+
+Entries are found either by the SHA-256 of the uploaded bytes (no parsing
+needed) or by the hash of the whitespace-normalized extracted text, so the
+same resume re-exported to a different file still hits. The memory tier keeps
+the parsed text, parsed_skills and suggestions; the optional Firestore tier
+(RESUME_CACHE_FIRESTORE=true) keeps only parsed_skills and suggestions, so
+resume text never leaves the process. suggestion_id values are not cached:
+with_fresh_ids() mints new ones for every response.
+"""
+import os
+import uuid
+import hashlib
+from datetime import datetime, timezone, timedelta
+from cache import TTLCache, MISSING
+from database import get_cached_resume, cache_resume
+from telemetry import span
+
+RESUME_CACHE_MAX_ENTRIES = int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "512"))
+RESUME_CACHE_TTL_SECONDS = float(os.getenv("RESUME_CACHE_TTL_SECONDS", "86400"))
+RESUME_CACHE_FIRESTORE = os.getenv("RESUME_CACHE_FIRESTORE", "false").lower() == "true"
+
+_memory = TTLCache(maxsize=RESUME_CACHE_MAX_ENTRIES, ttl=RESUME_CACHE_TTL_SECONDS)
+
+def content_hash(content: bytes) -> str:
+    return "bytes-" + hashlib.sha256(content).hexdigest()
+
+def text_hash(resume_text: str) -> str:
+    return "text-" + hashlib.sha256(" ".join(resume_text.split()).encode("utf-8")).hexdigest()
+
+async def _get(key: str) -> dict | None:
+    with span("cache"):
+        return await _lookup(key)
+
+async def _lookup(key: str) -> dict | None:
+    entry = _memory.get(key)
+    if entry is not MISSING:
+        return entry
+    if not RESUME_CACHE_FIRESTORE:
+        return None
+
+    entry = await get_cached_resume(key)
+    if entry is None:
+        return None
+    age = datetime.now(timezone.utc) - entry.get('cached_at', datetime.now(timezone.utc))
+    remaining = timedelta(seconds=RESUME_CACHE_TTL_SECONDS) - age
+    if remaining.total_seconds() <= 0:
+        return None
+    entry = {"parsed_skills": entry.get("parsed_skills", []), "suggestions": entry.get("suggestions", [])}
+    _memory.set(key, entry, ttl=remaining.total_seconds())
+    return entry
+
+async def get_by_content(content: bytes) -> dict | None:
+    """Looks a resume up by its raw bytes, before any parsing."""
+    return await _get(content_hash(content))
+
+async def get_by_text(resume_text: str) -> dict | None:
+    """Looks a resume up by its extracted text."""
+    return await _get(text_hash(resume_text))
+
+async def store(content: bytes, resume_text: str, result: dict):
+    """Caches an analysis under both the content hash and the text hash."""
+    entry = {
+        "resume_text": resume_text,
+        "parsed_skills": list(result.get("parsed_skills") or []),
+        "suggestions": [
+            {k: v for k, v in suggestion.items() if k != "suggestion_id"}
+            for suggestion in result.get("suggestions", [])
+        ],
+    }
+    keys = (content_hash(content), text_hash(resume_text))
+    for key in keys:
+        _memory.set(key, entry)
+    if RESUME_CACHE_FIRESTORE:
+        persisted = {"parsed_skills": entry["parsed_skills"], "suggestions": entry["suggestions"]}
+        for key in keys:
+            await cache_resume(key, persisted)
+
+def link_content(content: bytes, entry: dict):
+    """Lets a later upload of the same bytes skip parsing, after a hit by text hash."""
+    _memory.set(content_hash(content), entry)
+
+def with_fresh_ids(entry: dict) -> dict:
+    """Builds a response from a cached entry with newly minted suggestion_ids."""
+    return {
+        "parsed_skills": list(entry.get("parsed_skills") or []),
+        "suggestions": [{**suggestion, "suggestion_id": str(uuid.uuid4())} for suggestion in entry.get("suggestions", [])],
+    }
+
+def stats() -> dict:
+    return _memory.stats()
@@ -0,0 +1,197 @@
+"""
+Packs resume text into a token budget before it goes into a prompt.
+
+Instead of cutting the raw text at a fixed character count, the text is
+normalized (whitespace, bullets, page furniture), stripped of contact
+details and boilerplate, and split into sections by their headings. Sections
+are then admitted in order of usefulness (skills, experience, projects, ...)
+until RESUME_TOKEN_BUDGET is spent, and emitted in their original order. A
+section that only partly fits keeps its first lines, which on a resume are
+the most recent ones.
+
+Token counts are estimated locally (see estimate_tokens); they track Gemini's
+tokenizer closely enough for budgeting without a network call.
+"""
+import os
+import re
+import unicodedata
+
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "1000"))
+
+# Canonical section -> headings that introduce it (matched case-insensitively, whole line).
+SECTION_HEADINGS = {
+    "summary": ("summary", "professional summary", "profile", "professional profile", "about me", "objective", "career objective", "career summary", "overview"),
+    "skills": ("skills", "technical skills", "key skills", "core skills", "core competencies", "competencies", "technologies", "tech stack", "tools", "tools and technologies", "skills and tools", "areas of expertise", "expertise", "technical proficiency"),
+    "experience": ("experience", "work experience", "professional experience", "employment", "employment history", "work history", "career history", "internships", "internship", "relevant experience"),
+    "projects": ("projects", "personal projects", "academic projects", "key projects", "selected projects", "side projects"),
+    "education": ("education", "academic background", "qualifications", "academic qualifications", "education and training"),
+    "certifications": ("certifications", "certificates", "licenses", "licenses and certifications", "courses", "training", "certifications and training"),
+    "achievements": ("achievements", "awards", "honors", "honours", "accomplishments", "awards and achievements"),
+    "publications": ("publications", "research", "papers", "patents", "talks", "presentations"),
+    "languages": ("languages", "spoken languages"),
+    "volunteering": ("volunteering", "volunteer experience", "leadership", "extracurricular activities", "activities"),
+    "interests": ("interests", "hobbies", "hobbies and interests"),
+    "references": ("references", "referees"),
+    "declaration": ("declaration",),
+    "personal": ("personal details", "personal information", "contact", "contact information", "contact details"),
+}
+_HEADING_TO_SECTION = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+
+# Admission order when packing; sections missing here are dropped entirely.
+SECTION_PRIORITY = (
+    "skills", "experience", "projects", "summary", "header", "certifications", "education",
+    "achievements", "publications", "volunteering", "languages", "other", "interests",
+)
+
+# Until every section has had a turn, none may take more than this share of the budget.
+_FIRST_PASS_SHARE = 0.4
+_MAX_LINE_WORDS = 40
+
+_BULLET = re.compile(r"^[•●▪◦■□➢►▸‣∙·*\-–—]+\s*")
+_EMAIL = re.compile(r"\b[\w.+-]+@[\w-]+(\.[\w-]+)+\b")
+_URL = re.compile(r"\b(https?://|www\.)\S+|\b(linkedin\.com|github\.com|gitlab\.com)/\S*", re.IGNORECASE)
+_PHONE = re.compile(r"(?<!\w)\+?\(?\d[\d\s().-]{7,}\d(?!\w)")
+# Lines that are nothing but personal details.
+_PERSONAL_LINE = re.compile(r"^(address|dob|date of birth|nationality|marital status|gender|passport( no)?)\b\s*[:|-]", re.IGNORECASE)
+_CONTACT_LABEL = re.compile(r"\b(e-?mail|phone|mobile|tel|cell|address|linkedin|github|portfolio|website|dob|date of birth)\s*:", re.IGNORECASE)
+_SEPARATOR_RUN = re.compile(r"[|·•,;](\s*[|·•,;])+")
+_PAGE_FURNITURE = re.compile(r"^(page \d+( of \d+)?|\d+ ?/ ?\d+|-+ ?\d+ ?-+|curriculum vitae|resume|cv)$", re.IGNORECASE)
+_BOILERPLATE = re.compile(r"references (are )?available (up)?on request|i hereby declare|the above (information|details) (is|are) true", re.IGNORECASE)
+_SEPARATORS_ONLY = re.compile(r"^[\s|,;:•·\-–—/()]*$")
+_TOKEN_PIECES = re.compile(r"[^\W\d_]+|\d+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximates the model's token count: words split into ~4-character
+    pieces, digits into ~3-digit pieces, one token per punctuation mark.
+    """
+    total = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece.isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece[0].isalpha():
+            total += (len(piece) + 3) // 4
+        else:
+            total += 1
+    return total
+
+
+def _normalize_line(line: str) -> str:
+    return _BULLET.sub("- ", " ".join(line.split()))
+
+
+def _digit_count(text: str) -> int:
+    return sum(map(text.count, "0123456789"))
+
+
+def _strip_phone(match: re.Match) -> str:
+    # Date ranges such as "2019 - 2021" look like numbers too; phone numbers have 9+ digits.
+    return "" if _digit_count(match.group()) >= 9 else match.group()
+
+
+def _strip_contact(line: str) -> str:
+    if _PERSONAL_LINE.match(line):
+        return ""
+    # The substring checks skip regexes that cannot match, which is most lines.
+    if "@" in line:
+        line = _EMAIL.sub("", line)
+    lowered = line.lower()
+    if "://" in line or "www." in lowered or ".com/" in lowered:
+        line = _URL.sub("", line)
+    if _digit_count(line) >= 9:
+        line = _PHONE.sub(_strip_phone, line)
+    if ":" in line:
+        line = _CONTACT_LABEL.sub("", line)
+    if _SEPARATORS_ONLY.match(line):
+        return ""
+    line = _SEPARATOR_RUN.sub(lambda match: match.group()[0], line)
+    return " ".join(line.split()).strip(" |·•,;")
+
+
+def _heading(line: str) -> str | None:
+    """Returns the canonical section for a heading line, or None for ordinary text."""
+    candidate = line.strip(" -:#*|").lower()
+    candidate = candidate.replace("&", "and")
+    if len(candidate.split()) > 5:
+        return None
+    return _HEADING_TO_SECTION.get(candidate)
+
+
+def _wrapped_lines(text: str):
+    # Some PDFs extract whole paragraphs as one line; split those so packing stays fine-grained.
+    for line in text.splitlines():
+        words = line.split(" ")
+        if len(words) <= _MAX_LINE_WORDS:
+            yield line
+            continue
+        for start in range(0, len(words), _MAX_LINE_WORDS):
+            yield " ".join(words[start:start + _MAX_LINE_WORDS])
+
+
+def split_sections(text: str) -> list[tuple[str, list[str]]]:
+    """
+    Normalizes resume text and splits it into (section, lines) in document order.
+    Lines before the first heading form the "header" section.
+    """
+    text = unicodedata.normalize("NFKC", text).replace("\u200b", "")
+    sections = [("header", [])]
+    for raw_line in _wrapped_lines(text):
+        line = _normalize_line(raw_line)
+        if not line or _PAGE_FURNITURE.match(line) or _BOILERPLATE.search(line):
+            continue
+        section = _heading(line)
+        if section is not None:
+            sections.append((section, []))
+            continue
+        line = _strip_contact(line)
+        if line and (not sections[-1][1] or sections[-1][1][-1] != line):
+            sections[-1][1].append(line)
+    return [(name, lines) for name, lines in sections if lines]
+
+
+def _take(costs: list[int], budget: float) -> tuple[int, int]:
+    """Returns how many leading lines fit in budget tokens, and their cost."""
+    count, spent = 0, 0
+    for cost in costs:
+        if spent + cost > budget:
+            break
+        count += 1
+        spent += cost
+    return count, spent
+
+
+def compact_resume(text: str, budget: int = RESUME_TOKEN_BUDGET) -> str:
+    """Returns the most useful parts of a resume that fit in `budget` estimated tokens."""
+    if not text:
+        return ""
+    sections = split_sections(text)
+    if len(sections) == 1 and sections[0][0] == "header":
+        # No headings found: treat the whole resume as one body of text.
+        sections = [("other", sections[0][1])]
+
+    order = sorted(
+        (index for index, (section, _) in enumerate(sections) if section in SECTION_PRIORITY),
+        key=lambda index: (SECTION_PRIORITY.index(sections[index][0]), index)
+    )
+    costs = {index: [estimate_tokens(line) + 1 for line in sections[index][1]] for index in order}
+    kept, spent = {}, {}  # section index -> number of lines kept, tokens spent on them
+    remaining = budget
+    # First pass: every section in priority order, each capped at a share of the
+    # budget. Second pass: whatever is left extends them, again in priority order.
+    for share in (budget * _FIRST_PASS_SHARE, budget):
+        for index in order:
+            taken = kept.get(index, 0)
+            heading_cost = 0 if taken else estimate_tokens(sections[index][0]) + 1
+            count, cost = _take(costs[index][taken:], min(share - spent.get(index, 0), remaining) - heading_cost)
+            if count:
+                kept[index] = taken + count
+                spent[index] = spent.get(index, 0) + cost + heading_cost
+                remaining -= cost + heading_cost
+
+    parts = []
+    for index, (section, _) in enumerate(sections):
+        if index in kept:
+            heading = "" if section in ("header", "other") else f"{section.upper()}:\n"
+            parts.append(heading + "\n".join(sections[index][1][:kept[index]]))
+    return "\n\n".join(parts)
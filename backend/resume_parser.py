@@ -1,40 +1,188 @@
+import logging
 import io
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import UploadFile, HTTPException
-from pypdf import PdfReader
-from docx import Document
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+# --- Parsing Limits ---
+RESUME_MAX_UPLOAD_BYTES = int(os.getenv("RESUME_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+RESUME_MAX_PAGES = int(os.getenv("RESUME_MAX_PAGES", "40"))
+RESUME_PARSE_TIMEOUT_SECONDS = float(os.getenv("RESUME_PARSE_TIMEOUT_SECONDS", "20"))
+RESUME_PARSE_WORKERS = int(os.getenv("RESUME_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDFs longer than this are split into page ranges parsed by different workers.
+RESUME_PAGES_PER_WORKER = int(os.getenv("RESUME_PAGES_PER_WORKER", "8"))
+
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+_workers = None
+
+def _new_executor() -> ProcessPoolExecutor:
+    # spawn rather than fork: the parent runs gRPC and event-loop threads that must not be forked.
+    return ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_import_parsers
+    )
+
+def _terminate(executor: ProcessPoolExecutor):
+    # ProcessPoolExecutor has no public way to stop a running task, so terminate its process.
+    for process in list(getattr(executor, "_processes", {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+class _ParserWorkers:
+    """
+    RESUME_PARSE_WORKERS single-process executors, each running one task at a
+    time. A task abandoned while it runs (the parse timed out, or the request
+    went away) terminates only its own process, which is replaced, so the
+    other parses in flight are unaffected.
+    """
+    def __init__(self, size: int):
+        self._executors = set()
+        self._idle = []
+        self._available = asyncio.Semaphore(size)
+
+    async def run(self, fn, *args):
+        async with self._available:
+            if not self._idle:
+                self._idle.append(_new_executor())
+                self._executors.add(self._idle[-1])
+            executor = self._idle.pop()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except (asyncio.CancelledError, BrokenProcessPool):
+                # The task is still running, or its process died: neither can take more work.
+                _terminate(executor)
+                self._executors.discard(executor)
+                executor = None
+                raise
+            finally:
+                if executor is not None:
+                    self._idle.append(executor)
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors.clear()
+        self._idle = []
+
+def _get_workers() -> _ParserWorkers:
+    global _workers
+    if _workers is None:
+        _workers = _ParserWorkers(RESUME_PARSE_WORKERS)
+    return _workers
+
+def shutdown_parser_pool():
+    global _workers
+    if _workers is not None:
+        _workers.shutdown()
+        _workers = None
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Reads an upload in chunks, rejecting it as soon as it exceeds RESUME_MAX_UPLOAD_BYTES."""
+    chunks = []
+    size = 0
+    while chunk := await file.read(64 * 1024):
+        size += len(chunk)
+        if size > RESUME_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Resume is too large. The maximum size is {RESUME_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+        chunks.append(chunk)
+    return b"".join(chunks)
 
 async def parse_resume(file: UploadFile) -> str:
     """
     Parses the raw text content from an uploaded file (PDF or DOCX).
     """
-    content = await file.read()
-    if file.content_type == "application/pdf":
-        return _parse_pdf(content)
-    elif file.content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-        return _parse_docx(content)
-    else:
+    content = await read_upload(file)
+    return await parse_resume_content(content, file.content_type)
+
+async def parse_resume_content(content: bytes, content_type: str) -> str:
+    """
+    Parses resume text from already-read file bytes in the parser process pool,
+    so a slow or hostile document never blocks the event loop.
+    """
+    if content_type not in (PDF_CONTENT_TYPE, DOCX_CONTENT_TYPE):
         raise HTTPException(status_code=415, detail="Unsupported file type. Please upload a PDF or DOCX file.")
 
-def _parse_pdf(content: bytes) -> str:
-    text = ""
     try:
-        reader = PdfReader(io.BytesIO(content))
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
-    except Exception as e:
+        with span("parse"):
+            if content_type == PDF_CONTENT_TYPE:
+                return await asyncio.wait_for(_parse_pdf_parallel(content), timeout=RESUME_PARSE_TIMEOUT_SECONDS)
+            return await asyncio.wait_for(_parse_docx_in_pool(content), timeout=RESUME_PARSE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Cancelling the parse has terminated and replaced the workers it was using.
+        logger.error("CRITICAL ERROR: Resume parsing exceeded %ss; restarting its parser workers.", RESUME_PARSE_TIMEOUT_SECONDS)
+        raise HTTPException(status_code=422, detail="The resume took too long to process. Please upload a simpler PDF or DOCX file.")
+
+async def _run_in_pool(fn, *args):
+    return await _get_workers().run(fn, *args)
 
-        print(f"!!! CRITICAL ERROR: PyPDF2 failed to parse PDF: {e} !!!")
+async def _parse_pdf_parallel(content: bytes) -> str:
+    try:
+        page_count, first_pages = await _run_in_pool(_parse_pdf_head, content, RESUME_MAX_PAGES, RESUME_PAGES_PER_WORKER)
+        if page_count > RESUME_MAX_PAGES:
+            raise HTTPException(status_code=422, detail=f"Resume has too many pages. The maximum is {RESUME_MAX_PAGES}.")
 
+        ranges = [
+            (start, min(start + RESUME_PAGES_PER_WORKER, page_count))
+            for start in range(RESUME_PAGES_PER_WORKER, page_count, RESUME_PAGES_PER_WORKER)
+        ]
+        rest = await asyncio.gather(*(_run_in_pool(_parse_pdf_pages, content, start, end) for start, end in ranges))
+        return "\n".join([first_pages, *rest])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("CRITICAL ERROR: PyPDF2 failed to parse PDF: %s", e)
         raise HTTPException(status_code=422, detail="Failed to parse PDF. The file may be corrupt or encrypted.")
 
+async def _parse_docx_in_pool(content: bytes) -> str:
+    try:
+        return await _run_in_pool(_parse_docx, content)
+    except Exception as e:
+        logger.error("CRITICAL ERROR: python-docx failed to parse DOCX: %s", e)
+        raise HTTPException(status_code=422, detail="Failed to parse .docx file. The file may be corrupt.")
+
+# --- Worker Functions ---
+# These run in the parser processes. They raise plain ValueErrors, which pickle
+# back to the parent reliably, and never HTTPExceptions. pypdf and python-docx
+# are imported here, not at module level, so the API process never pays for them.
+
+def _import_parsers():
+    """Worker initializer: loads the parsing libraries before the first task arrives."""
+    import pypdf
+    import docx
+
+def _parse_pdf_head(content: bytes, max_pages: int, pages: int) -> tuple[int, str]:
+    """Returns the page count and the text of the first `pages` pages (none if over max_pages)."""
+    from pypdf import PdfReader
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        page_count = len(reader.pages)
+        if page_count > max_pages:
+            return page_count, ""
+        return page_count, "\n".join(reader.pages[i].extract_text() or "" for i in range(min(pages, page_count)))
+    except Exception as e:
+        raise ValueError(str(e))
+
+def _parse_pdf_pages(content: bytes, start: int, end: int) -> str:
+    from pypdf import PdfReader
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        return "\n".join(reader.pages[i].extract_text() or "" for i in range(start, end))
+    except Exception as e:
+        raise ValueError(str(e))
+
 def _parse_docx(content: bytes) -> str:
-    text = ""
+    from docx import Document
     try:
         doc = Document(io.BytesIO(content))
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+        return "".join(para.text + "\n" for para in doc.paragraphs)
     except Exception as e:
-        print(f"!!! CRITICAL ERROR: python-docx failed to parse DOCX: {e} !!!")
-        raise HTTPException(status_code=422, detail="Failed to parse .docx file. The file may be corrupt.")
\ No newline at end of file
+        raise ValueError(str(e))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, StringConstraints
+from typing import Annotated, List, Optional
 
 # --- V1 Schemas ---
 class SkillAnalysisRequest(BaseModel):
@@ -9,6 +9,7 @@ class SkillAnalysisRequest(BaseModel):
 class SkillAnalysisResponse(BaseModel):
     matching_skills: List[str]
     missing_skills: List[str]
+    source: Optional[str] = None  # "local" (cached requirements) or "llm"
 
 # --- V2 Schemas ---
 class JobSuggestion(BaseModel):
@@ -25,6 +26,13 @@ class FeedbackRequest(BaseModel):
     job_title: str
     rating: str 
 
+class FeedbackStatsResponse(BaseModel):
+    job_title: str
+    helpful: int
+    not_helpful: int
+    total: int
+    helpful_rate: Optional[float] = None  # None until the title has been rated
+
 # --- V3 Schemas: Detailed Skills ---
 class SkillRequirementsRequest(BaseModel):
     job_title: str
@@ -34,6 +42,36 @@ class SkillRequirementsResponse(BaseModel):
     soft_skills: List[str]
     tool_skills: List[str]
 
+# --- V3 Schemas: Batch Requests ---
+# One call per results page instead of one per suggested title; each title succeeds or fails on its own.
+BATCH_MAX_TITLES = 20
+# Each title goes into an LLM prompt and a cache key, so blank and oversized ones are refused.
+BATCH_MAX_TITLE_LENGTH = 200
+BatchJobTitle = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=BATCH_MAX_TITLE_LENGTH)]
+
+class BatchSkillRequirementsRequest(BaseModel):
+    job_titles: List[BatchJobTitle] = Field(min_length=1, max_length=BATCH_MAX_TITLES)
+
+class SkillRequirementsResult(BaseModel):
+    job_title: str
+    skills: Optional[SkillRequirementsResponse] = None
+    error: Optional[str] = None
+
+class BatchSkillRequirementsResponse(BaseModel):
+    results: List[SkillRequirementsResult]
+
+class BatchSkillAnalysisRequest(BaseModel):
+    skills: List[str]
+    job_titles: List[BatchJobTitle] = Field(min_length=1, max_length=BATCH_MAX_TITLES)
+
+class SkillAnalysisResult(BaseModel):
+    job_title: str
+    analysis: Optional[SkillAnalysisResponse] = None
+    error: Optional[str] = None
+
+class BatchSkillAnalysisResponse(BaseModel):
+    results: List[SkillAnalysisResult]
+
 # --- V3 Schemas: Career Path ---
 class CareerPathRequest(BaseModel):
     current_skills: List[str]
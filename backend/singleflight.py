@@ -0,0 +1,40 @@
+"""
+Coalesces concurrent calls that share a key into a single upstream call.
+The first caller starts the work; everyone arriving while it is in flight
+awaits the same task and gets the same result or exception.
+"""
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key, fn):
+        """Runs fn() once per key at a time and shares its result with concurrent callers."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shield so one caller disconnecting does not cancel the work for the others.
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        # Mark the exception retrieved, in case every caller was cancelled before it arrived.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+        }
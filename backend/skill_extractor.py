@@ -0,0 +1,317 @@
+"""
+Local skill extraction with an Aho-Corasick automaton.
+
+The automaton is built from a built-in skill taxonomy, the alias table in
+skills.py and every skill seen in job_skills_cache. It scans text once,
+case- and punctuation-insensitively, and keeps whole-word, leftmost-longest
+matches. It is built lazily on first use and can be saved to and loaded from
+SKILL_AUTOMATON_PATH so new workers skip the build. Skills that reach the job
+cache later are folded into a copy built in a worker thread, which then
+replaces the automaton in use, so extraction never waits for a rebuild.
+"""
+import logging
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from skills import SKILL_ALIASES, normalize_skill
+
+logger = logging.getLogger(__name__)
+
+SKILL_AUTOMATON_PATH = os.getenv("SKILL_AUTOMATON_PATH", "")
+# New skills from the job cache are folded in at most this often.
+SKILL_AUTOMATON_REBUILD_SECONDS = float(os.getenv("SKILL_AUTOMATON_REBUILD_SECONDS", "60"))
+# New skill names waiting for a rebuild, kept at most; others are dropped until their job is cached again.
+_MAX_PENDING_SKILLS = 10000
+
+SKILL_TAXONOMY = (
+    # Languages
+    "Python", "Java", "JavaScript", "TypeScript", "C", "C++", "C#", "Go", "Rust", "Ruby", "PHP",
+    "Swift", "Kotlin", "Scala", "R", "MATLAB", "Perl", "Dart", "Objective-C", "Bash", "PowerShell",
+    "SQL", "PL/SQL", "HTML", "CSS", "Sass", "GraphQL", "Solidity", "Haskell", "Elixir", "Julia",
+    # Frameworks and libraries
+    "React", "React Native", "Angular", "Vue.js", "Next.js", "Svelte", "Node.js", "Express",
+    "Django", "Flask", "FastAPI", "Spring", "Spring Boot", "Ruby on Rails", "Laravel", ".NET",
+    "ASP.NET", "jQuery", "Redux", "Tailwind CSS", "Bootstrap", "Flutter", "Pandas", "NumPy",
+    "SciPy", "scikit-learn", "TensorFlow", "PyTorch", "Keras", "Hugging Face", "LangChain",
+    "OpenCV", "Matplotlib", "Seaborn", "Plotly", "Spark", "PySpark", "Hadoop", "Kafka", "Airflow",
+    "dbt", "Selenium", "Cypress", "Jest", "JUnit", "pytest",
+    # Data and cloud
+    "PostgreSQL", "MySQL", "SQLite", "MongoDB", "Redis", "Cassandra", "DynamoDB", "Elasticsearch",
+    "Oracle", "SQL Server", "Snowflake", "BigQuery", "Redshift", "Databricks", "Firebase",
+    "Firestore", "AWS", "Azure", "Google Cloud Platform", "Docker", "Kubernetes", "Terraform",
+    "Ansible", "Jenkins", "GitHub Actions", "GitLab CI", "CI/CD", "Linux", "Unix", "Nginx",
+    "Git", "GitHub", "GitLab", "Jira", "Confluence", "Figma", "Sketch", "Adobe XD", "Photoshop",
+    "Illustrator", "Excel", "PowerBI", "Tableau", "Looker", "Salesforce", "SAP", "Postman",
+    # Practices and domains
+    "Machine Learning", "Deep Learning", "Artificial Intelligence", "Natural Language Processing",
+    "Computer Vision", "Data Analysis", "Data Visualization", "Data Engineering", "Data Modeling",
+    "ETL", "Statistics", "A/B Testing", "Microservices", "REST APIs", "Object-Oriented Programming",
+    "Agile", "Scrum", "Kanban", "DevOps", "Unit Testing", "Test Automation", "System Design",
+    "Distributed Systems", "Cloud Computing", "Cybersecurity", "Networking", "TCP/IP", "UI/UX",
+    "User Research", "Wireframing", "Prototyping", "SEO", "Digital Marketing", "Project Management",
+    "Product Management", "Technical Writing", "Blockchain", "Embedded Systems", "LLMs",
+    # Soft skills
+    "Communication", "Teamwork", "Leadership", "Problem-Solving", "Critical Thinking",
+    "Time Management", "Collaboration", "Adaptability", "Mentoring", "Stakeholder Management",
+    "Public Speaking", "Negotiation", "Attention to Detail", "Creativity",
+)
+
+# Short or common-word names that only count when written exactly like this.
+CASE_SENSITIVE = {"C", "R", "Go", "Swift", "Rust", "Spring", "Express", "Excel", "Oracle", "Sketch", "Dart", "Julia"}
+
+
+def _normalize_char(ch: str) -> str:
+    if ch.isalnum():
+        lowered = ch.lower()
+        return lowered if len(lowered) == 1 else ch
+    if ch in "+#./":
+        return ch
+    return " "
+
+
+def _normalize_pattern(pattern: str) -> str:
+    return " ".join("".join(_normalize_char(ch) for ch in pattern.replace("-", " ")).split())
+
+
+class SkillAutomaton:
+    def __init__(self):
+        self._goto = [{}]      # state -> {char: state}
+        self._fail = [0]
+        self._own = [[]]       # state -> ids of patterns ending exactly here
+        self._output = [[]]    # state -> ids of patterns ending here, including via failure links
+        self._patterns = []    # pattern id -> (length, canonical key, required original text or None)
+        self._display = {}     # canonical key -> display name
+        self._known = set()
+
+    def add(self, name: str, key: str | None = None):
+        """Adds a pattern; call build() afterwards to (re)compute the failure links."""
+        pattern = _normalize_pattern(name)
+        key = key or normalize_skill(name)
+        if not pattern or not key or (pattern, key) in self._known:
+            return
+        self._known.add((pattern, key))
+        self._display.setdefault(key, name.strip())
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+            state = nxt
+        self._patterns.append((len(pattern), key, name.strip() if name.strip() in CASE_SENSITIVE else None))
+        self._own[state].append(len(self._patterns) - 1)
+
+    def knows(self, name: str) -> bool:
+        return (_normalize_pattern(name), normalize_skill(name)) in self._known
+
+    def copy(self) -> "SkillAutomaton":
+        """An independent copy, to extend and rebuild while this one keeps serving."""
+        automaton = SkillAutomaton()
+        automaton._goto = [dict(edges) for edges in self._goto]
+        automaton._fail = list(self._fail)
+        automaton._own = [list(ids) for ids in self._own]
+        automaton._output = self._output   # build() replaces it rather than changing it
+        automaton._patterns = list(self._patterns)
+        automaton._display = dict(self._display)
+        automaton._known = set(self._known)
+        return automaton
+
+    def build(self):
+        """Computes failure links breadth-first and merges outputs along them."""
+        output = [list(out) for out in self._own]
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                output[child] += [p for p in output[self._fail[child]] if p not in output[child]]
+        self._output = output
+
+    def extract(self, text: str) -> list[str]:
+        """Returns the display names of skills found in text, in order of first appearance."""
+        # Whitespace runs collapse to one space; positions[i] maps stream index i back to text.
+        stream, positions = [], []
+        for index, ch in enumerate(text):
+            ch = _normalize_char(ch)
+            if ch == " " and (not stream or stream[-1] == " "):
+                continue
+            stream.append(ch)
+            positions.append(index)
+
+        matches = []
+        state = 0
+        for end, ch in enumerate(stream):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern_id in self._output[state]:
+                length, key, exact = self._patterns[pattern_id]
+                start = end - length + 1
+                if not self._is_boundary(stream, start - 1, before=True) or not self._is_boundary(stream, end + 1, before=False):
+                    continue
+                if exact is not None and text[positions[start]:positions[end] + 1] != exact:
+                    continue
+                matches.append((start, -length, key))
+
+        # Leftmost-longest: drop matches that overlap an earlier or longer one.
+        found, last_end = {}, -1
+        for start, negative_length, key in sorted(matches):
+            if start <= last_end:
+                continue
+            last_end = start - negative_length - 1
+            found.setdefault(key, self._display[key])
+        return list(found.values())
+
+    @staticmethod
+    def _is_boundary(stream: list, index: int, before: bool) -> bool:
+        if index < 0 or index >= len(stream):
+            return True
+        ch = stream[index]
+        if ch == " " or ch == "/":
+            return True
+        # A trailing "." ends a sentence unless it starts another token (".NET", "Node.js").
+        return not before and ch == "." and (index + 1 == len(stream) or stream[index + 1] == " ")
+
+    def to_dict(self) -> dict:
+        return {
+            "goto": self._goto,
+            "fail": self._fail,
+            "own": self._own,
+            "output": self._output,
+            "patterns": self._patterns,
+            "display": self._display,
+            "known": sorted(self._known),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SkillAutomaton":
+        automaton = cls()
+        # JSON object keys are strings already, which is what the goto tables use.
+        automaton._goto = data["goto"]
+        automaton._fail = data["fail"]
+        automaton._own = data["own"]
+        automaton._output = data["output"]
+        automaton._patterns = [tuple(p) for p in data["patterns"]]
+        automaton._display = data["display"]
+        automaton._known = {tuple(k) for k in data["known"]}
+        return automaton
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "SkillAutomaton":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_default_automaton(extra_skills=()) -> SkillAutomaton:
+    """Builds an automaton from the taxonomy, the alias table and any extra skill names."""
+    automaton = SkillAutomaton()
+    for name in SKILL_TAXONOMY:
+        automaton.add(name)
+    for alias, key in SKILL_ALIASES.items():
+        automaton.add(alias, key=key)
+    for name in extra_skills:
+        automaton.add(name)
+    automaton.build()
+    return automaton
+
+
+_automaton = None
+_pending_skills = set()
+_last_build = float("-inf")
+_rebuild_task = None
+
+def _is_skill_name(name: str) -> bool:
+    # Long requirement phrases are descriptions, not skill names.
+    return bool(name) and len(name.split()) <= 4 and not any(sep in name for sep in "(),;")
+
+def add_skills(names):
+    """Queues skill names seen in the job cache; they are folded in on a later rebuild."""
+    for name in names:
+        if not _is_skill_name(name) or name in _pending_skills or (_automaton is not None and _automaton.knows(name)):
+            continue
+        if len(_pending_skills) >= _MAX_PENDING_SKILLS:
+            return
+        _pending_skills.add(name)
+
+def _extended(automaton: SkillAutomaton, names: list[str]) -> SkillAutomaton:
+    """A copy of automaton with names added. Only reads automaton, so it can run in a worker thread."""
+    extended = automaton.copy()
+    for name in names:
+        extended.add(name)
+    extended.build()
+    return extended
+
+async def _rebuild(names: list[str]):
+    global _automaton, _rebuild_task
+    try:
+        _automaton = await asyncio.to_thread(_extended, _automaton, names)
+    except Exception as e:
+        logger.error("Error rebuilding the skill automaton: %s", e)
+    finally:
+        _rebuild_task = None
+
+def get_automaton() -> SkillAutomaton:
+    """Returns the shared automaton, loading or building it on first use."""
+    global _automaton, _last_build, _rebuild_task
+    if _automaton is None:
+        if SKILL_AUTOMATON_PATH and os.path.exists(SKILL_AUTOMATON_PATH):
+            try:
+                _automaton = SkillAutomaton.load(SKILL_AUTOMATON_PATH)
+                logger.info("Skill automaton loaded from %s.", SKILL_AUTOMATON_PATH)
+            except Exception as e:
+                logger.error("Error loading skill automaton from %s: %s", SKILL_AUTOMATON_PATH, e)
+        if _automaton is None:
+            _automaton = build_default_automaton(_pending_skills)
+            _pending_skills.clear()
+            _last_build = time.monotonic()
+
+    if _pending_skills and _rebuild_task is None and time.monotonic() - _last_build >= SKILL_AUTOMATON_REBUILD_SECONDS:
+        names = list(_pending_skills)
+        _pending_skills.clear()
+        _last_build = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to keep responsive.
+            _automaton = _extended(_automaton, names)
+        else:
+            _rebuild_task = loop.create_task(_rebuild(names))
+    return _automaton
+
+def extract_skills(text: str) -> list[str]:
+    """Extracts skill names from text in one pass, without calling the LLM."""
+    if not text or text.isspace():
+        return []
+    return get_automaton().extract(text)
+
+
+if __name__ == "__main__":
+    # Prebuilds the automaton, including every skill in job_skills_cache, for SKILL_AUTOMATON_PATH.
+    import sys
+    from database import list_cached_job_skills
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python skill_extractor.py OUTPUT_PATH")
+    cached_skills = set()
+    for _, _, skills_data, _ in asyncio.run(list_cached_job_skills()):
+        for category in ("technical_skills", "tool_skills", "soft_skills"):
+            cached_skills.update(name for name in skills_data.get(category) or [] if _is_skill_name(name))
+    build_default_automaton(cached_skills).save(sys.argv[1])
+    print(f"Skill automaton with {len(cached_skills)} cached skills written to {sys.argv[1]}.")
@@ -0,0 +1,150 @@
+"""
+Skill-name normalization and a deterministic skill-gap calculation.
+
+normalize_skill() maps spelling variants and aliases ("JS", "k8s",
+"React.js") to one canonical key. compute_skill_gap() uses those keys to split
+a user's skills into matching and missing against a job's cached
+requirements, with no LLM call.
+"""
+import re
+from functools import lru_cache
+
+# alias -> canonical key. Keys and values are already in normalized form.
+SKILL_ALIASES = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "python3": "python",
+    "golang": "go",
+    "k8s": "kubernetes",
+    "kube": "kubernetes",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "reactjs": "react",
+    "react js": "react",
+    "react.js": "react",
+    "vue": "vue.js",
+    "vuejs": "vue.js",
+    "angularjs": "angular",
+    "angular.js": "angular",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "node js": "node.js",
+    "nextjs": "next.js",
+    "expressjs": "express",
+    "express.js": "express",
+    "cpp": "c++",
+    "c plus plus": "c++",
+    "csharp": "c#",
+    "c sharp": "c#",
+    "dotnet": ".net",
+    "amazon web services": "aws",
+    "gcp": "google cloud platform",
+    "google cloud": "google cloud platform",
+    "ms azure": "azure",
+    "microsoft azure": "azure",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "ai": "artificial intelligence",
+    "nlp": "natural language processing",
+    "tf": "tensorflow",
+    "sklearn": "scikit-learn",
+    "scikit learn": "scikit-learn",
+    "scikitlearn": "scikit-learn",
+    "ms excel": "excel",
+    "microsoft excel": "excel",
+    "power bi": "powerbi",
+    "ms power bi": "powerbi",
+    "ci cd": "ci/cd",
+    "cicd": "ci/cd",
+    "continuous integration": "ci/cd",
+    "rest": "rest apis",
+    "rest api": "rest apis",
+    "restful apis": "rest apis",
+    "restful api": "rest apis",
+    "gh actions": "github actions",
+    "oop": "object-oriented programming",
+    "object oriented programming": "object-oriented programming",
+    "team work": "teamwork",
+    "team player": "teamwork",
+    "communication skills": "communication",
+    "verbal communication": "communication",
+    "written communication": "communication",
+    "problem solving": "problem-solving",
+    "problem solving skills": "problem-solving",
+    "critical-thinking": "critical thinking",
+    "time-management": "time management",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\s\-•*:;,]+|[\s\-:;,.]+$")
+_VERSION_SUFFIX = re.compile(r"\s+v?\d+(\.\d+)*$")
+_FILLER_SUFFIX = re.compile(r"\s+(skills|basics|fundamentals)$")
+# Dropped only when what is left is a known skill: "CI/CD pipelines" is CI/CD, "Data pipelines" is not "data".
+_KNOWN_SKILL_SUFFIX = re.compile(r"\s+(pipelines?|frameworks?)$")
+_KNOWN_SKILLS = frozenset(SKILL_ALIASES) | frozenset(SKILL_ALIASES.values())
+_ALTERNATIVE_SEPARATORS = re.compile(r"\s*(?:/|,|\bor\b|\(|\))\s*")
+# Names that contain a separator but are a single skill.
+_UNSPLITTABLE = ("ci/cd", "tcp/ip", "a/b testing", "ui/ux", "pl/sql")
+
+
+@lru_cache(maxsize=65536)
+def normalize_skill(skill: str) -> str:
+    """Returns the canonical key for a skill name ('' for blanks)."""
+    key = _WHITESPACE.sub(" ", skill.lower())
+    key = _EDGE_PUNCTUATION.sub("", key)
+    key = key.replace("-", " ") if key not in SKILL_ALIASES else key
+    key = _VERSION_SUFFIX.sub("", key)
+    key = _FILLER_SUFFIX.sub("", SKILL_ALIASES.get(key, key))
+    stem = _KNOWN_SKILL_SUFFIX.sub("", key)
+    if stem in _KNOWN_SKILLS:
+        key = stem
+    return SKILL_ALIASES.get(key, key)
+
+
+@lru_cache(maxsize=65536)
+def requirement_keys(requirement: str) -> frozenset:
+    """
+    Canonical keys that satisfy one requirement. A requirement such as
+    'Cloud platforms (AWS, GCP)' or 'Python/R' is met by any of its parts.
+    """
+    keys = {normalize_skill(requirement)}
+    text = requirement.lower()
+    for name in _UNSPLITTABLE:
+        text = text.replace(name, name.replace("/", "\0"))
+    for part in _ALTERNATIVE_SEPARATORS.split(text):
+        keys.add(normalize_skill(part.replace("\0", "/")))
+    keys.discard("")
+    return frozenset(keys)
+
+
+def compute_skill_gap(user_skills: list[str], requirements: dict) -> dict:
+    """
+    Splits a user's skills into matching and missing against the technical,
+    tool and soft skills cached for a job. Matching skills keep the user's own
+    spelling; missing skills keep the requirement's.
+    """
+    user_keys = {}
+    for skill in user_skills:
+        key = normalize_skill(skill)
+        if key and key not in user_keys:
+            user_keys[key] = skill.strip()
+
+    matched, missing = set(), []
+    seen_requirements = set()
+    for category in ("technical_skills", "tool_skills", "soft_skills"):
+        for requirement in requirements.get(category) or []:
+            alternatives = requirement_keys(requirement)
+            if not alternatives or alternatives in seen_requirements:
+                continue
+            seen_requirements.add(alternatives)
+            satisfied = alternatives & user_keys.keys()
+            if satisfied:
+                matched.update(satisfied)
+            else:
+                missing.append(requirement.strip())
+
+    matching = [skill for key, skill in user_keys.items() if key in matched]
+    return {"matching_skills": matching, "missing_skills": missing}
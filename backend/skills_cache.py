@@ -0,0 +1,161 @@
+"""
+Two-tier cache for job skill requirements.
+
+Tier 1 is an in-process LRU/TTL cache; tier 2 is the Firestore
+job_skills_cache collection. Tier-1 entries never outlive the freshness of the
+Firestore document they came from, so the 30-day staleness check runs once
+per fetch rather than on every request. Both tiers are keyed by the document
+id title_index resolves a title to, so spelling variants share entries.
+Lookups and entry ages are reported to the prewarm scheduler (prewarm.py).
+"""
+import logging
+import os
+import asyncio
+from datetime import datetime, timezone
+from cache import TTLCache, MISSING, NEGATIVE
+from database import get_cached_job_skills_entry, get_cached_job_skills_entries, cache_job_skills, list_cached_job_skills, JOB_SKILLS_MAX_AGE
+from title_index import title_index
+from job_matrix import job_matrix
+import skill_extractor
+from telemetry import span
+from prewarm import prewarmer
+from admission import background_priority
+
+logger = logging.getLogger(__name__)
+
+SKILLS_CACHE_MAX_ENTRIES = int(os.getenv("SKILLS_CACHE_MAX_ENTRIES", "2048"))
+SKILLS_CACHE_TTL_SECONDS = float(os.getenv("SKILLS_CACHE_TTL_SECONDS", "3600"))
+SKILLS_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("SKILLS_CACHE_NEGATIVE_TTL_SECONDS", "60"))
+# Serve expired Firestore entries immediately and refresh them in the background.
+SKILLS_CACHE_STALE_WHILE_REVALIDATE = os.getenv("SKILLS_CACHE_STALE_WHILE_REVALIDATE", "false").lower() == "true"
+
+_memory = TTLCache(maxsize=SKILLS_CACHE_MAX_ENTRIES, ttl=SKILLS_CACHE_TTL_SECONDS)
+_revalidating = set()
+_background_tasks = set()
+_counters = {"firestore_hits": 0, "firestore_misses": 0, "stale_served": 0, "revalidations": 0}
+
+# Returned by get_job_skills for titles whose last fetch failed recently.
+# A distinct object rather than an empty payload: compare with `is`.
+FAILED = object()
+
+def _index_job(doc_id: str, job_title: str, skills_data: dict):
+    title_index.add(job_title, doc_id)
+    job_matrix.add_job(doc_id, job_title, skills_data)
+    for category in ("technical_skills", "tool_skills", "soft_skills"):
+        skill_extractor.add_skills(skills_data.get(category) or [])
+
+async def load_cached_jobs():
+    """Seeds the title index, skill x job matrix and skill extractor from the Firestore cache."""
+    for doc_id, job_title, skills_data, cached_at in await list_cached_job_skills():
+        _index_job(doc_id, job_title, skills_data)
+        if cached_at is not None:
+            prewarmer.record_cached(doc_id, cached_at, JOB_SKILLS_MAX_AGE)
+    logger.info("Loaded %s cached titles and %s jobs into the local indexes.", len(title_index), len(job_matrix))
+
+def _revalidate_in_background(key: str, job_title: str, revalidate):
+    if key in _revalidating:
+        return
+    _revalidating.add(key)
+    _counters["revalidations"] += 1
+
+    async def run():
+        try:
+            with background_priority():
+                await revalidate(job_title)
+        except Exception as e:
+            logger.error("Error revalidating cached skills for %s: %s", job_title, e)
+        finally:
+            _revalidating.discard(key)
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def get_job_skills(job_title: str, revalidate=None, allow_stale: bool = False, record: bool = True) -> dict | None:
+    """
+    Looks a job title up in memory, then in Firestore.
+    Returns the skills data, FAILED for a title that just failed, or None on a miss.
+    With stale-while-revalidate on, an expired Firestore entry is returned as-is
+    and revalidate(job_title) is scheduled to refresh it. allow_stale returns
+    expired entries without refreshing them, for when the LLM is unavailable.
+    Pass record=False for lookups that are not user demand.
+    """
+    with span("cache"):
+        key = title_index.resolve(job_title, record=record)
+        if record:
+            prewarmer.record_demand(key, job_title)
+        value = _memory.get(key)
+        if value is NEGATIVE:
+            return FAILED
+        if value is not MISSING:
+            return value
+
+        entry = await get_cached_job_skills_entry(job_title, doc_id=key)
+        return _accept_entry(key, job_title, entry, revalidate, allow_stale)
+
+async def get_many_job_skills(job_titles: list[str], revalidate=None, allow_stale: bool = False) -> dict:
+    """
+    Like get_job_skills for several titles, with every memory miss fetched in
+    one Firestore round trip. Returns {job_title: skills data, FAILED or None}.
+    """
+    results, pending = {}, {}
+    with span("cache"):
+        for job_title in job_titles:
+            key = title_index.resolve(job_title)
+            prewarmer.record_demand(key, job_title)
+            value = _memory.get(key)
+            if value is NEGATIVE:
+                results[job_title] = FAILED
+            elif value is not MISSING:
+                results[job_title] = value
+            else:
+                pending.setdefault(key, []).append(job_title)
+
+        entries = await get_cached_job_skills_entries(list(pending)) if pending else {}
+        for key, titles in pending.items():
+            value = _accept_entry(key, titles[0], entries.get(key), revalidate, allow_stale)
+            for job_title in titles:
+                results[job_title] = value
+    return results
+
+def _accept_entry(key: str, job_title: str, entry: dict | None, revalidate, allow_stale: bool = False) -> dict | None:
+    """Applies the freshness rules to a Firestore entry and fills tier 1 with fresh ones."""
+    if entry is None or not entry['skills_data']:
+        _counters["firestore_misses"] += 1
+        return None
+
+    prewarmer.record_cached(key, entry['cached_at'], JOB_SKILLS_MAX_AGE)
+    remaining = JOB_SKILLS_MAX_AGE - (datetime.now(timezone.utc) - entry['cached_at'])
+    if remaining.total_seconds() <= 0:
+        if SKILLS_CACHE_STALE_WHILE_REVALIDATE and revalidate is not None:
+            _counters["stale_served"] += 1
+            _revalidate_in_background(key, job_title, revalidate)
+            return entry['skills_data']
+        if allow_stale:
+            _counters["stale_served"] += 1
+            return entry['skills_data']
+        _counters["firestore_misses"] += 1
+        return None
+
+    _counters["firestore_hits"] += 1
+    _memory.set(key, entry['skills_data'], ttl=min(SKILLS_CACHE_TTL_SECONDS, remaining.total_seconds()))
+    return entry['skills_data']
+
+async def store_job_skills(job_title: str, skills_data: dict):
+    """Writes skills data through both tiers and updates the local indexes."""
+    key = title_index.resolve(job_title, record=False)
+    _memory.set(key, skills_data)
+    await cache_job_skills(job_title, skills_data, doc_id=key)
+    _index_job(key, job_title, skills_data)
+    prewarmer.record_cached(key, datetime.now(timezone.utc), JOB_SKILLS_MAX_AGE)
+
+def prefill(job_titles: list[str]):
+    """Asks the prewarm scheduler to fetch any of these titles that are not cached yet."""
+    prewarmer.prefill([(title_index.resolve(job_title, record=False), job_title) for job_title in job_titles])
+
+def mark_failed(job_title: str):
+    """Records a negative entry so the title is not retried for a short while."""
+    _memory.set_negative(title_index.resolve(job_title, record=False), SKILLS_CACHE_NEGATIVE_TTL_SECONDS)
+
+def stats() -> dict:
+    return {"memory": _memory.stats(), **_counters, "title_index": title_index.stats()}
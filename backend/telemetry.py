@@ -0,0 +1,299 @@
+"""
+Request timing, metrics and logging.
+
+span(name) times a block of work: auth, parse, cache, llm, firestore. Inside a
+request, TimingMiddleware collects the spans into a context-local table and
+sends it back in a Server-Timing header. Every span, and every request by
+route and status, also goes into Prometheus-style histograms. render_metrics()
+returns them, along with the LLM token counters and the stats() of any
+registered component, in the text exposition format for /metrics.
+
+startup_step(name) times one step of process startup (module imports, client
+initialization). The durations are logged as they finish and exported on
+/metrics as careercraft_startup_<step>_seconds, so cold-start regressions show
+up next to the request latencies.
+
+configure_logging() sends every log record through a QueueHandler: the calling
+coroutine only enqueues it, and a QueueListener thread formats and writes it.
+Records are JSON lines (LOG_FORMAT=json, the default) or plain text, and carry
+the id of the request they were logged in.
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import logging.handlers
+import contextlib
+from contextvars import ContextVar
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+METRICS_PREFIX = "careercraft"
+
+_DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Span name -> [total seconds, count] for the current request; None outside requests.
+_timings: ContextVar[dict | None] = ContextVar("timings", default=None)
+_request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+# --- Metrics ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = _DEFAULT_BUCKETS):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = f"{METRICS_PREFIX}_{name}_total"
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, amount: float, *labels):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in sorted(self._values.items())]
+        return lines
+
+
+REQUEST_SECONDS = Histogram("request_duration_seconds", "HTTP request latency until the response started.", ("method", "route", "status"))
+SPAN_SECONDS = Histogram("span_duration_seconds", "Time spent in instrumented work (auth, parse, cache, llm, firestore).", ("span",))
+LLM_TOKENS = Counter("llm_tokens", "Tokens sent to and received from the language model.", ("direction",))
+RATE_LIMITED = Counter("rate_limited_requests", "Requests refused by the per-user rate limit.", ("endpoint",))
+_metrics = [REQUEST_SECONDS, SPAN_SECONDS, LLM_TOKENS, RATE_LIMITED]
+_collectors = {}  # name -> stats() function
+
+
+def register_collector(name: str, stats):
+    """Exports the numbers in stats(), a possibly nested dict, as gauges named after `name`."""
+    _collectors[name] = stats
+
+
+def _gauges(prefix: str, stats: dict) -> list[str]:
+    lines = []
+    for key, value in stats.items():
+        # Stats keys may be anything ("0.5-0.6", "get-skills-for-job/batch"); metric names may not.
+        name = re.sub(r"[^a-zA-Z0-9_:]", "_", f"{prefix}_{key}")
+        if isinstance(value, dict):
+            lines += _gauges(name, value)
+        elif isinstance(value, bool):
+            lines.append(f"{name} {int(value)}")
+        elif isinstance(value, (int, float)):
+            lines.append(f"{name} {value}")
+        elif isinstance(value, str):
+            lines.append(f'{name}{{value="{_escape(value)}"}} 1')
+    return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for name, stats in _collectors.items():
+        try:
+            lines += _gauges(f"{METRICS_PREFIX}_{name}", stats())
+        except Exception as e:
+            logging.getLogger(__name__).warning("Metrics collector %s failed: %s", name, e)
+    return "\n".join(lines) + "\n"
+
+
+def record_llm_tokens(prompt_tokens: int | None, response_tokens: int | None):
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, "prompt")
+    if response_tokens:
+        LLM_TOKENS.inc(response_tokens, "response")
+
+
+def record_rate_limited(endpoint: str):
+    RATE_LIMITED.inc(1, endpoint)
+
+# --- Spans ---
+
+@contextlib.contextmanager
+def span(name: str):
+    """Times the enclosed block under `name`, for the request's Server-Timing and the span histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, name)
+        timings = _timings.get()
+        if timings is not None:
+            entry = timings.setdefault(name, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+def server_timing(timings: dict, total: float) -> str:
+    """Formats span timings as a Server-Timing header value (durations in ms)."""
+    parts = []
+    for name, (seconds, count) in timings.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware that opens a span table and request id for each HTTP
+    request, adds Server-Timing to the response and records its latency.
+    Spans that finish after the response has started (streamed bodies) only
+    reach the histograms.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        started = time.perf_counter()
+        timings_token = _timings.set(timings)
+        request_id = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex[:16]
+        request_id_token = _request_id.set(request_id)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                route = scope.get("route")
+                REQUEST_SECONDS.observe(elapsed, scope["method"], route.path if route else "unmatched", str(message["status"]))
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(timings_token)
+            _request_id.reset(request_id_token)
+
+# --- Startup ---
+
+_startup = {}  # step -> seconds
+
+
+def record_startup(name: str, seconds: float):
+    _startup[name] = seconds
+    logging.getLogger(__name__).info("Startup step %s took %.1f ms", name, seconds * 1000)
+
+
+@contextlib.contextmanager
+def startup_step(name: str):
+    """Times one step of process startup for the log and startup_stats()."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup(name, time.perf_counter() - started)
+
+
+def startup_stats() -> dict:
+    return {f"{name}_seconds": round(seconds, 4) for name, seconds in _startup.items()}
+
+# --- Logging ---
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_listener = None
+
+
+def configure_logging():
+    """Routes the root logger through a queue to a background writer thread. Safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # The request id lives in a context variable, so it is read here, on the logging coroutine.
+    queue_handler.addFilter(_RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def stop_logging():
+    """Writes out everything still queued and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
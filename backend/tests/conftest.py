@@ -0,0 +1,53 @@
+"""
+Points the app at its offline backends before anything from it is imported:
+the fake LLM (fake_llm.py, answering in 5 ms) and the in-memory Firestore
+(memory_firestore.py).
+Run from backend/: python -m pytest -q
+"""
+import os
+import sys
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+os.environ.setdefault("FIREBASE_PROJECT_ID", "test-project")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("FAKE_LLM_LATENCY_MS", "5")
+os.environ.setdefault("FAKE_LLM_LATENCY_SIGMA", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory Firestore, write queue and database caches for each test."""
+    import database
+    from write_behind import WriteBehindQueue
+    monkeypatch.setattr(database, "_memory_db", None)
+    monkeypatch.setattr(database, "write_queue", WriteBehindQueue(
+        database.get_db, database._increment, database._forget_dropped_write, database._transactional
+    ))
+    database._paths_cache.clear()
+    database._last_saved_skills.clear()
+    yield database.get_db()
+    database._paths_cache.clear()
+    database._last_saved_skills.clear()
+
+
+@pytest.fixture
+async def api(db):
+    """An HTTP client for the app, signed in as test-user, without the startup warm-up."""
+    import httpx
+    import main
+    from auth_utils import get_current_user
+    main.app.dependency_overrides[get_current_user] = lambda: {"uid": "test-user"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
+    main.app.dependency_overrides.clear()
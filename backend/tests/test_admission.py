@@ -0,0 +1,74 @@
+import pytest
+
+import main
+from admission import MemoryRateLimitBackend, QueueFullError, RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_bucket_allows_a_burst_then_refills_at_the_rate():
+    clock = Clock()
+    bucket = MemoryRateLimitBackend(clock=clock)
+    rate, burst = 0.5, 3   # 30 per minute
+
+    assert [await bucket.take("u1", rate, burst) for _ in range(3)] == [0, 0, 0]
+    assert await bucket.take("u1", rate, burst) == pytest.approx(2.0)
+    assert await bucket.take("u2", rate, burst) == 0
+
+    clock.now += 1.0
+    assert await bucket.take("u1", rate, burst) == pytest.approx(1.0)
+    clock.now += 1.0
+    assert await bucket.take("u1", rate, burst) == 0
+    assert await bucket.take("u1", rate, burst) == pytest.approx(2.0)
+
+    clock.now += 3600
+    assert [await bucket.take("u1", rate, burst) for _ in range(4)][-1] == pytest.approx(2.0)
+
+
+async def test_bucket_forgets_the_least_recently_used_keys():
+    bucket = MemoryRateLimitBackend(max_buckets=2, clock=Clock())
+    for key in ("a", "b", "a", "c"):
+        await bucket.take(key, 1.0, 1)
+    assert len(bucket) == 2
+    assert await bucket.take("a", 1.0, 1) > 0
+    assert await bucket.take("b", 1.0, 1) == 0
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(MemoryRateLimitBackend(), enabled=True)
+    limiter._limits = {"generate-path": (6, 2)}
+    monkeypatch.setattr(main, "rate_limiter", limiter)
+    return limiter
+
+
+async def test_requests_over_the_limit_get_429_with_retry_after(api, limiter):
+    body = {"current_skills": ["Python"], "target_job": "Data Engineer"}
+    statuses = [(await api.post("/api/generate-path", json=body)).status_code for _ in range(2)]
+    assert statuses == [200, 200]
+
+    response = await api.post("/api/generate-path", json=body)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "10"
+    assert limiter.stats()["limited"] == 1
+    # Other endpoints have their own buckets.
+    assert (await api.post("/api/get-skills-for-job/batch", json={"job_titles": ["Data Engineer"]})).status_code == 200
+
+
+async def test_full_llm_queue_gets_503_with_retry_after(api, monkeypatch):
+    async def busy(current_skills, target_job):
+        raise QueueFullError("The service is busy right now. Please try again shortly.", 2.5)
+
+    monkeypatch.setattr(main, "generate_career_path", busy)
+    response = await api.post("/api/generate-path", json={"current_skills": ["Python"], "target_job": "Data Engineer"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.json() == {"detail": "The service is busy right now. Please try again shortly."}
@@ -0,0 +1,103 @@
+import json
+import asyncio
+import pytest
+
+import agent
+import skills_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def failing_fetch(monkeypatch):
+    """Makes every Gemini skills call fail after a short delay, counting the calls."""
+    calls = []
+
+    async def fetch(job_title):
+        calls.append(job_title)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("Gemini failed")
+
+    monkeypatch.setattr(agent, "_fetch_job_skills", fetch)
+    return calls
+
+
+async def test_single_lookup_joining_a_batch_flight_gets_empty_skills(failing_fetch):
+    batch = asyncio.ensure_future(agent.get_skills_for_jobs(["Flight Test Engineer A"]))
+    await asyncio.sleep(0.01)
+    single = await agent.get_skills_for_job("flight test engineer a")
+
+    assert single == {"technical_skills": [], "soft_skills": [], "tool_skills": []}
+    assert isinstance((await batch)["Flight Test Engineer A"], RuntimeError)
+    assert len(failing_fetch) == 1
+
+
+async def test_batch_joining_a_single_flight_gets_the_error(failing_fetch):
+    single = asyncio.ensure_future(agent.get_skills_for_job("Flight Test Engineer B"))
+    await asyncio.sleep(0.01)
+    batch = await agent.get_skills_for_jobs(["flight test engineer b"])
+
+    assert isinstance(batch["flight test engineer b"], RuntimeError)
+    assert await single == {"technical_skills": [], "soft_skills": [], "tool_skills": []}
+    assert len(failing_fetch) == 1
+
+
+async def test_recently_failed_title_is_not_mistaken_for_cached_skills():
+    skills_cache.mark_failed("Failed Test Engineer")
+    assert await skills_cache.get_job_skills("Failed Test Engineer") is skills_cache.FAILED
+
+    assert await agent.get_skills_for_job("Failed Test Engineer") == {"technical_skills": [], "soft_skills": [], "tool_skills": []}
+    analysis = await agent.analyze_skills_for_job(["Python"], "Failed Test Engineer")
+    assert analysis["source"] == "llm"
+    batch = await agent.analyze_skills_for_jobs(["Python"], ["Failed Test Engineer"])
+    assert batch["Failed Test Engineer"]["source"] == "llm"
+    # The prewarm scheduler still fetches it.
+    assert await agent.prewarm_job_skills("Failed Test Engineer", refresh=False) is True
+
+
+@pytest.fixture
+def career_path_model(monkeypatch):
+    """Answers career path prompts with the queued response texts, counting the calls."""
+    responses, calls = [], []
+
+    async def generate(prompt, generation_config):
+        calls.append(prompt)
+        return responses.pop(0)
+
+    monkeypatch.setattr(agent.llm, "generate", generate)
+    agent.career_path_cache.clear()
+    yield responses, calls
+    agent.career_path_cache.clear()
+
+
+async def test_malformed_career_path_is_not_cached(career_path_model):
+    responses, calls = career_path_model
+    valid = {"milestones": ["Ship a model"], "next_skills": ["MLOps"], "recommended_actions": ["Deploy something"]}
+    responses.extend([json.dumps({"milestones": "Ship a model", "next_skills": None}), json.dumps(valid)])
+
+    empty = {"milestones": [], "next_skills": [], "recommended_actions": []}
+    assert await agent.generate_career_path(["Python"], "ML Engineer") == empty
+    assert await agent.generate_career_path(["Python"], "ML Engineer") == valid
+    assert await agent.generate_career_path(["python"], "ML Engineer") == valid
+    assert len(calls) == 2
+
+
+async def test_incomplete_streamed_career_path_is_not_cached(career_path_model, monkeypatch):
+    _, calls = career_path_model
+    document = json.dumps({"milestones": ["Ship a model"], "next_skills": ["MLOps"], "recommended_actions": ["Deploy"]})
+    streams = [[document[:40]], [document[:30], document[30:]]]
+
+    async def stream(prompt, generation_config):
+        calls.append(prompt)
+        for chunk in streams.pop(0):
+            yield chunk
+
+    async def events():
+        return [event async for event in agent.stream_career_path(["Python"], "ML Engineer")]
+
+    monkeypatch.setattr(agent.llm, "stream", stream)
+    with pytest.raises(ValueError):
+        await events()
+    assert (await events())[-1] == ("complete", None, json.loads(document))
+    assert ("item", "milestones", "Ship a model") in await events()
+    assert len(calls) == 2
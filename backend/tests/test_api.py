@@ -0,0 +1,73 @@
+import os
+import pytest
+
+import agent
+import main
+import resume_cache
+import resume_parser
+
+pytestmark = pytest.mark.anyio
+
+DOCUMENTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "documents")
+
+
+@pytest.mark.parametrize("url, body", [
+    ("/api/get-skills-for-job/batch", {}),
+    ("/api/analyze/batch", {"skills": ["Python"]}),
+])
+async def test_batch_titles_are_validated_one_by_one(api, url, body):
+    for titles in ([""], ["   "], ["Data Analyst", "x" * 5000]):
+        response = await api.post(url, json={**body, "job_titles": titles})
+        assert response.status_code == 422, titles
+
+    response = await api.post(url, json={**body, "job_titles": ["  Data Analyst "]})
+    assert response.status_code == 200
+    assert [result["job_title"] for result in response.json()["results"]] == ["Data Analyst"]
+
+
+@pytest.fixture
+def suggestion_calls(monkeypatch):
+    """Counts the resume analyses that reach the LLM, on empty resume caches and a fresh parser pool."""
+    calls = []
+
+    async def analyze(resume_text):
+        calls.append(resume_text)
+        return await suggest(resume_text)
+
+    suggest = main.get_suggestions_and_skills_from_resume
+    monkeypatch.setattr(main, "get_suggestions_and_skills_from_resume", analyze)
+    resume_cache._memory.clear()
+    yield calls
+    resume_cache._memory.clear()
+    resume_parser.shutdown_parser_pool()
+
+
+def _resume(name: str) -> bytes:
+    with open(os.path.join(DOCUMENTS, name), "rb") as f:
+        return f.read()
+
+
+async def _suggest(api, content: bytes):
+    response = await api.post("/api/suggest-jobs", files={"resume_file": ("resume.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_same_resume_bytes_are_served_from_the_cache(api, suggestion_calls):
+    resume = _resume("data_scientist.pdf")
+    first = await _suggest(api, resume)
+    llm_calls = agent.llm.stats()["calls"]
+    again = await _suggest(api, resume)
+
+    assert len(suggestion_calls) == 1
+    assert agent.llm.stats()["calls"] == llm_calls
+    assert again["parsed_skills"] == first["parsed_skills"]
+    assert [s["job_title"] for s in again["suggestions"]] == [s["job_title"] for s in first["suggestions"]]
+    assert {s["suggestion_id"] for s in again["suggestions"]}.isdisjoint(s["suggestion_id"] for s in first["suggestions"])
+    assert resume_cache.stats()["hits"] >= 1
+
+
+async def test_different_resume_bytes_miss_the_cache(api, suggestion_calls):
+    await _suggest(api, _resume("data_scientist.pdf"))
+    await _suggest(api, _resume("backend_engineer.pdf"))
+    assert len(suggestion_calls) == 2
@@ -0,0 +1,168 @@
+import time
+import datetime
+import threading
+import httpx
+import jwt
+import pytest
+import firebase_admin
+from firebase_admin import credentials
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth_utils
+
+pytestmark = pytest.mark.anyio
+
+PROJECT_ID = auth_utils.FIREBASE_PROJECT_ID
+
+
+def _key_and_cert():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+_KEYS = {kid: _key_and_cert() for kid in ("k1", "k2")}
+
+
+class KeyEndpoint:
+    """Stands in for Google's certificate endpoint."""
+    def __init__(self):
+        self.kids = ["k1"]
+        self.status = 200
+        self.requests = 0
+
+    def handle(self, request):
+        self.requests += 1
+        if self.status != 200:
+            return httpx.Response(self.status)
+        certs = {kid: _KEYS[kid][1] for kid in self.kids}
+        return httpx.Response(200, json=certs, headers={"Cache-Control": "public, max-age=3600"})
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    endpoint = KeyEndpoint()
+    client = httpx.AsyncClient
+    monkeypatch.setattr(auth_utils.httpx, "AsyncClient",
+                        lambda **kwargs: client(transport=httpx.MockTransport(endpoint.handle), **kwargs))
+    monkeypatch.setattr(auth_utils, "_keys", {})
+    monkeypatch.setattr(auth_utils, "_keys_expire_at", 0.0)
+    monkeypatch.setattr(auth_utils, "_keys_fetched_at", float("-inf"))
+    auth_utils._token_cache.clear()
+    yield endpoint
+    auth_utils.stop_key_refresh()
+
+
+def make_token(kid="k1", uid="user-1", audience=PROJECT_ID, lifetime=3600):
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": audience,
+        "sub": uid,
+        "iat": now - 10,
+        "auth_time": now - 10,
+        "exp": now + lifetime,
+    }
+    return jwt.encode(claims, _KEYS[kid][0], algorithm="RS256", headers={"kid": kid})
+
+
+async def test_valid_token(endpoint):
+    token = make_token()
+    claims = await auth_utils.verify_token(token)
+    assert claims["uid"] == "user-1"
+    hits = auth_utils._token_cache.hits
+    assert await auth_utils.verify_token(token) == claims
+    assert auth_utils._token_cache.hits == hits + 1
+    assert endpoint.requests == 1
+
+
+async def test_expired_token(endpoint):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        await auth_utils.verify_token(make_token(lifetime=-60))
+
+
+async def test_wrong_audience(endpoint):
+    with pytest.raises(jwt.InvalidAudienceError):
+        await auth_utils.verify_token(make_token(audience="another-project"))
+
+
+async def test_unknown_kid_refreshes_the_keys(endpoint):
+    await auth_utils.verify_token(make_token(uid="user-1"))
+    endpoint.kids = ["k1", "k2"]   # rotated after the keys were fetched
+
+    # Refetched for an unknown kid at most once a minute.
+    with pytest.raises(jwt.InvalidTokenError, match="unknown key"):
+        await auth_utils.verify_token(make_token(kid="k2", uid="user-2"))
+    assert endpoint.requests == 1
+
+    auth_utils._keys_fetched_at -= 60
+    claims = await auth_utils.verify_token(make_token(kid="k2", uid="user-3"))
+    assert claims["uid"] == "user-3"
+    assert endpoint.requests == 2
+
+
+async def test_key_endpoint_failure(endpoint):
+    endpoint.status = 503
+    with pytest.raises(HTTPException) as raised:
+        await auth_utils.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=make_token()))
+    assert raised.value.status_code == 401
+    assert endpoint.requests == 1
+
+    # The next request tries again once the endpoint is back.
+    endpoint.status = 200
+    claims = await auth_utils.get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=make_token()))
+    assert claims["uid"] == "user-1"
+
+
+def test_callers_wait_for_firebase_initialization_to_finish(monkeypatch):
+    started, apps_seen = threading.Event(), []
+
+    def initialize_app(cred):
+        started.set()
+        time.sleep(0.1)
+        firebase_admin._apps["[DEFAULT]"] = object()
+
+    monkeypatch.setattr(auth_utils, "_firebase_initialized", False)
+    monkeypatch.setattr(firebase_admin, "_apps", {})
+    monkeypatch.setattr(firebase_admin, "initialize_app", initialize_app)
+    monkeypatch.setattr(credentials, "Certificate", lambda info: object())
+    monkeypatch.setenv("FIREBASE_SERVICE_ACCOUNT_JSON", "{}")
+
+    first = threading.Thread(target=auth_utils.init_firebase)
+    first.start()
+    assert started.wait(5)
+    auth_utils.init_firebase()
+    apps_seen.append(bool(firebase_admin._apps))
+    first.join()
+    assert apps_seen == [True] and auth_utils._firebase_initialized
+
+
+def test_failed_firebase_initialization_is_retried(monkeypatch):
+    attempts = []
+
+    def initialize_app(cred):
+        attempts.append(cred)
+        if len(attempts) == 1:
+            raise ValueError("transient")
+        firebase_admin._apps["[DEFAULT]"] = object()
+
+    monkeypatch.setattr(auth_utils, "_firebase_initialized", False)
+    monkeypatch.setattr(firebase_admin, "_apps", {})
+    monkeypatch.setattr(firebase_admin, "initialize_app", initialize_app)
+    monkeypatch.setattr(credentials, "Certificate", lambda info: object())
+    monkeypatch.setenv("FIREBASE_SERVICE_ACCOUNT_JSON", "{}")
+
+    auth_utils.init_firebase()
+    assert not auth_utils._firebase_initialized
+    auth_utils.init_firebase()
+    auth_utils.init_firebase()
+    assert auth_utils._firebase_initialized and len(attempts) == 2
@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone, timedelta
+
+import database
+import memory_firestore
+
+pytestmark = pytest.mark.anyio
+
+
+async def _document(db, path: str) -> dict | None:
+    return (await db.document(path).get()).to_dict()
+
+
+async def test_saved_paths_are_listed_newest_first(db):
+    for job in ("Data Analyst", "Data Engineer", "ML Engineer"):
+        await database.save_career_path("u1", job, {"milestones": [job]})
+        await asyncio.sleep(0.001)
+    await database.save_career_path("u2", "Designer", {"milestones": []})
+
+    paths, etag = await database.list_saved_paths("u1")
+    assert [path["target_job"] for path in paths] == ["ML Engineer", "Data Engineer", "Data Analyst"]
+    assert etag.startswith('"')
+
+    page, _ = await database.list_saved_paths("u1", limit=2, summary=True)
+    assert [path["target_job"] for path in page] == ["ML Engineer", "Data Engineer"]
+    assert set(page[0]) == {"target_job", "saved_at", "path_id"}
+    rest, _ = await database.list_saved_paths("u1", limit=2, start_after=(page[-1]["saved_at"], page[-1]["path_id"]))
+    assert [path["target_job"] for path in rest] == ["Data Analyst"]
+
+    path = await database.get_saved_path("u1", paths[0]["path_id"])
+    assert path["path_data"] == {"milestones": ["ML Engineer"]}
+    with pytest.raises(Exception, match="permission"):
+        await database.get_saved_path("u2", paths[0]["path_id"])
+
+
+async def test_paging_keeps_paths_saved_at_the_same_instant(db):
+    saved_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(5):
+        await db.collection("saved_paths").document(f"p{i}").set({"userId": "u1", "target_job": f"Job {i}", "saved_at": saved_at})
+    await db.collection("saved_paths").document("newer").set({"userId": "u1", "target_job": "Newer", "saved_at": saved_at + timedelta(seconds=1)})
+
+    seen, start_after = [], None
+    while True:
+        page, _ = await database.list_saved_paths("u1", limit=2, start_after=start_after, summary=True)
+        seen.extend(path["path_id"] for path in page)
+        if len(page) < 2:
+            break
+        start_after = (page[-1]["saved_at"], page[-1]["path_id"])
+    assert seen == ["newer", "p4", "p3", "p2", "p1", "p0"]
+
+
+async def test_saving_and_deleting_invalidate_the_listing(db):
+    await database.save_career_path("u1", "Data Analyst", {})
+    first, etag = await database.list_saved_paths("u1")
+    assert await database.list_saved_paths("u1") == (first, etag)
+
+    await database.save_career_path("u1", "Data Engineer", {})
+    paths, new_etag = await database.list_saved_paths("u1")
+    assert len(paths) == 2 and new_etag != etag
+
+    with pytest.raises(Exception, match="permission"):
+        await database.delete_saved_path("u2", paths[0]["path_id"])
+    await database.delete_saved_path("u1", paths[0]["path_id"])
+    assert [path["target_job"] for path in (await database.list_saved_paths("u1"))[0]] == ["Data Analyst"]
+
+
+async def test_feedback_is_written_behind_the_request(db):
+    await database.save_feedback("s1", "Data Analyst", "u1", "helpful")
+    await database.save_feedback("s1", "Data Analyst", "u1", "not_helpful")
+    assert await _document(db, "feedback/s1") is None
+
+    await database.write_queue.drain()
+    feedback = await _document(db, "feedback/s1")
+    assert feedback["rating"] == "not_helpful" and feedback["user_id"] == "u1"
+    assert database.write_queue.stats()["written"] == 1
+
+
+async def test_feedback_counts_include_pending_increments(db):
+    await database.increment_feedback_counts("data_analyst", "Data Analyst", {"helpful": 1})
+    await database.increment_feedback_counts("data_analyst", "Data Analyst", {"helpful": 1, "not_helpful": 1})
+    expected = {"data_analyst": {"helpful": 2, "not_helpful": 1}, "other": {"helpful": 0, "not_helpful": 0}}
+    assert await database.get_feedback_counts(["data_analyst", "other"]) == expected
+
+    await database.write_queue.drain()
+    assert await database.get_feedback_counts(["data_analyst", "other"]) == expected
+
+
+async def test_unchanged_skills_are_not_rewritten(db):
+    await database.save_user_skills("u1", ["Python", "SQL"])
+    await database.write_queue.drain()
+    assert (await _document(db, "users/u1"))["skills"] == ["Python", "SQL"]
+
+    await database.save_user_skills("u1", ["Python", "SQL"])
+    assert len(database.write_queue) == 0
+    await database.save_user_skills("u1", ["Python"])
+    await database.write_queue.drain()
+    assert (await _document(db, "users/u1"))["skills"] == ["Python"]
+
+
+async def test_dropped_skills_write_does_not_suppress_the_next_save(db, monkeypatch):
+    monkeypatch.setattr("write_behind.WRITE_BEHIND_MAX_RETRIES", 0)
+    monkeypatch.setattr(database.write_queue, "_get_db", lambda: None)
+    await database.save_user_skills("u1", ["Python", "SQL"])
+    await database.write_queue.drain()
+    assert database.write_queue.stats()["dropped"] == 1
+
+    monkeypatch.setattr(database.write_queue, "_get_db", database.get_db)
+    await database.save_user_skills("u1", ["Python", "SQL"])
+    await database.write_queue.drain()
+    assert (await _document(db, "users/u1"))["skills"] == ["Python", "SQL"]
+
+
+async def test_increments_count_while_their_batch_is_being_committed(db, monkeypatch):
+    committing, release = asyncio.Event(), asyncio.Event()
+    commit = memory_firestore.AsyncTransaction.commit
+
+    async def slow_commit(transaction):
+        committing.set()
+        await release.wait()
+        await commit(transaction)
+
+    monkeypatch.setattr(memory_firestore.AsyncTransaction, "commit", slow_commit)
+    await database.increment_feedback_counts("data_analyst", "Data Analyst", {"helpful": 1})
+    flush = asyncio.create_task(database.write_queue.flush())
+    await committing.wait()
+    await database.increment_feedback_counts("data_analyst", "Data Analyst", {"helpful": 1})
+    assert (await database.get_feedback_counts(["data_analyst"]))["data_analyst"]["helpful"] == 2
+
+    release.set()
+    await flush
+    assert (await database.get_feedback_counts(["data_analyst"]))["data_analyst"]["helpful"] == 2
+    await database.write_queue.drain()
+    assert (await database.get_feedback_counts(["data_analyst"]))["data_analyst"]["helpful"] == 2
+
+
+async def test_retry_after_an_ambiguous_commit_does_not_count_twice(db, monkeypatch):
+    commit = memory_firestore.AsyncTransaction.commit
+    failures = []
+
+    async def commit_then_fail(transaction):
+        await commit(transaction)
+        if not failures:
+            failures.append(1)
+            raise TimeoutError("deadline exceeded")
+
+    monkeypatch.setattr(memory_firestore.AsyncTransaction, "commit", commit_then_fail)
+    monkeypatch.setattr("write_behind.random.uniform", lambda low, high: 0)
+    await database.increment_feedback_counts("data_analyst", "Data Analyst", {"helpful": 1})
+    await database.write_queue.drain()
+
+    assert database.write_queue.stats()["retries"] == 1
+    assert (await database.get_feedback_counts(["data_analyst"]))["data_analyst"] == {"helpful": 1, "not_helpful": 0}
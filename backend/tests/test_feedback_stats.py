@@ -0,0 +1,50 @@
+import pytest
+
+import database
+from feedback_stats import FeedbackStats
+from write_behind import WriteBehindQueue
+
+pytestmark = pytest.mark.anyio
+
+
+async def _totals(stats: FeedbackStats, job_title: str) -> tuple[int, int]:
+    counts = await stats.counts(job_title)
+    return counts["helpful"], counts["not_helpful"]
+
+
+async def test_recording_only_queues_the_vote(db):
+    await FeedbackStats().record("u1", "Data Analyst", "helpful")
+    assert len(database.write_queue) == 1
+    assert db._documents == {}
+
+
+async def test_a_user_counts_once_per_title_whatever_the_suggestion_id(db):
+    stats = FeedbackStats()
+    for suggestion_id in ("s1", "s2", "forged-3", "forged-4"):
+        await stats.record("u1", "Data Analyst", "helpful")
+        await database.write_queue.flush()
+    assert await _totals(stats, "data analyst") == (1, 0)
+
+
+async def test_rating_again_moves_the_vote(db):
+    stats = FeedbackStats()
+    await stats.record("u1", "Data Analyst", "helpful")
+    await database.write_queue.flush()
+    await stats.record("u1", "Data Analyst", "not_helpful")
+    await stats.record("u2", "Data Analyst", "helpful")
+    await stats.record("u2", "Data Analyst", "not_helpful")
+    await database.write_queue.flush()
+    assert await _totals(stats, "Data Analyst") == (0, 2)
+
+
+async def test_instances_writing_the_same_vote_count_it_once(db, monkeypatch):
+    instances = [
+        WriteBehindQueue(database.get_db, database._increment, database._forget_dropped_write, database._transactional)
+        for _ in range(2)
+    ]
+    for queue in instances:
+        monkeypatch.setattr(database, "write_queue", queue)
+        await FeedbackStats().record("u1", "Data Analyst", "helpful")
+    for queue in instances:
+        await queue.flush()
+    assert await _totals(FeedbackStats(), "Data Analyst") == (1, 0)
@@ -0,0 +1,39 @@
+from job_matrix import JobSkillMatrix
+
+
+def _matrix():
+    matrix = JobSkillMatrix()
+    matrix.add_job("cloud", "Cloud Engineer", {
+        "technical_skills": ["Cloud platforms (AWS, GCP, Azure)", "Python", "Terraform", "Linux"],
+    })
+    return matrix
+
+
+def test_requirement_with_alternatives_is_credited_once():
+    assert _matrix().rank(["AWS", "GCP", "Azure"]) == [{"job_title": "Cloud Engineer", "match_score": 25}]
+
+
+def test_any_alternative_meets_the_requirement():
+    assert _matrix().rank(["gcp", "Python"]) == [{"job_title": "Cloud Engineer", "match_score": 50}]
+
+
+def test_replaced_job_drops_its_old_requirements():
+    matrix = _matrix()
+    matrix.add_job("cloud", "Cloud Engineer", {"technical_skills": ["Python", "Go"]})
+    assert matrix.rank(["AWS", "Python"]) == [{"job_title": "Cloud Engineer", "match_score": 50}]
+
+
+def test_category_weights():
+    matrix = JobSkillMatrix()
+    matrix.add_job("data", "Data Analyst", {"technical_skills": ["SQL"], "soft_skills": ["Communication"]})
+    assert matrix.rank(["Communication"]) == [{"job_title": "Data Analyst", "match_score": round(0.4 / 1.4 * 100)}]
+
+
+def test_requirement_listed_twice_counts_once():
+    matrix = JobSkillMatrix()
+    matrix.add_job("data", "Data Engineer", {
+        "technical_skills": ["Python", "SQL", "python", "Cloud platforms (AWS, GCP)"],
+        "tool_skills": ["SQL", "Cloud platforms (AWS, GCP)"],
+    })
+    assert matrix.rank(["Python", "SQL", "AWS"]) == [{"job_title": "Data Engineer", "match_score": 100}]
+    assert matrix.rank(["Python"]) == [{"job_title": "Data Engineer", "match_score": 33}]
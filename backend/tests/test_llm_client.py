@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+import llm_client
+from llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+
+pytestmark = pytest.mark.anyio
+
+
+class ScriptedModel:
+    """A model whose calls take the given latencies and return text or raise, in order."""
+    def __init__(self, *steps):
+        self.steps = list(steps)   # (seconds, text or exception)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        seconds, outcome = self.steps.pop(0) if self.steps else (0, "ok")
+        await asyncio.sleep(seconds)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(text=outcome, usage_metadata=None)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm_client, "LLM_HEDGE_ENABLED", False)
+
+
+def _client(model: ScriptedModel) -> LLMClient:
+    return LLMClient(lambda: model)
+
+
+async def test_retryable_error_is_retried_until_success():
+    model = ScriptedModel((0, api_exceptions.ServiceUnavailable("busy")), (0, api_exceptions.ResourceExhausted("quota")), (0, "answer"))
+    client = _client(model)
+    assert await client.generate("prompt", None) == "answer"
+    assert model.calls == 3
+    assert client.stats()["retries"] == 2
+    assert client.breaker.state == "closed"
+
+
+async def test_non_retryable_error_is_raised_at_once():
+    model = ScriptedModel((0, api_exceptions.InvalidArgument("bad prompt")))
+    client = _client(model)
+    with pytest.raises(api_exceptions.InvalidArgument):
+        await client.generate("prompt", None)
+    assert model.calls == 1
+    assert client.stats()["retries"] == 0
+    # The model answered, so the breaker does not count it.
+    assert client.breaker._failures == 0
+
+
+async def test_breaker_opens_probes_once_and_closes(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 0)
+    failure = (0, api_exceptions.ServiceUnavailable("down"))
+    model = ScriptedModel(failure, failure, failure, (0.05, "recovered"))
+    client = _client(model)
+    client.breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.1)
+
+    for _ in range(3):
+        with pytest.raises(api_exceptions.ServiceUnavailable):
+            await client.generate("prompt", None)
+    assert client.breaker.state == "open" and client.circuit_open()
+    with pytest.raises(CircuitOpenError):
+        await client.generate("prompt", None)
+    assert model.calls == 3
+
+    await asyncio.sleep(0.1)
+    probe = asyncio.ensure_future(client.generate("prompt", None))
+    await asyncio.sleep(0.01)
+    assert client.breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        await client.generate("prompt", None)
+    assert await probe == "recovered"
+    assert client.breaker.state == "closed" and not client.circuit_open()
+    assert model.calls == 4
+    assert client.stats()["rejected"] == 2
+
+
+async def test_failed_probe_reopens_the_breaker(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_MAX_RETRIES", 0)
+    model = ScriptedModel(*[(0, api_exceptions.ServiceUnavailable("down"))] * 2)
+    client = _client(model)
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        await client.generate("prompt", None)
+    await asyncio.sleep(0.05)
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        await client.generate("prompt", None)
+    assert client.breaker.state == "open"
+    assert client.breaker.times_opened == 2
+
+
+async def test_hedge_wins_when_the_first_attempt_stalls(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_HEDGE_ENABLED", True)
+    model = ScriptedModel((5, "stalled"), (0.01, "hedged"))
+    client = _client(model)
+    client._latencies.extend([0.02] * llm_client._HEDGE_MIN_SAMPLES)
+
+    started = asyncio.get_running_loop().time()
+    assert await client.generate("prompt", None) == "hedged"
+    assert asyncio.get_running_loop().time() - started < 1
+    assert model.calls == 2
+    assert client.stats()["hedges"] == 1 and client.stats()["hedge_wins"] == 1
+    await asyncio.sleep(0.01)   # the stalled attempt gives its slot back once its cancellation runs
+    assert client.stats()["queue"]["running"] == 0
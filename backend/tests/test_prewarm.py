@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from collections import OrderedDict
+
+import agent
+import prewarm
+import skills_cache
+from admission import PriorityGate, QueueFullError
+from prewarm import Prewarmer, prewarmer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """The app's scheduler, driven one fetch at a time with the real fetch and an idle LLM."""
+    # Titles prefilled or demanded by other tests are not this test's work.
+    monkeypatch.setattr(prewarmer, "_prefill", OrderedDict())
+    monkeypatch.setattr(prewarmer, "_demand", {})
+    monkeypatch.setattr(prewarmer, "_fetch", agent.prewarm_job_skills)
+    monkeypatch.setattr(prewarmer, "_load", lambda: 0.0)
+    return prewarmer
+
+
+async def test_prefilled_title_is_fetched_and_then_served_from_cache(scheduler):
+    calls = agent.llm.stats()["calls"]
+    skills_cache.prefill(["Prewarm Test Analyst"])
+    assert await scheduler.run_once() is True
+    assert scheduler.stats()["prefilled"] >= 1
+
+    skills = await agent.get_skills_for_job("prewarm test analyst")
+    assert skills["technical_skills"]
+    assert agent.llm.stats()["calls"] == calls + 1
+
+
+async def test_busy_llm_defers_prewarming(scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler, "_load", lambda: 1.0)
+    skills_cache.prefill(["Prewarm Test Deferred"])
+    assert await scheduler.run_once() is False
+    assert scheduler.stats()["prefill_queue"] >= 1
+
+
+async def test_interactive_lookup_does_not_join_a_background_fetch(monkeypatch):
+    gate = PriorityGate(slots=1, max_waiting=2)
+    monkeypatch.setattr(agent.llm, "_gate", gate)
+    await gate.acquire()   # the only slot is busy
+
+    background = asyncio.ensure_future(agent.prewarm_job_skills("Prewarm Test Engineer", refresh=False))
+    await asyncio.sleep(0.01)
+    interactive = asyncio.ensure_future(agent.get_skills_for_job("Prewarm Test Engineer"))
+    await asyncio.sleep(0.01)
+    # A third caller finds the queue full and displaces the background fetch.
+    other = asyncio.ensure_future(agent.get_skills_for_job("Prewarm Test Designer"))
+    await asyncio.sleep(0.01)
+    with pytest.raises(QueueFullError):
+        await asyncio.wait_for(background, timeout=5)
+
+    gate.release()
+    assert (await asyncio.wait_for(interactive, timeout=5))["technical_skills"]
+    assert (await asyncio.wait_for(other, timeout=5))["technical_skills"]
+
+
+async def test_failed_titles_are_bounded(monkeypatch):
+    monkeypatch.setattr(prewarm, "PREWARM_MAX_TRACKED", 10)
+
+    async def fail(job_title, refresh):
+        raise RuntimeError("Gemini failed")
+
+    scheduler = Prewarmer()
+    scheduler._fetch, scheduler._load = fail, lambda: 0.0
+    scheduler.prefill([(f"title_{i}", f"Title {i}") for i in range(25)])
+    while await scheduler.run_once():
+        pass
+    assert scheduler.stats()["failed"] == 25
+    assert len(scheduler._failed) == 10
+    assert list(scheduler._failed) == [f"title_{i}" for i in range(15, 25)]
+
+    # Entries past their cooldown go at the next failure.
+    for doc_id in scheduler._failed:
+        scheduler._failed[doc_id] -= prewarm._FAILURE_COOLDOWN_SECONDS
+    scheduler.prefill([("title_new", "Title New")])
+    await scheduler.run_once()
+    assert list(scheduler._failed) == ["title_new"]
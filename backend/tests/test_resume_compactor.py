@@ -0,0 +1,50 @@
+import pytest
+
+from resume_compactor import compact_resume, estimate_tokens
+
+RESUME = "\n".join([
+    "Jane Doe",
+    "jane.doe@example.com | +1 (555) 123-4567 | linkedin.com/in/janedoe",
+    "Summary",
+    "Data engineer who likes tidy pipelines and well-tested code.",
+    "Skills",
+    "• Python, SQL, Spark, Airflow, dbt",
+    "• AWS (S3, Glue, Redshift), Terraform, Docker",
+    "Work Experience",
+    *[f"- 202{i}: Built data pipeline number {i} that moved billing events into the warehouse for finance reporting." for i in range(9, 0, -1)],
+    "Education",
+    "BSc Computer Science, State University, 2016",
+    "Hobbies and Interests",
+    *[f"- Hobby {i}: long-distance cycling, sourdough baking, board games and birdwatching." for i in range(10)],
+    "References",
+    "References available upon request.",
+    "Jim Smith, Manager, jim@example.com",
+])
+
+
+@pytest.mark.parametrize("budget", [60, 120, 250])
+def test_output_fits_the_budget(budget):
+    assert estimate_tokens(compact_resume(RESUME, budget)) <= budget
+
+
+def test_skills_and_experience_are_kept_before_low_priority_text():
+    compact = compact_resume(RESUME, 100)
+    assert "SKILLS:\n- Python, SQL, Spark, Airflow, dbt" in compact
+    assert "EXPERIENCE:\n- 2029: Built data pipeline number 9" in compact
+    assert "Hobby" not in compact
+    assert "Jim Smith" not in compact
+    assert "@" not in compact and "555" not in compact
+    assert compact.index("SKILLS:") < compact.index("EXPERIENCE:")
+
+
+def test_experience_keeps_its_most_recent_lines():
+    compact = compact_resume(RESUME, 250)
+    kept = [line for line in compact.splitlines() if "Built data pipeline" in line]
+    assert 0 < len(kept) < 9
+    assert kept == [f"- 202{i}: Built data pipeline number {i} that moved billing events into the warehouse for finance reporting." for i in range(9, 9 - len(kept), -1)]
+
+
+def test_everything_fits_in_a_large_budget_except_references():
+    compact = compact_resume(RESUME, 5000)
+    assert "Hobby 9" in compact and "State University" in compact
+    assert "Jim Smith" not in compact
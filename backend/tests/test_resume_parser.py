@@ -0,0 +1,36 @@
+import time
+import asyncio
+import pytest
+
+import resume_parser
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def workers():
+    workers = resume_parser._ParserWorkers(2)
+    yield workers
+    workers.shutdown()
+
+
+async def test_timed_out_task_does_not_fail_the_others(workers):
+    await asyncio.gather(workers.run(time.sleep, 0), workers.run(time.sleep, 0))   # start both processes
+    other = asyncio.ensure_future(workers.run(time.sleep, 1.0))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(workers.run(time.sleep, 30), timeout=0.3)
+
+    assert await other is None
+    assert len(workers._executors) == 1
+    # The killed worker is replaced on demand.
+    assert await asyncio.gather(workers.run(len, "abc"), workers.run(len, "de")) == [3, 2]
+    assert len(workers._executors) == 2
+
+
+async def test_task_errors_keep_the_worker(workers):
+    with pytest.raises(ValueError):
+        await workers.run(int, "not a number")
+    executors = set(workers._executors)
+    assert await workers.run(int, "7") == 7
+    assert workers._executors == executors
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import pytest
+
+import skill_extractor
+from skill_extractor import add_skills, build_default_automaton, extract_skills, get_automaton
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    """A freshly built automaton, with no rebuild interval and nothing pending."""
+    monkeypatch.setattr(skill_extractor, "_automaton", build_default_automaton())
+    monkeypatch.setattr(skill_extractor, "_pending_skills", set())
+    monkeypatch.setattr(skill_extractor, "_last_build", float("-inf"))
+    monkeypatch.setattr(skill_extractor, "_rebuild_task", None)
+    monkeypatch.setattr(skill_extractor, "SKILL_AUTOMATON_REBUILD_SECONDS", 0)
+    return skill_extractor
+
+
+def test_pending_skills_are_deduplicated_and_bounded(extractor, monkeypatch):
+    monkeypatch.setattr(extractor, "_MAX_PENDING_SKILLS", 3)
+    add_skills(["Zorblax", "Zorblax", "Python", "a skill described (at length)"])
+    assert extractor._pending_skills == {"Zorblax"}
+
+    add_skills(["Quuxify", "Frobnicate", "Wibbleware", "Blorptastic"])
+    assert extractor._pending_skills == {"Zorblax", "Quuxify", "Frobnicate"}
+
+
+async def test_rebuild_runs_off_the_loop_and_swaps_the_automaton(extractor, monkeypatch):
+    threads = []
+    extended = extractor._extended
+
+    def record_thread(automaton, names):
+        threads.append(threading.get_ident())
+        return extended(automaton, names)
+
+    monkeypatch.setattr(extractor, "_extended", record_thread)
+    serving = get_automaton()
+    add_skills(["Zorblax"])
+
+    assert "Zorblax" not in extract_skills("Five years of Zorblax.")
+    task = extractor._rebuild_task
+    assert task is not None
+    await asyncio.wait_for(task, timeout=5)
+
+    assert threads and threads[0] != threading.get_ident()
+    assert get_automaton() is not serving
+    assert "Zorblax" in extract_skills("Five years of Zorblax.")
+    assert not serving.knows("Zorblax")
+    assert not extractor._pending_skills
@@ -0,0 +1,41 @@
+import pytest
+
+from skills import compute_skill_gap, normalize_skill
+
+
+@pytest.mark.parametrize("skill, key", [
+    ("Communication Skills", "communication"),
+    ("Python basics", "python"),
+    ("SQL Fundamentals", "sql"),
+    ("CI/CD pipelines", "ci/cd"),
+    ("React frameworks", "react"),
+    ("Data Pipelines", "data pipelines"),
+    ("ML Frameworks", "machine learning"),
+    ("Web Frameworks", "web frameworks"),
+    ("Python 3.11", "python"),
+    ("k8s", "kubernetes"),
+])
+def test_normalize_skill(skill, key):
+    assert normalize_skill(skill) == key
+
+
+def test_suffixes_do_not_collapse_distinct_skills():
+    gap = compute_skill_gap(["Data Pipelines", "CI/CD"], {"technical_skills": ["Data", "CI/CD pipelines", "Data pipelines"]})
+    assert gap == {"matching_skills": ["Data Pipelines", "CI/CD"], "missing_skills": ["Data"]}
+
+
+def test_aliases_and_filler_match():
+    requirements = {
+        "technical_skills": ["JavaScript", "Kubernetes", "Cloud platforms (AWS, GCP)"],
+        "soft_skills": ["Communication skills", "Problem solving"],
+    }
+    gap = compute_skill_gap(["JS", "k8s", "Google Cloud", "communication", "problem-solving skills"], requirements)
+    assert gap == {
+        "matching_skills": ["JS", "k8s", "Google Cloud", "communication", "problem-solving skills"],
+        "missing_skills": [],
+    }
+
+
+def test_missing_requirements_keep_their_spelling_and_count_once():
+    gap = compute_skill_gap(["Python"], {"technical_skills": ["Python", "Go"], "tool_skills": ["go"]})
+    assert gap == {"matching_skills": ["Python"], "missing_skills": ["Go"]}
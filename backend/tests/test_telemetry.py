@@ -0,0 +1,35 @@
+import re
+import pytest
+
+import telemetry
+from admission import RateLimiter, RateLimitedError, MemoryRateLimitBackend
+
+pytestmark = pytest.mark.anyio
+
+_SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? \S+$')
+
+
+async def test_rate_limited_endpoints_are_exported_as_a_label():
+    limiter = RateLimiter(backend=MemoryRateLimitBackend(), enabled=True)
+    per_minute, burst = limiter.limit("get-skills-for-job/batch")
+    for _ in range(int(burst)):
+        await limiter.check("u1", "get-skills-for-job/batch")
+    with pytest.raises(RateLimitedError):
+        await limiter.check("u1", "get-skills-for-job/batch")
+
+    telemetry.register_collector("rate_limit_test", limiter.stats)
+    try:
+        text = telemetry.render_metrics()
+    finally:
+        telemetry._collectors.pop("rate_limit_test")
+    assert 'rate_limited_requests_total{endpoint="get-skills-for-job/batch"} 1' in text
+
+
+def test_stats_keys_become_valid_metric_names():
+    telemetry.register_collector("odd keys", lambda: {"0.5-0.6": 1, "a/b": {"c d": 2}, "name": "x"})
+    try:
+        lines = telemetry.render_metrics().splitlines()
+    finally:
+        telemetry._collectors.pop("odd keys")
+    assert all(_SAMPLE.match(line) for line in lines if line and not line.startswith("#"))
+    assert any(line.endswith("odd_keys_a_b_c_d 2") for line in lines)
@@ -0,0 +1,48 @@
+import pytest
+
+from title_index import TitleIndex, normalize_title
+
+
+@pytest.mark.parametrize("title, canonical", [
+    ("Sr. Data Eng", "senior data engineer"),
+    ("  Front-End  DEV ", "frontend developer"),
+    ("Dev Ops Engineer", "devops engineer"),
+    ("DevOps Engineer", "devops engineer"),
+    ("Full Stack SWE", "fullstack software engineer"),
+    ("Storefront Endpoint Engineer", "storefront endpoint engineer"),
+    ("Backend Developer", "backend developer"),
+    ("R&D Mgr", "r and d manager"),
+    ("C++ / C# Developer", "c++ c# developer"),
+])
+def test_normalize_title(title, canonical):
+    assert normalize_title(title) == canonical
+
+
+@pytest.fixture
+def index():
+    index = TitleIndex(threshold=0.75)
+    index.add("Senior Data Engineer", "senior_data_engineer")
+    index.add("Machine Learning Engineer", "machine_learning_engineer")
+    index.add("Product Manager", "product_manager")
+    return index
+
+
+def test_resolve_finds_variants_of_a_cached_title(index):
+    assert index.resolve("senior data engineer") == "senior_data_engineer"
+    assert index.resolve("Sr. Data Eng") == "senior_data_engineer"
+    assert index.resolve("Data Engineer, Senior") == "senior_data_engineer"
+    assert index.resolve("Seniour Data Enginer") == "senior_data_engineer"
+    assert index.resolve("ML Engineer") == "machine_learning_engineer"
+    assert index.counters == {"lookups": 5, "legacy_hits": 1, "canonical_hits": 2, "fuzzy_hits": 2, "misses": 0}
+
+
+def test_resolve_gives_unknown_titles_their_own_document(index):
+    assert index.resolve("Data Scientist") == "data_scientist"
+    assert index.resolve("Product Marketer") == "product_marketer"
+    assert index.resolve("Sr Product Manager") == "senior_product_manager"
+    assert index.counters["misses"] == 3
+
+
+def test_resolve_without_recording_is_not_a_lookup(index):
+    index.resolve("Product Manager", record=False)
+    assert index.counters["lookups"] == 0
@@ -0,0 +1,211 @@
+"""
+Canonicalizes job titles so that spelling variants share one cache entry.
+
+normalize_title() folds case, punctuation and whitespace and expands common
+abbreviations ("Sr. Data Eng" -> "senior data engineer"). TitleIndex maps the
+canonical form of every cached title to its job_skills_cache document id. On
+an exact miss it ignores word order and spelling-corrects each word against
+the vocabulary of cached titles, using character-bigram Dice similarity with a
+confidence threshold. The vocabulary grows far slower than the number of
+titles, so lookups stay well under a millisecond at tens of thousands of
+titles.
+"""
+import os
+import math
+import re
+
+TITLE_CANONICALIZATION_ENABLED = os.getenv("TITLE_CANONICALIZATION_ENABLED", "true").lower() == "true"
+TITLE_MATCH_THRESHOLD = float(os.getenv("TITLE_MATCH_THRESHOLD", "0.75"))
+
+ABBREVIATIONS = {
+    "sr": "senior",
+    "snr": "senior",
+    "jr": "junior",
+    "jnr": "junior",
+    "dev": "developer",
+    "devs": "developers",
+    "eng": "engineer",
+    "engr": "engineer",
+    "mgr": "manager",
+    "mgmt": "management",
+    "assoc": "associate",
+    "asst": "assistant",
+    "admin": "administrator",
+    "sys": "systems",
+    "dir": "director",
+    "vp": "vice president",
+    "swe": "software engineer",
+    "sde": "software development engineer",
+    "qa": "quality assurance",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "fe": "frontend",
+    "ux": "user experience",
+    "ui": "user interface",
+    "mktg": "marketing",
+    "ops": "operations",
+    "intl": "international",
+}
+
+COMPOUNDS = {
+    "front end": "frontend",
+    "back end": "backend",
+    "full stack": "fullstack",
+    "dev ops": "devops",
+}
+
+_PUNCTUATION = re.compile(r"[^a-z0-9+#]+")
+_COMPOUND = re.compile(r"\b(" + "|".join(re.escape(phrase) for phrase in COMPOUNDS) + r")\b")
+
+
+def normalize_title(title: str) -> str:
+    """Returns the canonical form of a job title."""
+    text = title.lower().replace("&", " and ")
+    # Drop dots inside abbreviations ("sr.", "v.p.") before splitting on punctuation.
+    text = text.replace(".", "")
+    text = " ".join(_PUNCTUATION.sub(" ", text).split())
+    # Whole words only, and before "dev" and "ops" are expanded on their own.
+    text = _COMPOUND.sub(lambda match: COMPOUNDS[match.group(1)], text)
+    tokens = []
+    for token in text.split():
+        tokens.extend(ABBREVIATIONS.get(token, token).split())
+    return " ".join(tokens)
+
+
+def legacy_doc_id(job_title: str) -> str:
+    """The document id job_skills_cache used before canonicalization."""
+    return job_title.lower().replace(" ", "_")
+
+
+def canonical_doc_id(canonical: str) -> str:
+    return canonical.replace(" ", "_")
+
+
+def _bigrams(text: str) -> frozenset:
+    padded = f" {text} "
+    return frozenset(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+class TitleIndex:
+    def __init__(self, threshold: float = TITLE_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._doc_ids = {}        # canonical title -> cache document id
+        self._bag_ids = {}        # sorted canonical tokens -> cache document id
+        self._legacy_ids = set()  # document ids as the pre-canonicalization key would produce them
+        self._vocab = {}          # token -> bigram set
+        self._postings = {}       # bigram -> tokens containing it
+        self.counters = {"lookups": 0, "legacy_hits": 0, "canonical_hits": 0, "fuzzy_hits": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def add(self, job_title: str, doc_id: str):
+        """Registers a cached title under the document id it is stored at."""
+        self._legacy_ids.add(doc_id)
+        canonical = normalize_title(job_title)
+        if not canonical or canonical in self._doc_ids:
+            return
+        self._doc_ids[canonical] = doc_id
+        tokens = canonical.split()
+        self._bag_ids.setdefault(tuple(sorted(tokens)), doc_id)
+        for token in tokens:
+            if token in self._vocab:
+                continue
+            grams = _bigrams(token)
+            self._vocab[token] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(token)
+
+    def _correct_token(self, token: str) -> tuple[str, float] | None:
+        """Returns the closest vocabulary token and its Dice score, if above threshold."""
+        if token in self._vocab:
+            return token, 1.0
+        query = _bigrams(token)
+        t = self.threshold
+        # A match shares at least min_overlap bigrams, so probing all but
+        # min_overlap - 1 of the query's rarest bigrams is enough to find it.
+        min_overlap = math.ceil(t * len(query) / (2 - t))
+        prefix = sorted(query, key=lambda g: len(self._postings.get(g, ())))[:len(query) - min_overlap + 1]
+        min_len, max_len = min_overlap, len(query) * (2 - t) / t
+
+        best, best_score = None, 0.0
+        seen = set()
+        for gram in prefix:
+            for candidate in self._postings.get(gram, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                grams = self._vocab[candidate]
+                if not min_len <= len(grams) <= max_len:
+                    continue
+                score = 2 * len(query & grams) / (len(query) + len(grams))
+                if score > best_score:
+                    best, best_score = candidate, score
+        if best is None or best_score < t:
+            return None
+        return best, best_score
+
+    def fuzzy_match(self, canonical: str) -> tuple[str, float] | None:
+        """
+        Matches a canonical title that has no exact entry: tokens are compared
+        as a bag (word order ignored) after spelling-correcting each one against
+        the vocabulary of cached titles. Returns the document id and the lowest
+        per-token confidence, or None below the threshold.
+        """
+        corrected = []
+        confidence = 1.0
+        for token in canonical.split():
+            match = self._correct_token(token)
+            if match is None:
+                return None
+            corrected.append(match[0])
+            confidence = min(confidence, match[1])
+        doc_id = self._bag_ids.get(tuple(sorted(corrected)))
+        if doc_id is None:
+            return None
+        return doc_id, confidence
+
+    def resolve(self, job_title: str, record: bool = True) -> str:
+        """
+        Returns the document id to use for a job title. Known titles resolve to
+        their existing document; new ones get a document id derived from their
+        canonical form (or the legacy id when canonicalization is disabled).
+        Hit counters are updated in both modes, so the disabled mode reports
+        the hit rate canonicalization would have achieved. Pass record=False
+        for writes so they do not count as lookups.
+        """
+        legacy = legacy_doc_id(job_title)
+        canonical = normalize_title(job_title)
+        outcome = "misses"
+
+        if legacy in self._legacy_ids:
+            outcome, doc_id = "legacy_hits", legacy
+        else:
+            doc_id = self._doc_ids.get(canonical)
+            if doc_id is not None:
+                outcome = "canonical_hits"
+            elif canonical:
+                match = self.fuzzy_match(canonical)
+                if match is not None:
+                    outcome, doc_id = "fuzzy_hits", match[0]
+
+        if record:
+            self.counters["lookups"] += 1
+            self.counters[outcome] += 1
+        if outcome == "legacy_hits" or not TITLE_CANONICALIZATION_ENABLED or not canonical:
+            return legacy
+        return doc_id or canonical_doc_id(canonical)
+
+    def stats(self) -> dict:
+        lookups = self.counters["lookups"]
+        hits = self.counters["legacy_hits"] + self.counters["canonical_hits"] + self.counters["fuzzy_hits"]
+        return {
+            **self.counters,
+            "enabled": TITLE_CANONICALIZATION_ENABLED,
+            "indexed_titles": len(self._doc_ids),
+            "legacy_hit_rate": self.counters["legacy_hits"] / lookups if lookups else 0.0,
+            "canonical_hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+title_index = TitleIndex()
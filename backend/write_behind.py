@@ -0,0 +1,240 @@
+"""
+A write-behind queue for Firestore writes that nothing reads back within the
+request, such as feedback and skill profiles.
+
+enqueue() returns as soon as the write is buffered. Buffered writes are
+committed in WriteBatches once WRITE_BEHIND_BATCH_SIZE are pending or every
+WRITE_BEHIND_FLUSH_SECONDS, whichever comes first; a later write to the same
+document replaces an earlier one that has not been flushed yet, and counter
+increments to the same document add up into one write. Failed batches are
+retried with jittered exponential backoff; writes still failing after
+WRITE_BEHIND_MAX_RETRIES are dropped and reported to on_dropped, if given, so
+callers can forget what they assumed was saved. The buffer is bounded: at
+WRITE_BEHIND_MAX_PENDING writes, enqueue() waits for a flush instead of
+growing. drain() flushes everything and runs on shutdown.
+
+Given a transactional decorator, each batch is committed in a transaction
+that also writes a marker document, write_behind_batches/{batch id}. A retry
+after an error that left it unclear whether the commit went through finds
+the marker and stops, so increments are never applied twice. Markers carry
+an expires_at field for a Firestore TTL policy to delete them. Increments
+count in pending_increments() until their batch is committed or dropped.
+enqueue_resolved() buffers a write that depends on the stored document: it
+is read and rewritten in the batch's transaction, so instances writing the
+same document at once cannot both act on the value they read.
+"""
+import logging
+import os
+import uuid
+import random
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from telemetry import span
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1.0"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "5000"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5"))
+
+# Firestore rejects commits with more than 500 writes; one is the batch marker.
+_MAX_BATCH_WRITES = 499
+# A resolved write sets its document and may increment one other.
+_WRITES_PER_OP = {"set": 1, "increment": 1, "resolve": 2}
+BATCH_MARKERS_COLLECTION = "write_behind_batches"
+_BATCH_MARKER_TTL = timedelta(days=7)
+
+
+class WriteBehindQueue:
+    def __init__(self, get_db, increment=None, on_dropped=None, transactional=None):
+        self._get_db = get_db
+        # Builds the backend's server-side Increment transform for an amount.
+        self._increment = increment
+        # Called with (collection, document id, data) for each write given up on.
+        self._on_dropped = on_dropped
+        # The backend's async_transactional decorator; without it batches are plain WriteBatches.
+        self._transactional = transactional
+        self._pending = OrderedDict()   # (collection, document id, "set" | "increment" | "resolve") -> data
+        self._in_flight = {}            # the same, for the batch being committed
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher = None
+        self._counters = {"enqueued": 0, "coalesced": 0, "written": 0, "batches": 0, "retries": 0, "dropped": 0, "backpressure_waits": 0}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def enqueue(self, collection: str, document_id: str, data: dict):
+        """Buffers a document set(); it reaches Firestore on the next flush."""
+        key = (collection, document_id, "set")
+        if key in self._pending:
+            self._counters["coalesced"] += 1
+            del self._pending[key]
+        await self._add(key, data)
+
+    async def enqueue_increment(self, collection: str, document_id: str, counts: dict, fields: dict | None = None):
+        """
+        Buffers increments of numeric fields (counts, field -> amount) plus any
+        plain fields, written as one merged set() with Increment transforms.
+        Increments to a document that is still pending are added to it.
+        """
+        key = (collection, document_id, "increment")
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._counters["coalesced"] += 1
+            for field, amount in counts.items():
+                pending["counts"][field] = pending["counts"].get(field, 0) + amount
+            pending["fields"].update(fields or {})
+            return
+        await self._add(key, {"counts": dict(counts), "fields": dict(fields or {})})
+
+    async def enqueue_resolved(self, collection: str, document_id: str, data: dict, resolve):
+        """
+        Buffers a write decided at flush time. In the batch's transaction,
+        resolve(stored document or None, data) returns the document to set (None
+        to leave it) and a list of (collection, document id, counts, fields)
+        increments to apply with it. A later write to a document that is still
+        pending replaces the earlier one. Needs a transactional backend.
+        """
+        if self._transactional is None:
+            raise RuntimeError("Resolved writes need a transactional backend.")
+        key = (collection, document_id, "resolve")
+        if key in self._pending:
+            self._counters["coalesced"] += 1
+            del self._pending[key]
+        await self._add(key, {"data": data, "resolve": resolve})
+
+    def pending_increments(self, collection: str, document_id: str) -> dict:
+        """Increments (field -> amount) buffered or being flushed for a document, not yet committed."""
+        counts = {}
+        for buffer in (self._in_flight, self._pending):
+            pending = buffer.get((collection, document_id, "increment"))
+            for field, amount in (pending["counts"] if pending is not None else {}).items():
+                counts[field] = counts.get(field, 0) + amount
+        return counts
+
+    async def _add(self, key: tuple, data: dict):
+        while len(self._pending) >= WRITE_BEHIND_MAX_PENDING:
+            self._counters["backpressure_waits"] += 1
+            await self.flush()
+        self._pending[key] = data
+        self._counters["enqueued"] += 1
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        if len(self._pending) >= WRITE_BEHIND_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def _flush_periodically(self):
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=WRITE_BEHIND_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Commits every pending write, in batches, in the order they were queued."""
+        async with self._flush_lock:
+            while self._pending:
+                items, writes = [], 0
+                while self._pending and writes + _WRITES_PER_OP[next(iter(self._pending))[2]] <= _MAX_BATCH_WRITES:
+                    items.append(self._pending.popitem(last=False))
+                    writes += _WRITES_PER_OP[items[-1][0][2]]
+                self._in_flight = dict(items)
+                try:
+                    await self._commit(uuid.uuid4().hex, items)
+                finally:
+                    self._in_flight = {}
+
+    def _write(self, db, writer, items: list, resolved: dict | None = None):
+        """
+        Adds items to writer, a WriteBatch or a transaction. resolved maps the
+        key of each resolved write to what its resolve() returned. Increments
+        to the same document become one write.
+        """
+        increments = {}
+
+        def add_increment(collection, document_id, counts, fields):
+            pending = increments.setdefault((collection, document_id), {"counts": {}, "fields": {}})
+            for field, amount in counts.items():
+                pending["counts"][field] = pending["counts"].get(field, 0) + amount
+            pending["fields"].update(fields or {})
+
+        for key, data in items:
+            collection, document_id, op = key
+            if op == "increment":
+                add_increment(collection, document_id, data["counts"], data["fields"])
+            elif op == "resolve":
+                document, resolved_increments = resolved[key]
+                if document is not None:
+                    writer.set(db.collection(collection).document(document_id), document)
+                for increment in resolved_increments:
+                    add_increment(*increment)
+            else:
+                writer.set(db.collection(collection).document(document_id), data)
+        for (collection, document_id), data in increments.items():
+            counts = {field: self._increment(amount) for field, amount in data["counts"].items() if amount}
+            if counts:
+                writer.set(db.collection(collection).document(document_id), {**data["fields"], **counts}, merge=True)
+
+    async def _commit_once(self, db, batch_id: str, items: list):
+        marker = db.collection(BATCH_MARKERS_COLLECTION).document(batch_id)
+
+        async def apply(transaction):
+            # A previous attempt may have committed even though it reported an error.
+            if (await marker.get(transaction=transaction)).exists:
+                return
+            # Firestore transactions read everything before they write anything.
+            resolved = {}
+            for key, data in items:
+                collection, document_id, op = key
+                if op == "resolve":
+                    stored = await db.collection(collection).document(document_id).get(transaction=transaction)
+                    resolved[key] = data["resolve"](stored.to_dict() if stored.exists else None, data["data"])
+            self._write(db, transaction, items, resolved)
+            transaction.set(marker, {"writes": len(items), "expires_at": datetime.now(timezone.utc) + _BATCH_MARKER_TTL})
+
+        await self._transactional(apply)(db.transaction())
+
+    async def _commit(self, batch_id: str, items: list):
+        for attempt in range(WRITE_BEHIND_MAX_RETRIES + 1):
+            try:
+                db = self._get_db()
+                if not db:
+                    raise RuntimeError("Database client not available.")
+                with span("firestore"):
+                    if self._transactional is not None:
+                        await self._commit_once(db, batch_id, items)
+                    else:
+                        batch = db.batch()
+                        self._write(db, batch, items)
+                        await batch.commit()
+                self._counters["written"] += len(items)
+                self._counters["batches"] += 1
+                return
+            except Exception as e:
+                if attempt == WRITE_BEHIND_MAX_RETRIES:
+                    logger.error("Error writing %s queued writes, giving up: %s", len(items), e)
+                    self._counters["dropped"] += len(items)
+                    if self._on_dropped is not None:
+                        for (collection, document_id, op), data in items:
+                            self._on_dropped(collection, document_id, data["data"] if op == "resolve" else data)
+                    return
+                delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning("Error writing %s queued writes, retrying in %.1fs: %s", len(items), delay, e)
+                self._counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def drain(self):
+        """Flushes everything still buffered; called on shutdown."""
+        await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "in_flight": len(self._in_flight), **self._counters}